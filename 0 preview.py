@@ -2,10 +2,13 @@ import pandas as pd
 import numpy as np
 import matplotlib.pyplot as plt
 import seaborn as sns
-import datetime
+from durations import to_minutes
+from excel_cache import read_excel_cached
+from outliers import outlier_flags
+from utilization import busy_intervals, concurrency, peak_concurrency, shift_hours, within_hours
 
 new_file_path = '0 Combined shortcut.xlsx'
-new_vehicle_data = pd.read_excel(new_file_path)
+new_vehicle_data = read_excel_cached(new_file_path)
 #print(new_vehicle_data.head())
 
 # Performing a basic data quality check for missing values and unique value counts
@@ -23,15 +26,10 @@ plt.tight_layout()
 plt.savefig('data_quality_summary.png')
 #plt.show()
 
-# Define a function to detect and return outliers
+# Define a function to detect and return outliers, judged against each vehicle's own trips
+# (outliers.outlier_flags gives the per-row flags for several columns at once)
 def detect_outliers(df, col):
-    Q1 = df[col].quantile(0.25)
-    Q3 = df[col].quantile(0.75)
-    IQR = Q3 - Q1
-    lower_bound = Q1 - 1.5 * IQR
-    upper_bound = Q3 + 1.5 * IQR
-    outliers = df[(df[col] < lower_bound) | (df[col] > upper_bound)]
-    return outliers
+    return df[outlier_flags(df, [col], by='Vehicle')[col]]
 
 # Detect outliers in 'Trip Duration (Minutes)'
 outliers_trip_duration = detect_outliers(new_vehicle_data, 'End Odometer')
@@ -47,21 +45,8 @@ plt.title('Boxplot of End Odometer')
 plt.savefig('End_Odometer_outliers.png')
 plt.show()
 
-# Adjusted function to convert time string or time object to total minutes
-def convert_to_minutes(time_value):
-    if pd.isna(time_value):
-        return 0
-    if isinstance(time_value, str):
-        time_parts = datetime.datetime.strptime(time_value, '%H:%M:%S.%f')
-    elif isinstance(time_value, datetime.time):
-        time_parts = time_value
-    else:
-        return 0
-    total_minutes = time_parts.hour * 60 + time_parts.minute + time_parts.second / 60
-    return total_minutes
-
 # Ensure 'Stop Duration' is converted to a numeric format (total minutes)
-new_vehicle_data['Stop Duration (Minutes)'] = new_vehicle_data['Stop Duration'].apply(convert_to_minutes)
+new_vehicle_data['Stop Duration (Minutes)'] = to_minutes(new_vehicle_data['Stop Duration'], fill=0)
 
 # Now detect outliers in 'Stop Duration (Minutes)'
 outliers_stop_duration = detect_outliers(new_vehicle_data, 'Stop Duration (Minutes)')
@@ -148,8 +133,8 @@ plt.show()
 
 
 # Reapplying the conversion
-new_vehicle_data['Driving Duration (Minutes)'] = new_vehicle_data['Driving Duration'].apply(convert_to_minutes)
-new_vehicle_data['Idling Duration (Minutes)'] = new_vehicle_data['Idling Duration'].apply(convert_to_minutes)
+new_vehicle_data['Driving Duration (Minutes)'] = to_minutes(new_vehicle_data['Driving Duration'], fill=0)
+new_vehicle_data['Idling Duration (Minutes)'] = to_minutes(new_vehicle_data['Idling Duration'], fill=0)
 
 # Recalculating total duration
 new_vehicle_data['Total Duration (Minutes)'] = new_vehicle_data['Driving Duration (Minutes)'] + new_vehicle_data['Idling Duration (Minutes)']
@@ -171,13 +156,9 @@ plt.show()
 work_hours_start = 9
 work_hours_end = 17
 
-# Function to check if a time is within work hours
-def is_within_work_hours(time):
-    return work_hours_start <= time.hour < work_hours_end
-
-# Checking if trip starts or ends during work hours
-new_vehicle_data['Start During Work Hours'] = new_vehicle_data['Trip Started'].apply(is_within_work_hours)
-new_vehicle_data['Stop During Work Hours'] = new_vehicle_data['Trip Ended'].apply(is_within_work_hours)
+# Checking if trip starts or ends during work hours (whole columns at once)
+new_vehicle_data['Start During Work Hours'] = within_hours(new_vehicle_data['Trip Started'], work_hours_start, work_hours_end)
+new_vehicle_data['Stop During Work Hours'] = within_hours(new_vehicle_data['Trip Ended'], work_hours_start, work_hours_end)
 
 # Calculating the proportion of trips starting and ending during work hours
 start_during_work_hours_proportion = new_vehicle_data['Start During Work Hours'].mean()
@@ -194,6 +175,23 @@ plt.tight_layout()
 plt.savefig('work_hours_proportions.png')
 plt.show()
 
+# Fleet utilization: vehicles in use at once (a sweep over trip start/end events) and
+# vehicle-hours in use per shift window (utilization.py)
+busy_periods = busy_intervals(new_vehicle_data)
+vehicles_in_use = concurrency(busy_periods)
+print(peak_concurrency(vehicles_in_use, 'D'))
+print(peak_concurrency(vehicles_in_use, 'W-MON'))
+print(shift_hours(busy_periods, freq='W-MON').round(1))
+
+# Plotting the number of vehicles in use over time
+plt.figure(figsize=(15, 5))
+plt.step(vehicles_in_use.index, vehicles_in_use.to_numpy(), where='post')
+plt.title('Vehicles in Use Over Time')
+plt.xlabel('Time')
+plt.ylabel('Vehicles in Use')
+plt.savefig('vehicles_in_use_over_time.png')
+plt.show()
+
 
 
 
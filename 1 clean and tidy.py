@@ -1,57 +1,45 @@
-import pandas as pd
-
-file_path = 'Nov 2023.xlsx'
-xls = pd.ExcelFile(file_path)
-
-# Get all sheet names
-sheet_names = xls.sheet_names
-#print(sheet_names)
+import os
+import sys
 
-# Initialize an empty DataFrame for merged data
-merged_data_with_dates = pd.DataFrame()
-
-first_sheet = True
-for sheet in sheet_names:
-    if sheet.startswith("Day"):
-        # Read the specific range (A3:O220) and the date from cell I1
-        day_data = pd.read_excel(xls, sheet_name=sheet, usecols="A:O", skiprows=2, nrows=217)
-        
-        date = pd.read_excel(xls, sheet_name=sheet, header=None).iloc[0, 8]  # Read directly from cell I1
-        # Add the date as a new column
-        day_data['Date'] = date
-
-        # Append to the merged DataFrame
-        merged_data_with_dates = pd.concat([merged_data_with_dates, day_data])
+import pandas as pd
 
-# Reset index of the merged DataFrame
-merged_data_with_dates.reset_index(drop=True, inplace=True)
+import trip_store
+from excel_cache import write_frame
+from manual_logs import MONTH_FILES, merge_month_workbooks
 
-# Removing empty rows based on the first column (assumed to be 'Time called in' in this case)
-cleaned_data = merged_data_with_dates.dropna(subset=[merged_data_with_dates.columns[0]])
 
-# Reset index after removing empty rows
-cleaned_data.reset_index(drop=True, inplace=True)
+# python "1 clean and tidy.py" [month workbooks...] [--excel]
+def main():
+    # Monthly "Day N" workbooks; pass extra months on the command line, e.g. 'Dec 2023.xlsx'
+    file_paths = [arg for arg in sys.argv[1:] if arg != '--excel'] or MONTH_FILES
+    missing = [path for path in file_paths if not os.path.exists(path)]
+    if missing:
+        print(f"Not found, skipped: {', '.join(missing)}")
+    file_paths = [path for path in file_paths if path not in missing]
 
-cleaned_file_path = 'Merged_Nov_2023.xlsx'
+    # Only workbooks that are new to the trip store or changed since they were ingested
+    # (size/mtime, then content hash) are parsed, each once in its own worker process. A
+    # changed workbook's rows replace the ones it added before.
+    changed = trip_store.changed_files('manual', file_paths)
+    if changed:
+        signatures = {os.path.basename(path): trip_store.file_signature(path) for path in changed}
+        new_data = merge_month_workbooks(changed)
+        written = trip_store.replace_files(new_data, 'manual', signatures)
+        print(f"Updated manual log months: {', '.join(written) or 'none'}")
 
-with pd.ExcelWriter(cleaned_file_path) as writer:
-    cleaned_data.to_excel(writer, index=False, sheet_name='Cleaned Data')
-#cleaned_file_path
+    merged_data = trip_store.read('manual').drop(columns=['Source File'], errors='ignore')
 
-# Filling missing values with 0 in the 'Orders' and '# of passengers' columns
-filled_data = pd.read_excel('Merged_Nov_2023.xlsx')
-filled_data['Orders'] = filled_data['Orders'].fillna(0)
-filled_data['# of passengers'] = filled_data['# of passengers'].fillna(0)
-filled_data['#14 MICHAEL'] = filled_data['#14-A BLAIR'].fillna(0)
-filled_data['#38A BLAIR OS'] = filled_data['#38 '].fillna(0)
-filled_data['#46 JEREMY'] = filled_data['#46 JEREMY'].fillna(0)
-filled_data['#47 PAOLO'] = filled_data['#47 PAOLO'].fillna(0)
-filled_data['#51 '] = filled_data['#51 '].fillna(0)
+    merged_file_path = 'Merged_3mon.xlsx'
 
-filled_file_path = 'Filled_Merged_Nov_2023.xlsx'
+    # The next scripts read the frame (excel_cache.read_frame); the workbook is only written
+    # with --excel, for looking at the merged rows
+    write_frame(merged_data, merged_file_path)
+    if '--excel' in sys.argv:
+        with pd.ExcelWriter(merged_file_path) as writer:
+            merged_data.to_excel(writer, index=False, sheet_name='Data')
 
-with pd.ExcelWriter(filled_file_path) as writer:
-    filled_data.to_excel(writer, index=False, sheet_name='Filled Data')
-#filled_file_path
+    print(f"Merged {len(merged_data)} rows from {len(trip_store.months('manual'))} months into '{merged_file_path}'")
 
 
+if __name__ == "__main__":
+    main()
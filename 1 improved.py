@@ -1,10 +1,22 @@
+import os
 import pandas as pd
 import numpy as np
-import matplotlib.pyplot as plt
-import seaborn as sns
-import datetime
-
-
+import sys
+from chart_render import ChartQueue, pyplot, seaborn
+from durations import to_minutes
+from ev_soc import feasibility_table, simulate, trip_sequences
+from excel_cache import read_excel_cached
+from fuel_log import FUEL_LOG_FILE, attribute_fuel, fuel_economy, read_fuel_log
+from outliers import outlier_flags
+from rollup_cube import build_cube, lookup
+from scenarios import best_scenarios, distance_matrix, evaluate_scenarios, scenario_grid
+from schema import GEOTAB_SCHEMA, apply_schema
+from telemetry import enable_from_argv, profiled, stage
+from trip_partitions import odometer_deltas, odometer_summary, partition_trips, split_sorted
+
+
+# Per-vehicle fuel totals for the sample quarter (Fuel Economy in L/100 km), used when there
+# is no fuel log (fuel_log.FUEL_LOG_FILE) to attribute fill-ups from
 fuel_economy_data = pd.DataFrame({
     'Vehicle': ['14A', '38A', '46', '47', '51'],
     'Distance': [8710.31, 5178.45, 6246.02, 8350.34, 3075.63],
@@ -13,11 +25,13 @@ fuel_economy_data = pd.DataFrame({
 })
 
 
-# load data
+# load data, typed by the shared schema (categorical strings, downcast numbers, timedelta durations)
+@profiled
 def load_data(file_path):
-    return pd.read_excel(file_path)
+    return apply_schema(read_excel_cached(file_path), GEOTAB_SCHEMA, file_path)
 
 # Data Quality Report Function
+@profiled
 def data_quality_report(df):
     missing_values = df.isnull().sum()
     unique_values = df.nunique()
@@ -25,6 +39,7 @@ def data_quality_report(df):
 
 # Generic Plotting Functions
 def plot_bar(data, title, filename):
+    plt = pyplot()
     plt.figure(figsize=(15, 10))
     data.plot(kind='bar', title=title)
     plt.tight_layout()
@@ -32,6 +47,8 @@ def plot_bar(data, title, filename):
     plt.close()
 
 def plot_box(data, title, filename):
+    plt = pyplot()
+    sns = seaborn()
     plt.figure(figsize=(10, 6))
     sns.boxplot(x=data)
     plt.title(title)
@@ -39,6 +56,7 @@ def plot_box(data, title, filename):
     plt.close()
     
 def plot_avg_median_trip_duration(avg_duration, median_duration, filename):
+    plt = pyplot()
     fig, ax = plt.subplots()
     ax.bar(['Average Duration', 'Median Duration'], [avg_duration, median_duration])
     plt.title('Average and Median Trip Duration')
@@ -47,6 +65,8 @@ def plot_avg_median_trip_duration(avg_duration, median_duration, filename):
     plt.close()
 
 def plot_trip_duration_histogram(df, column, filename):
+    plt = pyplot()
+    sns = seaborn()
     plt.figure(figsize=(12, 6))
     sns.histplot(df[column], bins=50, kde=True)
     plt.title('Distribution of Trip Durations')
@@ -57,6 +77,7 @@ def plot_trip_duration_histogram(df, column, filename):
     plt.close()
 
 # Function to prepare data for grouped bar chart
+@profiled
 def prepare_hourly_trip_data(df, start_column, end_column):
     start_hours = df[start_column].dt.hour.value_counts().sort_index()
     end_hours = df[end_column].dt.hour.value_counts().sort_index()
@@ -66,6 +87,7 @@ def prepare_hourly_trip_data(df, start_column, end_column):
 
 # Function to plot grouped bar chart for trip start and end times
 def plot_grouped_bar_chart(data, filename):
+    plt = pyplot()
     ax = data.plot(kind='bar', figsize=(12, 6), alpha=0.75)
     plt.title('Distribution of Trip Start and End Times')
     plt.xlabel('Hour of Day')
@@ -76,16 +98,17 @@ def plot_grouped_bar_chart(data, filename):
     plt.savefig(filename)
     plt.close()
 
-# Function to calculate odometer differences
+# Function to calculate odometer differences: trips sorted once into per-vehicle runs
+# (trip_partitions.VehicleTrips) with differences, gaps and resets from one vectorized pass
+@profiled
 def calculate_odometer_differences(df):
-    df_sorted = df.sort_values(by=['Vehicle', 'Trip Started'])
-    df_sorted['Odometer Difference'] = df_sorted.groupby('Vehicle')['End Odometer'].diff().fillna(0)
-    return df_sorted
+    return odometer_deltas(partition_trips(df, 'Vehicle', 'Trip Started'))
 
 # Function to plot odometer changes over time by vehicle
-def plot_odometer_changes(df, filename):
+def plot_odometer_changes(trips, filename):
+    plt = pyplot()
     plt.figure(figsize=(15, 7))
-    for vehicle, data in df.groupby('Vehicle'):
+    for vehicle, data in trips.items():
         plt.plot(data['Trip Started'], data['Odometer Difference'], label=vehicle)
     plt.title('Odometer Reading Changes Over Time by Vehicle')
     plt.xlabel('Time')
@@ -94,12 +117,13 @@ def plot_odometer_changes(df, filename):
     plt.savefig(filename)
     plt.close()
     
-def plot_odometer_diff_summary(df, filename):
+def plot_odometer_diff_summary(trips, filename):
+    plt = pyplot()
     plt.figure(figsize=(12, 6))
 
     # Preparing data for boxplot
-    data_to_plot = [group['Odometer Difference'].values for _, group in df.groupby('Vehicle')]
-    vehicle_names = df['Vehicle'].unique()
+    data_to_plot = trips.split('Odometer Difference')
+    vehicle_names = trips.vehicles
 
     # Define colors for each vehicle
     colors = ['blue', 'green', 'red', 'purple', 'orange']  # Extend or reduce this list based on the number of vehicles
@@ -119,6 +143,8 @@ def plot_odometer_diff_summary(df, filename):
 
 # Function to plot Efficiency Analysis
 def plot_efficiency_analysis(df, filename):
+    plt = pyplot()
+    sns = seaborn()
     plt.figure(figsize=(12, 6))
 
     # Using Seaborn to create the scatter plot
@@ -133,37 +159,23 @@ def plot_efficiency_analysis(df, filename):
     plt.savefig(filename)
     plt.close()
 
-# Outlier Detection Function
-def detect_outliers(df, col):
-    Q1 = df[col].quantile(0.25)
-    Q3 = df[col].quantile(0.75)
-    IQR = Q3 - Q1
-    lower_bound = Q1 - 1.5 * IQR
-    upper_bound = Q3 + 1.5 * IQR
-    return df[(df[col] < lower_bound) | (df[col] > upper_bound)]
-
-# Time Conversion Function
-def convert_to_minutes(time_value):
-    if pd.isna(time_value):
-        return 0
-    if isinstance(time_value, str):
-        time_parts = datetime.datetime.strptime(time_value, '%H:%M:%S.%f')
-    elif isinstance(time_value, datetime.time):
-        time_parts = time_value
-    else:
-        return 0
-    total_minutes = time_parts.hour * 60 + time_parts.minute + time_parts.second / 60
-    return total_minutes
+# Outlier Detection Function: IQR fences of each vehicle's own trips, all columns in one
+# grouped pass; returns a boolean flag per row and column instead of a filtered copy
+@profiled
+def detect_outliers(df, cols):
+    return outlier_flags(df, cols, by='Vehicle')
 
+@profiled
 def convert_time_columns(df):
     df['Trip Started'] = pd.to_datetime(df['Trip Started'])
     df['Trip Ended'] = pd.to_datetime(df['Trip Ended'])
     df['Trip Duration (Minutes)'] = (df['Trip Ended'] - df['Trip Started']).dt.total_seconds() / 60
-    df['Stop Duration (Minutes)'] = df['Stop Duration'].apply(convert_to_minutes)
-    df['Driving Duration (Minutes)'] = df['Driving Duration'].apply(convert_to_minutes)  # Ensure this conversion
-    df['Idling Duration (Minutes)'] = df['Idling Duration'].apply(convert_to_minutes)
+    df['Stop Duration (Minutes)'] = to_minutes(df['Stop Duration'], fill=0)
+    df['Driving Duration (Minutes)'] = to_minutes(df['Driving Duration'], fill=0)  # Ensure this conversion
+    df['Idling Duration (Minutes)'] = to_minutes(df['Idling Duration'], fill=0)
 
 # Trip Analysis Functions
+@profiled
 def trip_analysis(df):
     # Use the converted 'Driving Duration (Minutes)' for calculation
     trip_frequency = df['Vehicle'].value_counts()
@@ -172,27 +184,27 @@ def trip_analysis(df):
     return trip_frequency, avg_duration, median_duration
 
 # Location Analysis Function
+@profiled
 def location_analysis(df):
-    most_common_start = df.groupby('Vehicle')['Start Location'].agg(pd.Series.mode)
-    most_common_end = df.groupby('Vehicle')['End Location'].agg(pd.Series.mode)
+    most_common_start = df.groupby('Vehicle', observed=True)['Start Location'].agg(pd.Series.mode)
+    most_common_end = df.groupby('Vehicle', observed=True)['End Location'].agg(pd.Series.mode)
     return pd.DataFrame({'Most Common Start Location': most_common_start, 'Most Common End Location': most_common_end})
 
 
-# Distance Covered Analysis
-def calculate_distance_covered(df):
-    df['Date'] = pd.to_datetime(df['Trip Started']).dt.date
-    df['Distance Covered'] = df['End Odometer'] - df['Start Odometer']
-    daily = df.groupby(['Vehicle', 'Date'])['Distance Covered'].sum()
-    weekly = df.groupby(['Vehicle', pd.Grouper(key='Trip Started', freq='W-MON')])['Distance Covered'].sum()
-    monthly = df.groupby(['Vehicle', pd.Grouper(key='Trip Started', freq='M')])['Distance Covered'].sum()
-    yearly = df.groupby(['Vehicle', pd.Grouper(key='Trip Started', freq='Y')])['Distance Covered'].sum()
+# Distance Covered Analysis, read from the rollup cube (day grain rolled up to W-MON, M and Y)
+@profiled
+def calculate_distance_covered(cube):
+    daily = lookup(cube, 'Distance Covered', 'Daily').rename_axis(['Vehicle', 'Date'])
+    weekly = lookup(cube, 'Distance Covered', 'Weekly').rename_axis(['Vehicle', 'Trip Started'])
+    monthly = lookup(cube, 'Distance Covered', 'Monthly').rename_axis(['Vehicle', 'Trip Started'])
+    yearly = lookup(cube, 'Distance Covered', 'Yearly').rename_axis(['Vehicle', 'Trip Started'])
     return daily, weekly, monthly, yearly
 
 # Plot Daily Distance Covered
 def plot_daily_distance_covered(data, filename):
+    plt = pyplot()
     plt.figure(figsize=(15, 7))
-    for vehicle in data.index.get_level_values(0).unique():
-        vehicle_data = data.xs(vehicle, level='Vehicle')
+    for vehicle, vehicle_data in split_sorted(data):
         plt.plot(vehicle_data.index, vehicle_data.values, label=f'Vehicle {vehicle}')
     plt.title('Daily Distance Covered per Vehicle')
     plt.xlabel('Date')
@@ -205,6 +217,7 @@ def plot_daily_distance_covered(data, filename):
 
 # Plot Weekly/Monthly/Yearly Distance Covered
 def plot_aggregated_distance_covered(data, title, filename):
+    plt = pyplot()
     plt.figure(figsize=(15, 7))
     data.unstack(level=0).plot(kind='bar', stacked=True)
     plt.title(title)
@@ -217,22 +230,31 @@ def plot_aggregated_distance_covered(data, title, filename):
     plt.close()
 
 # Fuel Economy Analysis
-# Merge with Main Dataset
-def merge_fuel_data(main_df, fuel_df):
-    return pd.merge(main_df, fuel_df, on='Vehicle', how='left')
+# Per-vehicle trip and distance totals from the cube, joined with the fuel table
+@profiled
+def merge_fuel_data(cube, fuel_df):
+    totals = pd.DataFrame({
+        'Trips': lookup(cube, 'Trips', 'Yearly').groupby(level='Vehicle').sum(),
+        'Distance Covered': lookup(cube, 'Distance Covered', 'Yearly').groupby(level='Vehicle').sum(),
+    })
+    return totals.join(fuel_df.set_index('Vehicle'), how='left')
 
 # Plotting Average Fuel Economy per Vehicle
 def plot_avg_fuel_economy(data, filename):
+    plt = pyplot()
+    sns = seaborn()
     plt.figure(figsize=(10, 6))
     sns.barplot(x=data.index, y=data.values)
     plt.title('Average Fuel Economy per Vehicle')
     plt.xlabel('Vehicle')
-    plt.ylabel('Average Fuel Economy (km/l)')
+    plt.ylabel('Average Fuel Economy (L/100 km)')
     plt.savefig(filename)
     plt.close()
     
 # Plotting Distance Covered vs. Fuel Used per Vehicle
 def plot_distance_vs_fuel_used(distance_data, fuel_used_data, filename):
+    plt = pyplot()
+    sns = seaborn()
     plt.figure(figsize=(10, 6))
     sns.scatterplot(x=distance_data.values, y=fuel_used_data.values)  # Ensure both are Series
     for i, txt in enumerate(distance_data.index):
@@ -245,13 +267,14 @@ def plot_distance_vs_fuel_used(distance_data, fuel_used_data, filename):
 
 # Plotting Fuel Economy Trend Over Time
 def plot_fuel_economy_trend(data, filename):
+    plt = pyplot()
+    sns = seaborn()
     plt.figure(figsize=(12, 8))
-    for vehicle in data.index.get_level_values(0).unique():
-        vehicle_data = data.loc[vehicle]
+    for vehicle, vehicle_data in split_sorted(data):
         sns.lineplot(x=vehicle_data.index.astype('str'), y=vehicle_data.values, label=vehicle)  # Convert index to string for plotting
     plt.title('Fuel Economy Trend Over Time')
     plt.xlabel('Month')
-    plt.ylabel('Fuel Economy (km/l)')
+    plt.ylabel('Fuel Economy (L/100 km)')
     plt.xticks(rotation=45)
     plt.legend(title='Vehicle')
     plt.savefig(filename)
@@ -260,87 +283,125 @@ def plot_fuel_economy_trend(data, filename):
 
 # Main Analysis Script
 def main():
-    sns.set(style="whitegrid")
+    # Charts are queued as they are computed and rendered together at the end, in parallel;
+    # unchanged charts are skipped. `--no-charts` runs the analysis only; `--profile` writes a
+    # per-stage timing report (see telemetry.py).
+    enable_from_argv('fleet_analysis')
+    charts = ChartQueue(style="whitegrid", enabled='--no-charts' not in sys.argv)
 
     new_vehicle_data = load_data('0 Combined shortcut.xlsx')
     # Convert Time Columns
     convert_time_columns(new_vehicle_data)
-    # Prepare and merge fuel economy data
-    merged_data = merge_fuel_data(new_vehicle_data, fuel_economy_data)
 
     # Data Quality Report
     data_quality_summary = data_quality_report(new_vehicle_data)
-    plot_bar(data_quality_summary['Missing Values'], 'Missing Values per Column', 'data_quality_missing_values.png')
-    plot_bar(data_quality_summary['Unique Values'], 'Unique Values per Column', 'data_quality_unique_values.png')
+    charts.add(plot_bar, 'data_quality_missing_values.png', data_quality_summary['Missing Values'], 'Missing Values per Column')
+    charts.add(plot_bar, 'data_quality_unique_values.png', data_quality_summary['Unique Values'], 'Unique Values per Column')
 
     # Outliers Detection and Visualization
-    outliers_end_odometer = detect_outliers(new_vehicle_data, 'End Odometer')
-    plot_box(new_vehicle_data['End Odometer'], 'Boxplot of End Odometer', 'End_Odometer_outliers.png')
+    outliers = detect_outliers(new_vehicle_data, ['End Odometer', 'Trip Duration (Minutes)', 'Stop Duration (Minutes)'])
+    print("Outliers per vehicle:")
+    print(outliers.groupby(new_vehicle_data['Vehicle'], observed=True).sum())
+    charts.add(plot_box, 'End_Odometer_outliers.png', new_vehicle_data['End Odometer'], 'Boxplot of End Odometer')
 
     # Correctly plotting the converted 'Stop Duration (Minutes)' column
-    plot_box(new_vehicle_data['Stop Duration (Minutes)'], 'Boxplot of Stop Duration', 'Stop_Duration_Boxplot.png')
+    charts.add(plot_box, 'Stop_Duration_Boxplot.png', new_vehicle_data['Stop Duration (Minutes)'], 'Boxplot of Stop Duration')
 
     # Trip Frequency and Duration Analysis
     trip_freq, avg_trip_duration, med_trip_duration = trip_analysis(new_vehicle_data)
     print(trip_freq, avg_trip_duration, med_trip_duration)
-    plot_bar(trip_freq, 'Trip Frequency per Vehicle', 'trip_frequency_per_vehicle.png')
+    charts.add(plot_bar, 'trip_frequency_per_vehicle.png', trip_freq, 'Trip Frequency per Vehicle')
     
     # Plotting Average and Median Trip Duration
-    plot_avg_median_trip_duration(avg_trip_duration, med_trip_duration, 'avg_median_trip_duration.png')
+    charts.add(plot_avg_median_trip_duration, 'avg_median_trip_duration.png', avg_trip_duration, med_trip_duration)
     
     # Plotting Trip Durations Histogram
-    plot_trip_duration_histogram(new_vehicle_data, 'Trip Duration (Minutes)', 'trip_durations_histogram.png')
+    charts.add(plot_trip_duration_histogram, 'trip_durations_histogram.png', new_vehicle_data[['Trip Duration (Minutes)']], 'Trip Duration (Minutes)')
 
     # Prepare Data for Grouped Bar Chart
     hourly_trip_data = prepare_hourly_trip_data(new_vehicle_data, 'Trip Started', 'Trip Ended')
 
     # Plotting Grouped Bar Chart for Trip Start and End Times
-    plot_grouped_bar_chart(hourly_trip_data, 'trip_start_end_times_grouped_bar.png')
+    charts.add(plot_grouped_bar_chart, 'trip_start_end_times_grouped_bar.png', hourly_trip_data)
 
     # Prepare Data for Odometer Changes Plot and Summary
     odometer_data = calculate_odometer_differences(new_vehicle_data)
+    print(odometer_summary(odometer_data))
 
     # Plotting Odometer Changes Over Time by Vehicle
-    plot_odometer_changes(odometer_data, 'odometer_changes_over_time.png')
+    odometer_columns = ['Trip Started', 'Odometer Difference']
+    charts.add(plot_odometer_changes, 'odometer_changes_over_time.png', odometer_data.select(odometer_columns))
 
     # Plotting Odometer Differences Summary Statistics by Vehicle with Colors
     new_vehicle_data['Total Duration (Minutes)'] = new_vehicle_data['Driving Duration (Minutes)'] + new_vehicle_data['Idling Duration (Minutes)']
-    plot_odometer_diff_summary(odometer_data, 'odometer_diff_summary_by_vehicle.png')
+    charts.add(plot_odometer_diff_summary, 'odometer_diff_summary_by_vehicle.png', odometer_data.select(odometer_columns))
 
     # Plotting Efficiency Analysis
-    plot_efficiency_analysis(new_vehicle_data, 'efficiency_analysis_scatterplot.png')
+    efficiency_columns = ['Total Duration (Minutes)', 'Maximum Speed', 'Idling Duration (Minutes)']
+    charts.add(plot_efficiency_analysis, 'efficiency_analysis_scatterplot.png', new_vehicle_data[efficiency_columns])
 
     # Location-Based Analysis
     location_summary = location_analysis(new_vehicle_data)
     print(location_summary)    
     
-    # Convert Odometer readings to numeric values if not already
-    new_vehicle_data['Start Odometer'] = pd.to_numeric(new_vehicle_data['Start Odometer'], errors='coerce')
-    new_vehicle_data['End Odometer'] = pd.to_numeric(new_vehicle_data['End Odometer'], errors='coerce')
+    # Rollup cube: per vehicle and day/week/month/year totals, built once from the trips
+    with stage('build_cube', rows_in=len(new_vehicle_data)) as span:
+        cube = build_cube(new_vehicle_data, 'geotab')
+        span.rows_out = len(cube)
 
     # Distance Covered Analysis
-    daily_dist, weekly_dist, monthly_dist, yearly_dist = calculate_distance_covered(new_vehicle_data)
+    daily_dist, weekly_dist, monthly_dist, yearly_dist = calculate_distance_covered(cube)
     print(daily_dist, weekly_dist, monthly_dist, yearly_dist)
     # You can add code here to print these results or plot them as needed.
-    plot_daily_distance_covered(daily_dist, 'daily_distance_covered.png')
-    plot_aggregated_distance_covered(weekly_dist, 'Weekly Distance Covered per Vehicle', 'weekly_distance_covered.png')
-    plot_aggregated_distance_covered(monthly_dist, 'Monthly Distance Covered per Vehicle', 'monthly_distance_covered.png')
-    plot_aggregated_distance_covered(yearly_dist, 'Yearly Distance Covered per Vehicle', 'yearly_distance_covered.png')
+    charts.add(plot_daily_distance_covered, 'daily_distance_covered.png', daily_dist)
+    charts.add(plot_aggregated_distance_covered, 'weekly_distance_covered.png', weekly_dist, 'Weekly Distance Covered per Vehicle')
+    charts.add(plot_aggregated_distance_covered, 'monthly_distance_covered.png', monthly_dist, 'Monthly Distance Covered per Vehicle')
+    charts.add(plot_aggregated_distance_covered, 'yearly_distance_covered.png', yearly_dist, 'Yearly Distance Covered per Vehicle')
     
+    # Fuel: fill-ups from the fuel log shared out over the trips between them (one as-of
+    # merge, see fuel_log.py); without a log, the per-vehicle table above
+    trip_fuel = None
+    fuel_table = fuel_economy_data
+    if os.path.exists(FUEL_LOG_FILE):
+        with stage('attribute_fuel', rows_in=len(new_vehicle_data)):
+            trip_fuel = attribute_fuel(new_vehicle_data, read_fuel_log(FUEL_LOG_FILE))
+            fuel_table = fuel_economy(new_vehicle_data, trip_fuel).reset_index()
+
     # Analysis 1: Average Fuel Economy per Vehicle
-    avg_fuel_economy = merged_data.groupby('Vehicle')['Fuel Economy'].mean()
-    plot_avg_fuel_economy(avg_fuel_economy, 'avg_fuel_economy_per_vehicle.png')
+    fuel_data = merge_fuel_data(cube, fuel_table)
+    avg_fuel_economy = fuel_data['Fuel Economy']
+    charts.add(plot_avg_fuel_economy, 'avg_fuel_economy_per_vehicle.png', avg_fuel_economy)
 
     # Analysis 2: Distance Covered vs. Fuel Used per Vehicle
-    merged_data['Distance Covered'] = merged_data['End Odometer'] - merged_data['Start Odometer']
-    total_distance = merged_data.groupby('Vehicle')['Distance Covered'].sum()
-    fuel_used_data = merged_data.groupby('Vehicle')['Fuel Used'].sum()
-    plot_distance_vs_fuel_used(total_distance, fuel_used_data, 'distance_vs_fuel_used_per_vehicle.png')
-
-    # Analysis 3: Fuel Economy Trend Over Time
-    merged_data['Month'] = pd.to_datetime(merged_data['Trip Started']).dt.to_period('M')
-    fuel_economy_trend = merged_data.groupby(['Vehicle', 'Month'])['Fuel Economy'].mean()
-    plot_fuel_economy_trend(fuel_economy_trend, 'fuel_economy_trend_over_time.png')
+    total_distance = fuel_data['Distance Covered']
+    # 'Fuel Used' is already the vehicle's total, from the fuel log or the per-vehicle table
+    fuel_used_data = fuel_data['Fuel Used'].fillna(0)
+    charts.add(plot_distance_vs_fuel_used, 'distance_vs_fuel_used_per_vehicle.png', total_distance, fuel_used_data)
+
+    # Electrification scenarios: every EV model / fuel / grid intensity / price combination,
+    # evaluated at once over the per-vehicle daily distances (scenarios.py)
+    with stage('scenarios'):
+        scenario_results = evaluate_scenarios(distance_matrix(cube), fuel_data['Fuel Economy'], scenario_grid())
+    best = best_scenarios(scenario_results)[['EV Model', 'Fuel', 'Grid Intensity', 'Fuel Price', 'tCO2e Saved', 'Cost Saved']]
+    print(best.round(2).to_string())
+
+    # EV state of charge: each vehicle's trips replayed for every EV model and charging
+    # policy, infeasible days per vehicle (ev_soc.py)
+    with stage('ev_soc', rows_in=len(odometer_data.frame)):
+        soc_summary, _ = simulate(trip_sequences(odometer_data))
+    print(feasibility_table(soc_summary).to_string())
+
+    # Analysis 3: Fuel Economy Trend Over Time, from the fuel attributed to each month's trips
+    # (a per-vehicle table has no trend to show)
+    if trip_fuel is None:
+        print(f"No fuel log ({FUEL_LOG_FILE}); fuel economy trend skipped")
+    else:
+        fuel_economy_trend = fuel_economy(new_vehicle_data, trip_fuel, 'M')['Fuel Economy'].dropna()
+        print(fuel_economy_trend)
+        charts.add(plot_fuel_economy_trend, 'fuel_economy_trend_over_time.png', fuel_economy_trend)
+
+    with stage('render_charts'):
+        charts.render()
 
 
 if __name__ == "__main__":
@@ -1,23 +1,15 @@
-import pandas as pd
 import matplotlib.pyplot as plt
 import seaborn as sns
 import numpy as np
+from durations import to_minutes
+from excel_cache import read_frame
+from topk import top_k_per_group
 
 file_path_oct = 'Merged_3mon.xlsx'
-vehicle_data_oct = pd.read_excel(file_path_oct)
-
-# Function to convert 'HH:MM:SS' to minutes
-def convert_to_minutes(time_str):
-    if pd.isnull(time_str) or time_str == '':
-        return None
-    try:
-        h, m, s = map(int, time_str.split(':'))
-        return h * 60 + m + s / 60
-    except ValueError:
-        return None
+vehicle_data_oct = read_frame(file_path_oct)
 
 # Apply the conversion to the 'Time for Call' column
-vehicle_data_oct['Trip Duration'] = vehicle_data_oct['Time for Call'].apply(convert_to_minutes)
+vehicle_data_oct['Trip Duration'] = to_minutes(vehicle_data_oct['Time for Call'])
 
 # Round the trip duration to the nearest 5 minutes
 vehicle_data_oct['Rounded Trip Duration'] = 5 * np.round(vehicle_data_oct['Trip Duration'] / 5)
@@ -31,7 +23,7 @@ plt.figure(figsize=(20, 12))  # Increase figure size to accommodate tables
 
 # Most Common Destinations
 valid_destinations = vehicle_data_oct[~vehicle_data_oct['To'].isin(['nan', 'Mileage', 'Start of Day', 'End of Day', 'Total for Day', 'Truck Washed', '.', 'DOCK'])]
-destination_counts = valid_destinations['To'].value_counts().head(10)
+destination_counts = top_k_per_group(valid_destinations, [], 'To', 10)
 plt.subplot(2, 3, 1)  # Change to 2, 3, 1 for the first subplot in the first row
 sns.barplot(x=destination_counts.values, y=destination_counts.index)
 plt.title('Top 10 Most Common Destinations')
@@ -1,30 +1,27 @@
-import pandas as pd
-from dateutil.parser import parse
-import numpy as np
+import sys
 
-# convert various date formats to 'yyyy-mm-dd'
-def convert_date(date_entry):
-    try:
-        # Convert to string if not already a string
-        if not isinstance(date_entry, str):
-            date_entry = str(date_entry)
-        # Use dateutil's parse to handle various formats
-        date_obj = parse(date_entry)
-        # Convert to 'yyyy-mm-dd' format
-        return date_obj.strftime('%Y-%m-%d')
-    except (ValueError, TypeError):
-        # Return NaN for unparseable dates
-        return np.nan
+from dates import normalize_dates
+from excel_cache import read_frame, write_excel_cached, write_frame
 
+# python "3 date modify.py" [--excel]
 def main():
     file_path = 'Merged_3mon.xlsx'
     output_file_path = 'modified_dates.xlsx' 
 
-    data = pd.read_excel(file_path)
+    data = read_frame(file_path)
 
-    data['Date'] = data['Date'].apply(convert_date)
+    # Parse every distinct date once into a real datetime column (time of day dropped)
+    dates, fallback_rows = normalize_dates(data['Date'])
+    data['Date'] = dates.dt.normalize()
 
-    data.to_excel(output_file_path, index=False)
+    if not fallback_rows.empty:
+        print(f"{len(fallback_rows)} rows needed the fallback date parser:")
+        print(fallback_rows.drop_duplicates('Raw').to_string())
+
+    # '4 merge.py' reads the frame; the workbook is only written with --excel
+    write_frame(data, output_file_path)
+    if '--excel' in sys.argv:
+        write_excel_cached(data, output_file_path)
     print(f"File saved as '{output_file_path}'")
 
 if __name__ == "__main__":
@@ -1,51 +1,43 @@
 import pandas as pd
 import matplotlib.pyplot as plt
 import seaborn as sns
+from dates import normalize_dates
+from excel_cache import read_frame
+from visit_metrics import aggregate_visits, metric_series, to_long_format, top_destinations
 
-data = pd.read_excel('modified_dates.xlsx')
+data = read_frame('modified_dates.xlsx')
 
 # Convert 'Date' to datetime format
-data['Date'] = pd.to_datetime(data['Date'], errors='coerce', format='%Y-%m-%d')
-
-# Convert 'Week' and 'Month' to string for consistent index type
-data['Week'] = data['Week'].astype(str)
-data['Month'] = data['Month'].astype(str)
+data['Date'] = normalize_dates(data['Date'])[0]
 
 # Vehicle columns
 vehicle_columns = ['#14', '#38A', '#46', '#47', '#51']
 
-# Adding a helper column for easier calculation of visits and driving time
-data['Visit'] = data[vehicle_columns].sum(axis=1)
-data['DrivingTime'] = pd.to_timedelta(data['Time for Call'])
-
-# Filtering only rows where a vehicle was used (Visit > 0)
-vehicle_data = data[data['Visit'] > 0]
-vehicle_data['DateString'] = vehicle_data['Date'].dt.strftime('%Y-%m-%d')
+# One row per (log row, vehicle used) with its date, week, month, destination and driving time,
+# then every metric for every vehicle and period in one grouped pass
+long_data = to_long_format(data, vehicle_columns)
+metrics, destinations = aggregate_visits(long_data)
 
 # Prepare the Excel writer for exporting results
 with pd.ExcelWriter('Vehicle_Analysis.xlsx') as writer:
     for vehicle in vehicle_columns:
-        vehicle_specific_data = vehicle_data[vehicle_data[vehicle] > 0]
-        
         # Analysis
-        daily_visits = vehicle_specific_data['DateString'].value_counts().sort_index()
-        weekly_visits = vehicle_specific_data['Week'].value_counts().sort_index()
-        monthly_visits = vehicle_specific_data['Month'].value_counts().sort_index()
-        total_driving_time_daily = vehicle_specific_data.groupby('DateString')['DrivingTime'].sum()
-        total_driving_time_weekly = vehicle_specific_data.groupby('Week')['DrivingTime'].sum()
-        total_driving_time_monthly = vehicle_specific_data.groupby('Month')['DrivingTime'].sum()
+        daily_visits = metric_series(metrics, vehicle, 'Daily', 'Visits')
+        weekly_visits = metric_series(metrics, vehicle, 'Weekly', 'Visits')
+        monthly_visits = metric_series(metrics, vehicle, 'Monthly', 'Visits')
+        total_daily_driving_time_hours = metric_series(metrics, vehicle, 'Daily', 'Driving Hours')
+        total_weekly_driving_time_hours = metric_series(metrics, vehicle, 'Weekly', 'Driving Hours')
+        total_monthly_driving_time_hours = metric_series(metrics, vehicle, 'Monthly', 'Driving Hours')
         
-        # Exclude 'DOCK' and count top 10 locations for each period
-        valid_destinations = vehicle_specific_data[vehicle_specific_data['To'] != 'DOCK']
-
-        top_daily_locations = valid_destinations.groupby('DateString')['To'].apply(lambda x: x.value_counts().head(10))
-        top_weekly_locations = valid_destinations.groupby('Week')['To'].apply(lambda x: x.value_counts().head(10))
-        top_monthly_locations = valid_destinations.groupby('Month')['To'].apply(lambda x: x.value_counts().head(10))
+        # Top 10 locations for each period ('DOCK' excluded)
+        top_daily_locations = top_destinations(destinations, vehicle, 'Daily', 10)
+        top_weekly_locations = top_destinations(destinations, vehicle, 'Weekly', 10)
+        top_monthly_locations = top_destinations(destinations, vehicle, 'Monthly', 10)
         
         # Unique place visits
-        unique_daily_visits = valid_destinations.groupby('DateString')['To'].nunique()
-        unique_weekly_visits = valid_destinations.groupby('Week')['To'].nunique()
-        unique_monthly_visits = valid_destinations.groupby('Month')['To'].nunique()
+        unique_daily_visits = metric_series(metrics, vehicle, 'Daily', 'Unique Visits')
+        unique_weekly_visits = metric_series(metrics, vehicle, 'Weekly', 'Unique Visits')
+        unique_monthly_visits = metric_series(metrics, vehicle, 'Monthly', 'Unique Visits')
 
         # Save analysis and top locations to Excel
         combined_df = pd.DataFrame({
@@ -55,9 +47,9 @@ with pd.ExcelWriter('Vehicle_Analysis.xlsx') as writer:
             'Unique Weekly Visits': unique_weekly_visits,
             'Monthly Visits': monthly_visits,
             'Unique Monthly Visits': unique_monthly_visits,
-            'Total Driving Time Daily (hours)': total_driving_time_daily / pd.Timedelta(hours=1),
-            'Total Driving Time Weekly (hours)': total_driving_time_weekly / pd.Timedelta(hours=1),
-            'Total Driving Time Monthly (hours)': total_driving_time_monthly / pd.Timedelta(hours=1),
+            'Total Driving Time Daily (hours)': total_daily_driving_time_hours,
+            'Total Driving Time Weekly (hours)': total_weekly_driving_time_hours,
+            'Total Driving Time Monthly (hours)': total_monthly_driving_time_hours,
         }).fillna(0)
         combined_df.to_excel(writer, sheet_name=f'{vehicle}_Analysis')
 
@@ -65,17 +57,10 @@ with pd.ExcelWriter('Vehicle_Analysis.xlsx') as writer:
         top_weekly_locations.to_excel(writer, sheet_name=f'{vehicle}_Top_Weekly_Locations')
         top_monthly_locations.to_excel(writer, sheet_name=f'{vehicle}_Top_Monthly_Locations')
         
-        valid_destinations = vehicle_specific_data[vehicle_specific_data['To'] != 'DOCK']
-        
         # Sort the top locations in decreasing order
-        top_daily_locations = valid_destinations.groupby('DateString')['To'].apply(lambda x: x.value_counts().head(3)).sort_values(ascending=False).reset_index(level=0, drop=True)
-        top_weekly_locations = valid_destinations.groupby('Week')['To'].apply(lambda x: x.value_counts().head(5)).sort_values(ascending=False).reset_index(level=0, drop=True)
-        top_monthly_locations = valid_destinations.groupby('Month')['To'].apply(lambda x: x.value_counts().head(10)).sort_values(ascending=False).reset_index(level=0, drop=True)
-    
-        # Total Driving Time for Daily, Weekly, Monthly in hours
-        total_daily_driving_time_hours = vehicle_specific_data.groupby('DateString')['DrivingTime'].sum() / pd.Timedelta(hours=1)
-        total_weekly_driving_time_hours = vehicle_specific_data.groupby('Week')['DrivingTime'].sum() / pd.Timedelta(hours=1)
-        total_monthly_driving_time_hours = vehicle_specific_data.groupby('Month')['DrivingTime'].sum() / pd.Timedelta(hours=1)
+        top_daily_locations = top_destinations(destinations, vehicle, 'Daily', 3).sort_values(ascending=False).reset_index(level=0, drop=True)
+        top_weekly_locations = top_destinations(destinations, vehicle, 'Weekly', 5).sort_values(ascending=False).reset_index(level=0, drop=True)
+        top_monthly_locations = top_destinations(destinations, vehicle, 'Monthly', 10).sort_values(ascending=False).reset_index(level=0, drop=True)
     
         # Visualization
         # Top 10 Visited Locations for Daily, Weekly, Monthly
@@ -1,29 +1,67 @@
 
 import pandas as pd
+from excel_stream import iter_excel_batches
+from topk import SpaceSaving
+from visit_sketches import VisitSketches
 
 # Load the data from the specified sheet "SepNov"
 file_path = '0 GeoTab full year.xlsx'
 sheet_name = 'Sheet1 (2)'
 
-# Load the data
-data_sep_nov = pd.read_excel(file_path, sheet_name=sheet_name)
-
 # Filter data for specified vehicles
 vehicles = ['46', '47', '14A', '51', '38A']  # Update this list if you have different vehicle identifiers
-filtered_data = data_sep_nov[data_sep_nov['Vehicle'].isin(vehicles)]
 
-# Extract date from "Trip Started" to identify visits per day
-filtered_data['Date'] = filtered_data['Trip Started'].dt.date
+# Stream the export in batches so memory is bounded by the batch size, not the file.
+# Per batch we keep the trip counts and per vehicle per day unique-visit sketches;
+# counts add up across batches and the sketches merge into weeks, months or any range.
+columns = ['Vehicle', 'Trip Started', 'End Location Modified']
+dtypes = {'Vehicle': str, 'Trip Started': 'datetime64[ns]', 'End Location Modified': str}
+total_visits = None
+# 'exact' keeps the distinct visits; 'approx' keeps a sparse HyperLogLog sketch per vehicle
+# per day instead (a few bytes per distinct visit, about 1.6% error). For a handful of
+# vehicles exact is just as cheap; for hundreds of vehicles over years approx holds about
+# a tenth of the memory.
+unique_mode = 'exact'
+unique_sketches = VisitSketches(mode=unique_mode)
+# Bounded-memory ranking of the most visited locations over the whole export
+top_locations = SpaceSaving(capacity=1000)
+
+for batch in iter_excel_batches(file_path, sheet_name=sheet_name, usecols=columns, dtypes=dtypes):
+    filtered_data = batch[batch['Vehicle'].isin(vehicles)].copy()
+
+    # Extract date from "Trip Started" to identify visits per day
+    filtered_data['Date'] = filtered_data['Trip Started'].dt.date
+
+    batch_counts = filtered_data.groupby(['Date', 'Vehicle'])['End Location Modified'].count()
+    total_visits = batch_counts if total_visits is None else total_visits.add(batch_counts, fill_value=0)
+
+    unique_sketches.add(filtered_data['Vehicle'], filtered_data['Trip Started'], filtered_data['End Location Modified'])
+
+    top_locations.update(filtered_data['End Location Modified'].dropna())
 
 # Count unique and total visits per day per vehicle
 # Assuming a "visit" is defined by a unique start location
-visits_per_vehicle_per_day = filtered_data.groupby(['Date', 'Vehicle'])['End Location Modified'].agg(['nunique', 'count']).reset_index()
-visits_per_vehicle_per_day.rename(columns={'nunique': 'Unique Visits', 'count': 'Total Visits'}, inplace=True)
+unique_visits = unique_sketches.unique_visits('D').round().astype(int)
+unique_visits.index = pd.MultiIndex.from_arrays(
+    [unique_visits.index.get_level_values('Period').to_timestamp().date, unique_visits.index.get_level_values('Vehicle')],
+    names=['Date', 'Vehicle'])
+visits_per_vehicle_per_day = pd.DataFrame({'Unique Visits': unique_visits, 'Total Visits': total_visits}).fillna(0).astype(int).reset_index()
 
 # Specify your desired output file path
 output_file_path = 'your_output_file_path_here11.xlsx'  # Update this path
 
 # Save the processed data to an Excel file
-visits_per_vehicle_per_day.to_excel(output_file_path, index=False, sheet_name='VisitsPerVehiclePerDay')
+# Weekly and monthly unique visits come from merging the daily sketches, not a re-scan
+with pd.ExcelWriter(output_file_path) as writer:
+    visits_per_vehicle_per_day.to_excel(writer, index=False, sheet_name='VisitsPerVehiclePerDay')
+    for sheet, freq in [('UniqueVisitsPerWeek', 'W-SUN'), ('UniqueVisitsPerMonth', 'M')]:
+        periods = unique_sketches.unique_visits(freq).round().astype(int).reset_index()
+        periods['Period'] = periods['Period'].astype(str)
+        periods.to_excel(writer, index=False, sheet_name=sheet)
 
 print(f"Output saved to {output_file_path}")
+if unique_mode == 'approx':
+    print(f"Unique visits are estimates (relative standard error {unique_sketches.error_bound:.1%})")
+
+print("Most visited locations (count may overestimate by at most 'Error'):")
+print(top_locations.top(10))
@@ -0,0 +1,106 @@
+import datetime
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from durations import to_minutes, to_seconds
+
+
+# The row-wise converter from '1 improved.py' / '0 preview.py' before durations.py
+def legacy_convert_to_minutes(time_value):
+    if pd.isna(time_value):
+        return 0
+    if isinstance(time_value, str):
+        time_parts = datetime.datetime.strptime(time_value, '%H:%M:%S.%f')
+    elif isinstance(time_value, datetime.time):
+        time_parts = time_value
+    else:
+        return 0
+    total_minutes = time_parts.hour * 60 + time_parts.minute + time_parts.second / 60
+    return total_minutes
+
+
+# The 'Time for Call' converter from '2 visualize overall.py' before durations.py
+def legacy_call_minutes(time_str):
+    if pd.isnull(time_str) or time_str == '':
+        return None
+    try:
+        h, m, s = map(int, time_str.split(':'))
+        return h * 60 + m + s / 60
+    except ValueError:
+        return None
+
+
+# GeoTab-style column: mostly datetime.time, some 'HH:MM:SS.ffffff' strings and gaps
+def make_trip_durations(n_rows, rng):
+    seconds = rng.integers(0, 6 * 3600, n_rows)
+    micros = rng.integers(0, 1000, n_rows) * 1000
+    values = np.empty(n_rows, dtype=object)
+    kind = rng.random(n_rows)
+    for i in range(n_rows):
+        s = int(seconds[i])
+        t = datetime.time(s // 3600, s // 60 % 60, s % 60, int(micros[i]))
+        if kind[i] < 0.8:
+            values[i] = t
+        elif kind[i] < 0.98:
+            values[i] = t.strftime('%H:%M:%S.%f')
+        else:
+            values[i] = np.nan
+    return pd.Series(values, name='Stop Duration')
+
+
+# Manual-log style column: 'HH:MM:SS' strings
+def make_call_durations(n_rows, rng):
+    seconds = rng.integers(0, 3 * 3600, n_rows)
+    values = [f'{s // 3600:02d}:{s // 60 % 60:02d}:{s % 60:02d}' for s in seconds]
+    return pd.Series(values, name='Time for Call')
+
+
+def timed(label, func):
+    start = time.perf_counter()
+    result = func()
+    elapsed = time.perf_counter() - start
+    print(f"{label:<45} {elapsed:8.3f}s")
+    return result, elapsed
+
+
+def main():
+    n_rows = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    rng = np.random.default_rng(0)
+    print(f"Building {n_rows:,} rows of test durations...")
+    trip_durations = make_trip_durations(n_rows, rng)
+    call_durations = make_call_durations(n_rows, rng)
+
+    print(f"\nStop/Driving/Idling Duration ({n_rows:,} rows)")
+    legacy, legacy_time = timed('apply(convert_to_minutes)', lambda: trip_durations.apply(legacy_convert_to_minutes))
+    vectorized, vector_time = timed('durations.to_minutes(fill=0)', lambda: to_minutes(trip_durations, fill=0))
+    timed('durations.to_seconds', lambda: to_seconds(trip_durations))
+    print(f"{'speed-up':<45} {legacy_time / vector_time:8.1f}x")
+    # The legacy converter drops sub-second precision; compare at that resolution
+    gap = np.abs(vectorized.values - legacy.values).max()
+    print(f"{'max |difference| (minutes, < 1/60 expected)':<45} {gap:8.4f}")
+
+    print(f"\nTime for Call ({n_rows:,} rows)")
+    legacy, legacy_time = timed('apply(convert_to_minutes) [visualize]', lambda: call_durations.apply(legacy_call_minutes))
+    vectorized, vector_time = timed('durations.to_minutes', lambda: to_minutes(call_durations))
+    print(f"{'speed-up':<45} {legacy_time / vector_time:8.1f}x")
+    identical = np.allclose(vectorized.values, legacy.astype(float).values, equal_nan=True)
+    print(f"{'identical results':<45} {str(identical):>8}")
+
+    sample_path = 'GeoTab 3 month git.xlsx'
+    if os.path.exists(sample_path):
+        from excel_cache import read_excel_cached
+        sample = read_excel_cached(sample_path)
+        repeats = -(-n_rows // len(sample))
+        column = pd.concat([sample['Stop Duration']] * repeats, ignore_index=True)[:n_rows]
+        print(f"\nStop Duration from '{sample_path}' repeated to {len(column):,} rows")
+        _, legacy_time = timed('apply(convert_to_minutes)', lambda: column.apply(legacy_convert_to_minutes))
+        _, vector_time = timed('durations.to_minutes(fill=0)', lambda: to_minutes(column, fill=0))
+        print(f"{'speed-up':<45} {legacy_time / vector_time:8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
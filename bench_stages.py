@@ -0,0 +1,316 @@
+import csv
+import importlib.util
+import json
+import math
+import os
+import subprocess
+import sys
+import time
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+from chart_render import pyplot
+from dates import normalize_dates
+from excel_cache import read_cache, read_excel_cached, write_cache
+from fleet_synth import GEOTAB_SAMPLE, MANUAL_SAMPLE, fit_geotab, fit_manual, generate_geotab, generate_manual
+from heatmaps import build_heatmaps, build_visit_grid
+from manual_logs import tidy_month_data
+from rollup_cube import build_cube
+from visit_metrics import VEHICLE_COLUMNS, aggregate_visits, metric_series, to_long_format, top_destinations
+
+try:
+    import resource
+except ImportError:  # Windows: no peak RSS
+    resource = None
+
+
+BENCH_DIR = 'bench'
+DATA_DIR = os.path.join(BENCH_DIR, 'data')
+RESULTS_FILE = os.path.join(BENCH_DIR, 'results.csv')
+BASELINE_FILE = os.path.join(BENCH_DIR, 'baseline.json')
+CURVES_FILE = os.path.join(BENCH_DIR, 'scaling.png')
+RESULT_COLUMNS = ['Run', 'Stage', 'Trips', 'Vehicles', 'Seconds', 'Peak RSS MB', 'Stage RSS MB', 'Trips per Second']
+
+# (trips, vehicles) ladder; manual-log stages use the same row counts with their five fixed vehicles
+SIZES = [(10_000, 5), (100_000, 50), (1_000_000, 200), (10_000_000, 1000)]
+# A stage fails when it takes more than THRESHOLD x its baseline time at the same size
+THRESHOLD = 1.25
+SEED = 0
+
+
+# Import one of the numbered scripts ('1 improved.py') as a module; main() is not run
+def load_script(path):
+    name = os.path.splitext(os.path.basename(path))[0].replace(' ', '_')
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+@lru_cache(maxsize=None)
+def improved():
+    return load_script('1 improved.py')
+
+
+def run_convert_time_columns(trips):
+    improved().convert_time_columns(trips)
+
+
+def run_odometer_differences(trips):
+    improved().calculate_odometer_differences(trips)
+
+
+def run_distance_covered(trips):
+    improved().calculate_distance_covered(build_cube(trips, 'geotab'))
+
+
+def run_location_analysis(trips):
+    improved().location_analysis(trips)
+
+
+# What '3 date modify.py' does to the I1 date text
+def run_date_parsing(log):
+    normalize_dates(log['Date'])[0].dt.normalize()
+
+
+def parsed_dates(log):
+    log['Date'] = normalize_dates(log['Date'])[0].dt.normalize()
+    return log
+
+
+# The computations of '4 merge.py': one grouped pass, then the per-vehicle lookups (no Excel, no charts)
+def run_vehicle_loop(log):
+    metrics, destinations = aggregate_visits(to_long_format(log, VEHICLE_COLUMNS))
+    for vehicle in VEHICLE_COLUMNS:
+        for granularity in ('Daily', 'Weekly', 'Monthly'):
+            for metric in ('Visits', 'Unique Visits', 'Driving Hours'):
+                metric_series(metrics, vehicle, granularity, metric)
+            top_destinations(destinations, vehicle, granularity, 10)
+
+
+# heatmaps.py without the file writes: the visit grid, then every map rendered to HTML
+def run_heatmaps(trips):
+    for m in build_heatmaps(build_visit_grid([trips])).values():
+        m.get_root().render()
+
+
+# name -> (dataset, preparation outside the timing or None, timed stage)
+STAGES = {
+    'convert_time_columns': ('geotab', None, run_convert_time_columns),
+    'calculate_odometer_differences': ('geotab', None, run_odometer_differences),
+    'calculate_distance_covered': ('geotab', None, run_distance_covered),
+    'location_analysis': ('geotab', None, run_location_analysis),
+    'heatmaps': ('geotab', None, run_heatmaps),
+    'date_parsing': ('manual', None, run_date_parsing),
+    'vehicle_loop': ('manual', parsed_dates, run_vehicle_loop),
+}
+
+
+def dataset_path(kind, trips, vehicles, seed=SEED):
+    if kind == 'manual':
+        return os.path.join(DATA_DIR, f'manual_{trips}_{seed}')
+    return os.path.join(DATA_DIR, f'geotab_{trips}_{vehicles}_{seed}')
+
+
+# Seeded synthetic data (fleet_synth) of exactly `trips` rows, generated once per size and
+# kept as an Arrow file so every stage process maps the same rows
+def ensure_dataset(kind, trips, vehicles, seed=SEED):
+    base_path = dataset_path(kind, trips, vehicles, seed)
+    if os.path.exists(base_path + '.arrow'):
+        return base_path
+    os.makedirs(DATA_DIR, exist_ok=True)
+    start = time.perf_counter()
+    if kind == 'geotab':
+        profile = fit_geotab(read_excel_cached(GEOTAB_SAMPLE, verbose=False))
+        per_vehicle_day = np.mean([a['active'].mean() * a['trips'].mean() for a in profile['archetypes'].values()])
+        days = math.ceil(trips / (vehicles * per_vehicle_day) * 1.2) + 7
+        data = generate_geotab(profile, vehicles, days, seed=seed).head(trips)
+    else:
+        profile = fit_manual(read_excel_cached(MANUAL_SAMPLE, verbose=False))
+        # Full sheets (up to 217 calls a day), so large sizes stay inside pandas' date range
+        days = math.ceil(trips / 200 * 7 / 5) + 7
+        log = generate_manual(profile, days, seed=seed, calls_scale=10.0).head(trips)
+        data = tidy_month_data(log.assign(**{'Source File': log['Month']}))
+    write_cache(data.reset_index(drop=True), base_path)
+    print(f"Generated {kind} dataset of {len(data):,} rows in {time.perf_counter() - start:.1f}s")
+    return base_path
+
+
+def peak_rss_mb():
+    if resource is None:
+        return float('nan')
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 1024 ** 2 if sys.platform == 'darwin' else peak / 1024  # bytes on macOS, KB elsewhere
+
+
+# Runs in a fresh process per (stage, size) so its peak RSS belongs to that stage alone
+def measure_stage(name, base_path):
+    _, prepare, stage = STAGES[name]
+    data = read_cache(base_path)
+    if prepare is not None:
+        data = prepare(data)
+    improved()  # imported before the clock starts
+    loaded_mb = peak_rss_mb()
+    start = time.perf_counter()
+    stage(data)
+    seconds = time.perf_counter() - start
+    peak_mb = peak_rss_mb()
+    return {'Seconds': seconds, 'Peak RSS MB': peak_mb, 'Stage RSS MB': peak_mb - loaded_mb, 'Rows': len(data)}
+
+
+def run_in_subprocess(name, base_path):
+    result = subprocess.run([sys.executable, __file__, '--measure', name, base_path],
+                            capture_output=True, text=True, env=dict(os.environ, MPLBACKEND='Agg'))
+    if result.returncode != 0:
+        raise RuntimeError(f"Stage {name} failed on {base_path}:\n{result.stderr}")
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+# Every selected stage at every size; the fastest of `repeat` runs is kept
+def run_benchmarks(stages=None, sizes=SIZES, repeat=1, seed=SEED):
+    run_id = time.strftime('%Y-%m-%dT%H:%M:%S')
+    rows = []
+    for trips, vehicles in sizes:
+        for name in stages or list(STAGES):
+            kind = STAGES[name][0]
+            base_path = ensure_dataset(kind, trips, vehicles, seed)
+            runs = [run_in_subprocess(name, base_path) for _ in range(repeat)]
+            best = min(runs, key=lambda r: r['Seconds'])
+            row = {
+                'Run': run_id, 'Stage': name, 'Trips': best['Rows'], 'Vehicles': vehicles if kind == 'geotab' else 5,
+                'Seconds': round(best['Seconds'], 4),
+                'Peak RSS MB': round(max(r['Peak RSS MB'] for r in runs), 1),
+                'Stage RSS MB': round(max(r['Stage RSS MB'] for r in runs), 1),
+                'Trips per Second': round(best['Rows'] / best['Seconds']) if best['Seconds'] > 0 else float('nan'),
+            }
+            rows.append(row)
+            print(f"{name:<32} {row['Trips']:>11,} trips {row['Vehicles']:>5} vehicles "
+                  f"{row['Seconds']:9.3f}s {row['Peak RSS MB']:9.1f} MB peak {row['Trips per Second']:>12,} trips/s")
+    return pd.DataFrame(rows, columns=RESULT_COLUMNS)
+
+
+def append_results(results, results_path=RESULTS_FILE):
+    os.makedirs(os.path.dirname(results_path), exist_ok=True)
+    new_file = not os.path.exists(results_path)
+    with open(results_path, 'a', newline='') as f:
+        writer = csv.writer(f)
+        if new_file:
+            writer.writerow(RESULT_COLUMNS)
+        writer.writerows(results[RESULT_COLUMNS].values.tolist())
+
+
+# Baseline: {stage: {trips: seconds}}
+def save_baseline(results, baseline_path=BASELINE_FILE):
+    baseline = load_baseline(baseline_path)
+    for row in results.itertuples(index=False):
+        baseline.setdefault(row.Stage, {})[str(row.Trips)] = row.Seconds
+    with open(baseline_path, 'w') as f:
+        json.dump(baseline, f, indent=1, sort_keys=True)
+    print(f"Baseline saved to {baseline_path}")
+
+
+def load_baseline(baseline_path=BASELINE_FILE):
+    if not os.path.exists(baseline_path):
+        return {}
+    with open(baseline_path) as f:
+        return json.load(f)
+
+
+# Stages slower than threshold x baseline at the same size, as (stage, trips, seconds, baseline)
+def regressions(results, baseline, threshold=THRESHOLD):
+    slower = []
+    for row in results.itertuples(index=False):
+        reference = baseline.get(row.Stage, {}).get(str(row.Trips))
+        if reference is not None and row.Seconds > threshold * reference:
+            slower.append((row.Stage, row.Trips, row.Seconds, reference))
+    return slower
+
+
+# Time and throughput against trips for each stage, log-log, one line per stage
+def plot_scaling_curves(results, filename=CURVES_FILE):
+    plt = pyplot()
+    fig, (time_ax, rate_ax) = plt.subplots(ncols=2, figsize=(16, 7))
+    for stage, stage_results in results.groupby('Stage', sort=False):
+        stage_results = stage_results.sort_values('Trips')
+        time_ax.plot(stage_results['Trips'], stage_results['Seconds'], marker='o', label=stage)
+        rate_ax.plot(stage_results['Trips'], stage_results['Trips per Second'], marker='o', label=stage)
+    for ax, label in ((time_ax, 'Wall time (s)'), (rate_ax, 'Throughput (trips/s)')):
+        ax.set_xscale('log')
+        ax.set_yscale('log')
+        ax.set_xlabel('Trips')
+        ax.set_ylabel(label)
+        ax.grid(True, which='both', alpha=0.3)
+    time_ax.set_title('Stage time by data size')
+    rate_ax.set_title('Stage throughput by data size')
+    time_ax.legend()
+    plt.tight_layout()
+    plt.savefig(filename)
+    plt.close(fig)
+    print(f"Scaling curves saved to {filename}")
+
+
+# '10k:5,1m:200' -> [(10000, 5), (1000000, 200)]
+def parse_sizes(text):
+    multipliers = {'k': 1_000, 'm': 1_000_000}
+    sizes = []
+    for item in text.split(','):
+        trips, vehicles = item.split(':')
+        factor = multipliers.get(trips[-1].lower(), 1)
+        sizes.append((int(float(trips.rstrip('kKmM')) * factor), int(vehicles)))
+    return sizes
+
+
+def pop_option(args, name, default):
+    if name not in args:
+        return default
+    position = args.index(name)
+    value = args[position + 1]
+    del args[position:position + 2]
+    return value
+
+
+# python bench_stages.py [stage ...] [--sizes 10k:5,100k:50,1m:200,10m:1000] [--repeat N]
+#                        [--threshold 1.25] [--save-baseline] [--list]
+# Results are appended to bench/results.csv and plotted to bench/scaling.png. Exits with 1 when
+# a stage is slower than threshold x bench/baseline.json at the same size.
+def main():
+    args = sys.argv[1:]
+    if args[:1] == ['--measure']:
+        print(json.dumps(measure_stage(args[1], args[2])))
+        return
+    if '--list' in args:
+        for name, (kind, _, _) in STAGES.items():
+            print(f"{name:32} {kind}")
+        return
+    sizes = parse_sizes(pop_option(args, '--sizes', '10k:5,100k:50,1m:200,10m:1000'))
+    repeat = int(pop_option(args, '--repeat', 1))
+    threshold = float(pop_option(args, '--threshold', THRESHOLD))
+    stages = [arg for arg in args if not arg.startswith('--')]
+    unknown = [name for name in stages if name not in STAGES]
+    if unknown:
+        raise ValueError(f"Unknown stage(s) {unknown}; expected some of {list(STAGES)}")
+
+    results = run_benchmarks(stages, sizes, repeat)
+    append_results(results)
+    plot_scaling_curves(results)
+    if '--save-baseline' in args:
+        save_baseline(results)
+        return
+
+    baseline = load_baseline()
+    if not baseline:
+        print(f"No baseline yet; run with --save-baseline to store one in {BASELINE_FILE}")
+        return
+    slower = regressions(results, baseline, threshold)
+    for stage, trips, seconds, reference in slower:
+        print(f"REGRESSION {stage} at {trips:,} trips: {seconds:.3f}s vs baseline {reference:.3f}s "
+              f"({seconds / reference:.2f}x > {threshold}x)")
+    if slower:
+        sys.exit(1)
+    print(f"No stage slower than {threshold}x its baseline")
+
+
+if __name__ == "__main__":
+    main()
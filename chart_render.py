@@ -0,0 +1,146 @@
+import hashlib
+import inspect
+import json
+import os
+import pickle
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import telemetry
+
+
+CHART_MANIFEST = '.chart_manifest.json'
+
+
+# matplotlib (and seaborn) are only imported by the processes that actually draw, with the
+# non-interactive Agg backend; data-only runs never pay for the import
+def pyplot():
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+    return plt
+
+
+def seaborn():
+    pyplot()
+    import seaborn as sns
+    return sns
+
+
+def init_worker(style=None):
+    pyplot()
+    if style:
+        seaborn().set(style=style)
+
+
+def render_job(func, payload):
+    args, kwargs = pickle.loads(payload)
+    func(*args, **kwargs)
+
+
+# Fingerprint of one chart: the drawing function's code plus the exact data handed to it
+def job_fingerprint(func, payload):
+    try:
+        source = inspect.getsource(func)
+    except (OSError, TypeError):
+        source = f'{func.__module__}.{func.__qualname__}'
+    digest = hashlib.sha256(source.encode())
+    digest.update(payload)
+    return digest.hexdigest()
+
+
+def load_chart_manifest(manifest_path=CHART_MANIFEST):
+    if not os.path.exists(manifest_path):
+        return {}
+    with open(manifest_path) as f:
+        return json.load(f)
+
+
+# Written to a per-process tmp file and swapped in, so a stage rendering at the same time
+# never reads a half-written manifest
+def save_chart_manifest(manifest, manifest_path=CHART_MANIFEST):
+    tmp_path = f'{manifest_path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+    os.replace(tmp_path, manifest_path)
+
+
+# Record the fingerprints of the charts just rendered on top of the manifest as it is now,
+# not as it was when rendering started: visit_analysis and fleet_analysis render side by
+# side and share the manifest, and neither should drop the other's entries
+def update_chart_manifest(rendered, manifest_path=CHART_MANIFEST):
+    if not rendered:
+        return
+    manifest = load_chart_manifest(manifest_path)
+    manifest.update(rendered)
+    save_chart_manifest(manifest, manifest_path)
+
+
+# Collects chart jobs and renders them in a process pool.
+# Each job is a module-level plot function, the file it writes and the (pre-aggregated)
+# arguments it needs. The arguments are pickled when the job is queued, so later changes
+# to the caller's frames do not leak into the chart, and the same bytes are used to
+# decide whether the chart is unchanged since the last render (same code, same data,
+# output file still there) and can be skipped.
+class ChartQueue:
+    def __init__(self, style=None, max_workers=None, enabled=True, manifest_path=CHART_MANIFEST):
+        self.style = style
+        self.max_workers = max_workers
+        self.enabled = enabled
+        self.manifest_path = manifest_path
+        self.jobs = []
+
+    def add(self, func, filename, *args, **kwargs):
+        if not self.enabled:
+            return
+        payload = pickle.dumps((args + (filename,), kwargs), protocol=pickle.HIGHEST_PROTOCOL)
+        self.jobs.append((filename, func, payload))
+
+    def render(self, force=False):
+        if not self.enabled or not self.jobs:
+            return []
+        start = time.perf_counter()
+        manifest = load_chart_manifest(self.manifest_path)
+
+        pending = []
+        for filename, func, payload in self.jobs:
+            fingerprint = job_fingerprint(func, payload)
+            if force or manifest.get(filename) != fingerprint or not os.path.exists(filename):
+                pending.append((filename, func, payload, fingerprint))
+        skipped = len(self.jobs) - len(pending)
+
+        rendered = {}
+        failed = []
+        workers = min(self.max_workers or os.cpu_count() or 1, len(pending))
+        if workers <= 1:
+            if pending:
+                init_worker(self.style)
+            for filename, func, payload, fingerprint in pending:
+                try:
+                    render_job(func, payload)
+                    rendered[filename] = fingerprint
+                except Exception as e:
+                    failed.append((filename, e))
+        else:
+            with ProcessPoolExecutor(max_workers=workers, initializer=init_worker, initargs=(self.style,)) as pool:
+                futures = {pool.submit(render_job, func, payload): (filename, fingerprint)
+                           for filename, func, payload, fingerprint in pending}
+                for future in as_completed(futures):
+                    filename, fingerprint = futures[future]
+                    try:
+                        future.result()
+                        rendered[filename] = fingerprint
+                    except Exception as e:
+                        failed.append((filename, e))
+
+        update_chart_manifest(rendered, self.manifest_path)
+        self.jobs = []
+        telemetry.note('charts_rendered', len(rendered))
+        telemetry.note('charts_skipped', skipped)
+        print(f"Rendered {len(rendered)} charts ({skipped} unchanged, skipped) with {max(workers, 1)} "
+              f"worker(s) in {time.perf_counter() - start:.1f}s")
+        for filename, error in failed:
+            print(f"Failed to render {filename}: {error!r}")
+        if failed:
+            raise RuntimeError(f"{len(failed)} chart(s) failed to render")
+        return [filename for filename, _, _, _ in pending]
@@ -0,0 +1,317 @@
+import json
+import os
+import sys
+
+import pandas as pd
+
+from excel_stream import iter_excel_batches
+from heatmaps import ALL_VEHICLES, CELL_SIZE, LAT_COLUMN, LON_COLUMN, grid_cells, layer_name
+
+
+DATA_DIR = 'dashboard_data'
+DASHBOARD_FILE = 'dashboard.html'
+
+
+# Visits per (Vehicle, Month, Row, Col) grid cell for a stream of trip batches
+def build_month_grid(batches, cell_size=CELL_SIZE):
+    grid = None
+    for batch in batches:
+        batch = batch.dropna(subset=['Vehicle', 'Trip Started', LAT_COLUMN, LON_COLUMN])
+        rows, cols = grid_cells(batch[LAT_COLUMN], batch[LON_COLUMN], cell_size)
+        cells = pd.DataFrame({
+            'Vehicle': batch['Vehicle'].values,
+            'Month': batch['Trip Started'].dt.strftime('%Y-%m').values,
+            'Row': rows,
+            'Col': cols,
+        })
+        counts = cells.groupby(['Vehicle', 'Month', 'Row', 'Col']).size()
+        grid = counts if grid is None else grid.add(counts, fill_value=0)
+    if grid is None:
+        # No batches at all (an empty sheet): no cells, same shape as a real result
+        grid = pd.Series([], index=pd.MultiIndex.from_arrays([[], [], [], []], names=['Vehicle', 'Month', 'Row', 'Col']), dtype='int64')
+    return grid.astype('int64').rename('Visits')
+
+
+def read_month_grid(file_path, sheet_name=0, cell_size=CELL_SIZE):
+    columns = ['Vehicle', 'Trip Started', LAT_COLUMN, LON_COLUMN]
+    dtypes = {'Vehicle': str, 'Trip Started': 'datetime64[ns]', LAT_COLUMN: 'float64', LON_COLUMN: 'float64'}
+    return build_month_grid(iter_excel_batches(file_path, sheet_name, usecols=columns, dtypes=dtypes), cell_size)
+
+
+# Columnar payload of one layer: month index, cell offsets from the shared origin and visits
+def layer_payload(cells, months, origin):
+    month_index = pd.Index(months).get_indexer(cells.index.get_level_values('Month'))
+    return {
+        'month': month_index.tolist(),
+        'row': (cells.index.get_level_values('Row').values - origin[0]).tolist(),
+        'col': (cells.index.get_level_values('Col').values - origin[1]).tolist(),
+        'visits': cells.values.tolist(),
+    }
+
+
+def layer_filename(layer):
+    return layer_name(layer) + '.json'
+
+
+# dashboard_data/index.json plus one payload per layer (the fleet and each vehicle), all from
+# the same grid. The page fetches a layer's payload the first time it is shown.
+def write_payloads(grid, cell_size=CELL_SIZE, data_dir=DATA_DIR):
+    os.makedirs(data_dir, exist_ok=True)
+    months = sorted(grid.index.get_level_values('Month').unique())
+    origin = (int(grid.index.get_level_values('Row').min()), int(grid.index.get_level_values('Col').min()))
+
+    layers = {ALL_VEHICLES: grid.groupby(level=['Month', 'Row', 'Col']).sum()}
+    for vehicle, cells in grid.groupby(level='Vehicle'):
+        layers[str(vehicle)] = cells.droplevel('Vehicle')
+
+    index = {'cell_size': cell_size, 'origin': origin, 'months': months, 'layers': {}}
+    for layer, cells in layers.items():
+        filename = layer_filename(layer)
+        with open(os.path.join(data_dir, filename), 'w') as f:
+            json.dump(layer_payload(cells, months, origin), f, separators=(',', ':'))
+        rows = cells.index.get_level_values('Row')
+        cols = cells.index.get_level_values('Col')
+        index['layers'][layer] = {
+            'file': filename,
+            'visits': int(cells.sum()),
+            'bounds': [[float(rows.min() * cell_size), float(cols.min() * cell_size)],
+                       [float((rows.max() + 1) * cell_size), float((cols.max() + 1) * cell_size)]],
+        }
+    with open(os.path.join(data_dir, 'index.json'), 'w') as f:
+        json.dump(index, f, indent=1)
+    return index
+
+
+def write_dashboard(path=DASHBOARD_FILE):
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(DASHBOARD_HTML)
+
+
+# python dashboard.py <workbook> [cell size in degrees]
+def main():
+    file_path = sys.argv[1] if len(sys.argv) > 1 else '0 Combined.xlsx'
+    cell_size = float(sys.argv[2]) if len(sys.argv) > 2 else CELL_SIZE
+    grid = read_month_grid(file_path, cell_size=cell_size)
+    if grid.empty:
+        print(f"No trips with a vehicle, start time and coordinates in {file_path}; nothing written")
+        return
+    index = write_payloads(grid, cell_size)
+    write_dashboard()
+    size = sum(os.path.getsize(os.path.join(DATA_DIR, layer['file'])) for layer in index['layers'].values())
+    print(f"Wrote {DASHBOARD_FILE} and {len(index['layers'])} layer payloads ({size / 1024:.0f} KB, "
+          f"{len(index['months'])} months) to {DATA_DIR}/")
+
+
+# One page, one copy of Leaflet and the heat plugin. Layers are fetched on first use and
+# cached; the month range is applied in the browser. When the whole range is selected and
+# `python tiles.py build` has been run, the pre-rendered tile pyramid is shown instead.
+DASHBOARD_HTML = '''<!DOCTYPE html>
+<html style="height: 100%;">
+<head>
+    <title>Vehicle Data Heatmap</title>
+    <meta http-equiv="content-type" content="text/html; charset=UTF-8" />
+    <link rel="stylesheet" href="https://cdn.jsdelivr.net/npm/leaflet@1.9.3/dist/leaflet.css"/>
+    <script src="https://cdn.jsdelivr.net/npm/leaflet@1.9.3/dist/leaflet.js"></script>
+    <script src="https://cdn.jsdelivr.net/gh/python-visualization/folium@main/folium/templates/leaflet_heat.min.js"></script>
+    <style>
+        body, html {
+            margin: 0;
+            padding: 0;
+            height: 100%;
+        }
+        #map {
+            width: 100%;
+            height: 100%;
+        }
+        #buttonPanel {
+            position: absolute;
+            top: 10px;
+            left: 60px;
+            z-index: 2000;
+            background-color: white;
+            padding: 4px;
+        }
+        #buttonPanel button.active {
+            font-weight: bold;
+        }
+        #legend {
+            position: absolute;
+            bottom: 50px;
+            left: 50px;
+            z-index: 2000;
+            width: 130px;
+            border: 2px solid grey;
+            font-size: 14px;
+            background-color: white;
+            padding: 10px;
+        }
+        #legend i {
+            width: 12px;
+            height: 12px;
+            display: inline-block;
+        }
+    </style>
+</head>
+<body>
+    <!-- Generated by `python dashboard.py <workbook>`; open through `python tiles.py serve` -->
+    <div id="buttonPanel">
+        <span id="layerButtons"></span>
+        &nbsp; From <select id="fromMonth"></select> to <select id="toMonth"></select>
+    </div>
+    <div id="legend"></div>
+    <div id="map"></div>
+
+    <script>
+        var colors = ['#00FF00', '#7FFF00', '#FFFF00', '#FF4500', '#FF0000'];
+        var map = L.map('map');
+        L.tileLayer('https://tile.openstreetmap.org/{z}/{x}/{y}.png', {
+            maxZoom: 19,
+            attribution: '&copy; OpenStreetMap contributors'
+        }).addTo(map);
+
+        var index = null;
+        var tileIndex = null;
+        var payloads = {};
+        var current = 'all';
+        var heatLayer = L.heatLayer([], {radius: 25, blur: 15, minOpacity: 0.5});
+        var tileLayer = null;
+
+        // Linear legend for the heat layer, log legend for the tiles (they are log-scaled)
+        function showLegend(maxVisits, logScale) {
+            var html = '&nbsp; Visit Density <br>';
+            [0, 0.25, 0.5, 0.75, 1].forEach(function (t, i) {
+                var visits = logScale ? Math.round(Math.expm1(t * Math.log1p(maxVisits))) : Math.floor(t * maxVisits);
+                visits = Math.max(1, visits);
+                html += '&nbsp; ' + visits + (visits === 1 ? ' visit' : ' visits') +
+                        ' &nbsp; <i style="background: ' + colors[i] + ';"></i><br>';
+            });
+            document.getElementById('legend').innerHTML = html;
+        }
+
+        // Fetched once per layer, the first time it is needed
+        function payload(name) {
+            if (!payloads[name]) {
+                payloads[name] = fetch('dashboard_data/' + index.layers[name].file).then(function (r) { return r.json(); });
+            }
+            return payloads[name];
+        }
+
+        function tileLegend() {
+            var zooms = tileIndex.layers[current].max_visits;
+            var zoom = Math.min(Math.max(map.getZoom(), tileIndex.min_zoom), tileIndex.max_zoom);
+            showLegend(zooms[zoom], true);
+        }
+
+        function refresh() {
+            var from = Number(document.getElementById('fromMonth').value);
+            var to = Number(document.getElementById('toMonth').value);
+            var fullRange = from === 0 && to === index.months.length - 1;
+            document.querySelectorAll('#layerButtons button').forEach(function (button) {
+                button.classList.toggle('active', button.dataset.layer === current);
+            });
+            if (tileLayer) {
+                map.removeLayer(tileLayer);
+                tileLayer = null;
+            }
+
+            if (fullRange && tileIndex && tileIndex.layers[current]) {
+                map.removeLayer(heatLayer);
+                tileLayer = L.tileLayer('tiles/' + tileIndex.layers[current].dir + '/{z}/{x}/{y}.png', {
+                    minNativeZoom: tileIndex.min_zoom,
+                    maxNativeZoom: tileIndex.max_zoom,
+                    maxZoom: 19,
+                    opacity: 0.8
+                }).addTo(map);
+                tileLegend();
+                return;
+            }
+
+            var name = current;
+            payload(name).then(function (data) {
+                if (name !== current) {
+                    return;
+                }
+                // Sum the selected months per cell, then one weighted point per cell
+                var totals = new Map();
+                for (var i = 0; i < data.visits.length; i++) {
+                    if (data.month[i] < from || data.month[i] > to) {
+                        continue;
+                    }
+                    var key = data.row[i] * 1048576 + data.col[i];
+                    totals.set(key, (totals.get(key) || 0) + data.visits[i]);
+                }
+                var points = [];
+                var maxVisits = 0;
+                totals.forEach(function (visits, key) {
+                    var row = Math.floor(key / 1048576) + index.origin[0];
+                    var col = key % 1048576 + index.origin[1];
+                    points.push([(row + 0.5) * index.cell_size, (col + 0.5) * index.cell_size, visits]);
+                    maxVisits = Math.max(maxVisits, visits);
+                });
+                heatLayer.setOptions({max: Math.max(maxVisits, 1)});
+                heatLayer.setLatLngs(points);
+                heatLayer.addTo(map);
+                showLegend(Math.max(maxVisits, 1), false);
+            });
+        }
+
+        function select(name) {
+            current = name;
+            refresh();
+        }
+
+        function fillMonths(id, selected) {
+            var element = document.getElementById(id);
+            index.months.forEach(function (month, i) {
+                element.add(new Option(month, i, false, i === selected));
+            });
+            element.onchange = function () {
+                var from = document.getElementById('fromMonth');
+                var to = document.getElementById('toMonth');
+                if (Number(from.value) > Number(to.value)) {
+                    (id === 'fromMonth' ? to : from).value = element.value;
+                }
+                refresh();
+            };
+        }
+
+        // dashboard_data/ is generated, not checked in: say how to build it instead of an empty map
+        function missingData() {
+            document.getElementById('buttonPanel').textContent =
+                'No dashboard data: run `python dashboard.py <workbook>` first, then open this page through `python tiles.py serve`.';
+            map.setView([0, 0], 2);
+            return Promise.reject(new Error('dashboard_data/index.json not found'));
+        }
+
+        Promise.all([
+            fetch('dashboard_data/index.json').then(function (r) { return r.ok ? r.json() : missingData(); }, missingData),
+            fetch('tiles/index.json').then(function (r) { return r.ok ? r.json() : null; }).catch(function () { return null; })
+        ]).then(function (results) {
+            index = results[0];
+            tileIndex = results[1];
+            var panel = document.getElementById('layerButtons');
+            Object.keys(index.layers).forEach(function (name) {
+                var button = document.createElement('button');
+                button.textContent = name === 'all' ? 'Overview' : name;
+                button.dataset.layer = name;
+                button.onclick = function () { select(name); };
+                panel.appendChild(button);
+            });
+            fillMonths('fromMonth', 0);
+            fillMonths('toMonth', index.months.length - 1);
+            map.fitBounds(index.layers.all.bounds);
+            map.on('zoomend', function () {
+                if (tileLayer) {
+                    tileLegend();
+                }
+            });
+            select('all');
+        });
+    </script>
+</body>
+</html>
+'''
+
+
+if __name__ == "__main__":
+    main()
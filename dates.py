@@ -0,0 +1,85 @@
+import datetime
+import numbers
+
+import numpy as np
+import pandas as pd
+from dateutil.parser import parse
+
+
+# Formats tried in order on the distinct raw values before falling back to dateutil.
+# They cover what shows up in the Day-sheet I1 cells and the merged logs:
+# '2023-09-01', 'FRIDAY 01 SEPT,2023', 'oct/12/2023', '09/01/2023'.
+DATE_FORMATS = [
+    '%Y-%m-%d',
+    '%Y-%m-%d %H:%M:%S',
+    '%A %d %b,%Y',
+    '%A %d %b, %Y',
+    '%d %b,%Y',
+    '%b/%d/%Y',
+    '%m/%d/%Y',
+]
+
+EXCEL_EPOCH = pd.Timestamp('1899-12-30')  # serial day 0 for Excel date numbers
+
+
+# Uppercase, collapse whitespace and turn 'SEPT' into the 'SEP' strptime expects
+def clean_date_strings(strings):
+    cleaned = strings.str.strip().str.upper().str.replace(r'\s+', ' ', regex=True)
+    return cleaned.str.replace(r'\bSEPT\b', 'SEP', regex=True)
+
+
+def fallback_parse(value):
+    try:
+        return pd.Timestamp(parse(str(value)))
+    except (ValueError, OverflowError, TypeError):
+        return pd.NaT
+
+
+# Normalize a column of mixed date values to datetime64.
+# Each distinct raw value is parsed once: datetimes pass through, Excel serial numbers are
+# offset from the epoch, strings go through DATE_FORMATS vectorially and only what is left
+# is handed to dateutil. Returns the parsed column and a report of the rows that needed the
+# fallback parser (with what it made of them; NaT means unparseable).
+def normalize_dates(values, formats=DATE_FORMATS):
+    series = values if isinstance(values, pd.Series) else pd.Series(values)
+    if pd.api.types.is_datetime64_any_dtype(series):
+        return series, pd.DataFrame(columns=['Raw', 'Parsed'])
+
+    codes, uniques = pd.factorize(series.astype(object), use_na_sentinel=True)
+    uniques = pd.Series(np.asarray(uniques, dtype=object))
+    parsed = pd.Series(pd.NaT, index=uniques.index, dtype='datetime64[ns]')
+    used_fallback = pd.Series(False, index=uniques.index)
+
+    kinds = pd.Series(np.fromiter(map(type, uniques), dtype=object, count=len(uniques)))
+    is_datetime = kinds.map(lambda kind: issubclass(kind, datetime.date))
+    is_number = kinds.map(lambda kind: issubclass(kind, numbers.Real) and not issubclass(kind, bool))
+    is_str = kinds.map(lambda kind: issubclass(kind, str))
+
+    if is_datetime.any():
+        parsed[is_datetime] = pd.to_datetime(uniques[is_datetime].tolist())
+    if is_number.any():
+        parsed[is_number] = EXCEL_EPOCH + pd.to_timedelta(uniques[is_number].astype(float), unit='D')
+
+    if is_str.any():
+        strings = clean_date_strings(uniques[is_str].astype(str))
+        remaining = strings[strings != '']
+        for fmt in formats:
+            if remaining.empty:
+                break
+            attempt = pd.to_datetime(remaining, format=fmt, errors='coerce')
+            hits = attempt.notna()
+            parsed[remaining.index[hits]] = attempt[hits]
+            remaining = remaining[~hits]
+        if not remaining.empty:
+            parsed[remaining.index] = pd.to_datetime([fallback_parse(value) for value in remaining])
+            used_fallback[remaining.index] = True
+
+    others = ~(is_datetime | is_number | is_str)
+    used_fallback[others] = True
+
+    lookup = np.append(parsed.values, np.datetime64('NaT', 'ns'))
+    result = pd.Series(lookup[codes], index=series.index, name=series.name)
+
+    fell_through = np.append(used_fallback.values, False)[codes]
+    report = pd.DataFrame({'Raw': series[fell_through], 'Parsed': result[fell_through]})
+    return result, report
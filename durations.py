@@ -0,0 +1,95 @@
+import datetime
+import numbers
+
+import numpy as np
+import pandas as pd
+
+
+# Excel stores durations as fractions of a day; anything of a day or more comes back
+# from read_excel as a datetime counted from this epoch (e.g. 1900-01-03 20:29:24)
+EXCEL_EPOCH = pd.Timestamp('1899-12-31')
+NAT = np.iinfo(np.int64).min
+
+
+# Excel day fractions carry float noise (0.003472222 days is 4:59.99998), so they are
+# rounded to the millisecond, the finest resolution GeoTab reports
+def day_fractions_to_nanos(days):
+    millis = np.round(days * 86_400_000)
+    return np.where(np.isfinite(millis), millis * 1_000_000, NAT).astype(np.int64)
+
+
+def clock_string_to_nanos(text):
+    try:
+        hours, minutes, seconds = text.split(':')
+        return (int(hours) * 3600 + int(minutes) * 60) * 1_000_000_000 + round(float(seconds) * 1_000_000_000)
+    except ValueError:
+        return NAT
+
+
+# Parse 'H:MM:SS' / 'HH:MM:SS.ffffff' strings; anything else is left to pd.to_timedelta
+def clock_strings_to_nanos(strings):
+    nanos = np.fromiter(map(clock_string_to_nanos, strings), dtype=np.int64, count=len(strings))
+    leftovers = np.flatnonzero(nanos == NAT)
+    if len(leftovers):
+        parsed = pd.to_timedelta(pd.Index(strings[leftovers], dtype=object).str.strip(), errors='coerce')
+        nanos[leftovers] = parsed.asi8
+    return nanos
+
+
+# Convert each distinct raw value to nanoseconds (NAT when it is not a duration).
+# Runs on the uniques of a column, so the per-value work is bounded by the number of
+# distinct durations rather than the number of rows.
+def unique_values_to_nanos(uniques):
+    nanos = np.full(len(uniques), NAT, dtype=np.int64)
+    kind_codes, kinds = pd.factorize(np.fromiter(map(type, uniques), dtype=object, count=len(uniques)))
+
+    for code, kind in enumerate(kinds):
+        mask = kind_codes == code
+        values = uniques[mask]
+        if issubclass(kind, str):
+            nanos[mask] = clock_strings_to_nanos(values)
+        elif issubclass(kind, datetime.datetime):
+            nanos[mask] = (pd.to_datetime(values) - EXCEL_EPOCH).asi8
+        elif issubclass(kind, datetime.time):
+            nanos[mask] = np.fromiter(
+                (((t.hour * 60 + t.minute) * 60 + t.second) * 1_000_000 + t.microsecond for t in values),
+                dtype=np.int64, count=len(values)) * 1_000
+        elif issubclass(kind, datetime.timedelta):
+            nanos[mask] = pd.to_timedelta(values).asi8
+        elif issubclass(kind, numbers.Real) and not issubclass(kind, bool):
+            nanos[mask] = day_fractions_to_nanos(values.astype(float))
+
+    return nanos
+
+
+# Normalize a column of durations to timedelta64[ns].
+# Accepts any mix of 'HH:MM:SS[.ffffff]' strings, datetime.time, timedelta, Excel day
+# fractions and the >24h datetimes read_excel produces; anything else becomes NaT.
+def to_timedelta(values):
+    series = values if isinstance(values, pd.Series) else pd.Series(values)
+
+    if pd.api.types.is_timedelta64_dtype(series):
+        return series.astype('timedelta64[ns]')
+    if pd.api.types.is_datetime64_any_dtype(series):
+        return series - EXCEL_EPOCH
+    if pd.api.types.is_numeric_dtype(series) and not pd.api.types.is_bool_dtype(series):
+        nanos = day_fractions_to_nanos(series.to_numpy(dtype=float, na_value=np.nan))
+        return pd.Series(nanos.view('timedelta64[ns]'), index=series.index, name=series.name)
+
+    codes, uniques = pd.factorize(series.astype(object), use_na_sentinel=True)
+    lookup = np.append(unique_values_to_nanos(np.asarray(uniques, dtype=object)), NAT)
+    nanos = lookup[codes]  # code -1 (missing) picks the trailing NAT
+    return pd.Series(nanos.view('timedelta64[ns]'), index=series.index, name=series.name)
+
+
+# Durations as float minutes; missing or unparseable values become `fill`
+def to_minutes(values, fill=np.nan):
+    minutes = to_timedelta(values).dt.total_seconds() / 60
+    return minutes.fillna(fill)
+
+
+# Durations as whole seconds (int64, truncated); missing or unparseable values become `fill`
+def to_seconds(values, fill=0):
+    nanos = to_timedelta(values).values.view(np.int64)
+    seconds = np.where(nanos == NAT, fill, nanos // 1_000_000_000)
+    return pd.Series(seconds.astype(np.int64), index=getattr(values, 'index', None), name=getattr(values, 'name', None))
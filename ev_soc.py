@@ -0,0 +1,160 @@
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from durations import to_minutes
+from excel_cache import read_excel_cached
+from fuel_log import trip_distances
+from scenarios import EV_MODELS
+from schema import GEOTAB_SCHEMA, apply_schema
+from trip_partitions import partition_trips
+
+
+# Where and when a replacement EV can charge: charger power, the shortest stop worth
+# plugging in for, and whether only the overnight stop (next trip on a later day) counts
+CHARGING_POLICIES = pd.DataFrame({
+    'Policy': ['Overnight L2', 'Overnight L2 + stops', 'Overnight DC'],
+    'Power kW': [7.2, 7.2, 50.0],
+    'Min Dwell h': [1.0, 0.5, 1.0],
+    'Overnight Only': [True, False, True],
+}).set_index('Policy')
+
+CHARGE_EFFICIENCY = 0.9
+# A day is infeasible when the charge drops below this share of the battery on any trip
+RESERVE_FRACTION = 0.1
+
+
+# Each vehicle's trips as rows of (vehicles, longest sequence) arrays, padded past the end:
+# distance (km), dwell after the trip (hours; GeoTab's Stop Duration, else the gap to the
+# next trip), whether that dwell runs overnight, the trip's day and a mask of real trips.
+# trips is a trip_partitions.VehicleTrips (sorted by vehicle and start time).
+def trip_sequences(trips):
+    frame = trips.frame
+    counts = np.diff(trips.offsets)
+    vehicle = np.repeat(np.arange(len(counts)), counts)
+    position = np.arange(len(frame)) - np.repeat(trips.offsets[:-1], counts)
+    shape = (len(counts), counts.max() if len(counts) else 0)
+
+    started = pd.to_datetime(frame['Trip Started']).to_numpy()
+    ended = pd.to_datetime(frame['Trip Ended']).to_numpy()
+    last = np.zeros(len(frame), dtype=bool)
+    last[trips.offsets[1:][counts > 0] - 1] = True
+    next_start = np.r_[started[1:], np.datetime64('NaT')]
+    next_start[last] = np.datetime64('NaT')
+    gap_hours = (next_start - ended) / np.timedelta64(1, 'h')
+    stop_hours = to_minutes(frame['Stop Duration']).to_numpy(dtype=np.float64) / 60 if 'Stop Duration' in frame else gap_hours
+    dwell = np.where(np.isnan(stop_hours), gap_hours, stop_hours)
+    dwell[last] = 0.0
+    overnight = next_start.astype('datetime64[D]') > ended.astype('datetime64[D]')
+    distance = trip_distances(frame)
+
+    sequences = {
+        'distance': np.zeros(shape),
+        'dwell': np.zeros(shape),
+        'overnight': np.zeros(shape, dtype=bool),
+        'day': np.zeros(shape, dtype='datetime64[D]'),
+        'valid': np.zeros(shape, dtype=bool),
+    }
+    sequences['distance'][vehicle, position] = distance.fillna(0).to_numpy()
+    sequences['dwell'][vehicle, position] = np.nan_to_num(dwell)
+    sequences['overnight'][vehicle, position] = overnight
+    sequences['day'][vehicle, position] = started.astype('datetime64[D]')
+    sequences['valid'][vehicle, position] = True
+    sequences['vehicles'] = trips.vehicles
+    return sequences
+
+
+# Replay every vehicle's trips for every EV model and charging policy at once. The state of
+# charge is a (vehicles, models, policies) array stepped trip by trip: each trip takes its
+# distance times the model's kWh/km, each dwell the policy allows adds power x hours (x
+# efficiency) up to a full battery. Batteries start full and hold range x kWh/km. A trip
+# that would go below zero is counted (and 'Min SoC' shows how far below), then the charge
+# is clamped at empty, so the next dwell recharges from zero as a stranded vehicle would.
+# Returns a summary per (vehicle, model, policy) - lowest charge, infeasible days, charging
+# sessions, energy charged and the longest plug-in time any one session needed - and the
+# infeasible days themselves (a day with a trip under the reserve).
+def simulate(sequences, models=EV_MODELS, policies=CHARGING_POLICIES, reserve=RESERVE_FRACTION):
+    distance, dwell, overnight, valid = (sequences[key] for key in ('distance', 'dwell', 'overnight', 'valid'))
+    vehicles, steps = distance.shape
+    per_km = models['kWh/100km'].to_numpy(dtype=np.float64)[np.newaxis, :, np.newaxis] / 100
+    capacity = np.broadcast_to(models['Range km'].to_numpy(dtype=np.float64)[np.newaxis, :, np.newaxis] * per_km,
+                               (vehicles, len(models), len(policies)))
+    power = policies['Power kW'].to_numpy(dtype=np.float64)[np.newaxis, np.newaxis, :] * CHARGE_EFFICIENCY
+    min_dwell = policies['Min Dwell h'].to_numpy(dtype=np.float64)[np.newaxis, :]
+    anytime = ~policies['Overnight Only'].to_numpy(dtype=bool)[np.newaxis, :]
+
+    soc = capacity.copy()
+    lowest = capacity.copy()
+    sessions = np.zeros(capacity.shape, dtype=np.int64)
+    charged = np.zeros(capacity.shape)
+    longest = np.zeros(capacity.shape)
+    short = np.zeros((vehicles, steps, len(models), len(policies)), dtype=bool)
+    for k in range(steps):
+        live = valid[:, k, np.newaxis, np.newaxis]
+        soc = soc - distance[:, k, np.newaxis, np.newaxis] * per_km
+        lowest = np.minimum(lowest, soc)
+        short[:, k] = live & (soc < reserve * capacity)
+        soc = np.maximum(soc, 0)
+
+        plugged = ((dwell[:, k, np.newaxis] >= min_dwell) & (overnight[:, k, np.newaxis] | anytime))[:, np.newaxis, :]
+        added = np.where(plugged, np.minimum(capacity - soc, power * dwell[:, k, np.newaxis, np.newaxis]), 0)
+        soc = soc + added
+        sessions += added > 0
+        charged += added
+        longest = np.maximum(longest, added / power)
+
+    index = pd.MultiIndex.from_product([sequences['vehicles'], models.index, policies.index],
+                                       names=['Vehicle', 'EV Model', 'Policy'])
+    v, k, m, p = np.nonzero(short)
+    shortfalls = pd.DataFrame({
+        'Vehicle': np.asarray(sequences['vehicles'])[v],
+        'EV Model': models.index[m],
+        'Policy': policies.index[p],
+        'Date': sequences['day'][v, k],
+    }).drop_duplicates(ignore_index=True)
+    infeasible = shortfalls.groupby(['Vehicle', 'EV Model', 'Policy'], observed=True).size()
+
+    summary = pd.DataFrame({
+        'Min SoC kWh': lowest.ravel(),
+        'Min SoC %': (lowest / capacity * 100).ravel(),
+        'Infeasible Days': infeasible.reindex(index, fill_value=0).to_numpy(),
+        'Charge Sessions': sessions.ravel(),
+        'Charged kWh': charged.ravel(),
+        'Longest Charge h': longest.ravel(),
+    }, index=index)
+    return summary, shortfalls
+
+
+# Infeasible days per vehicle, one column per (EV model, policy)
+def feasibility_table(summary):
+    return summary['Infeasible Days'].unstack(['EV Model', 'Policy'])
+
+
+# python ev_soc.py <trips.xlsx> [--reserve 0.1]
+def main():
+    args = sys.argv[1:]
+    reserve = RESERVE_FRACTION
+    if '--reserve' in args:
+        position = args.index('--reserve')
+        reserve = float(args[position + 1])
+        del args[position:position + 2]
+    if not args:
+        print("Usage: python ev_soc.py <trips.xlsx> [--reserve 0.1]")
+        return
+    trips = apply_schema(read_excel_cached(args[0]), GEOTAB_SCHEMA, args[0])
+    begin = time.perf_counter()
+    sequences = trip_sequences(partition_trips(trips))
+    summary, shortfalls = simulate(sequences, reserve=reserve)
+    print(f"Replayed {len(trips)} trips of {len(sequences['vehicles'])} vehicles for {len(EV_MODELS)} EV models x "
+          f"{len(CHARGING_POLICIES)} charging policies in {time.perf_counter() - begin:.1f}s")
+    with pd.option_context('display.max_columns', None, 'display.width', 200):
+        print("\nInfeasible days:")
+        print(feasibility_table(summary))
+        print("\nLowest state of charge and charging needed:")
+        print(summary.round(1))
+
+
+if __name__ == "__main__":
+    main()
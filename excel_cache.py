@@ -0,0 +1,217 @@
+import hashlib
+import json
+import os
+import pickle
+import time
+from datetime import timedelta
+
+import numpy as np
+import pandas as pd
+
+import telemetry
+
+try:
+    import pyarrow as pa
+except ImportError:  # cache is skipped and every load parses the workbook
+    pa = None
+
+
+CACHE_DIR = '.excel_cache'
+# Frames handed from one script to the next, in place of intermediate workbooks
+FRAME_DIR = os.path.join(CACHE_DIR, 'frames')
+MANIFEST_NAME = 'manifest.json'
+
+# One record per load: file, sheet, status ('hit', 'miss' or 'uncached') and seconds taken
+load_log = []
+
+
+# Hash the workbook bytes in blocks so large exports are not read into memory at once
+def file_content_hash(file_path, block_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+# Key for one (workbook, sheet, read options) combination; size, mtime and content are checked separately
+def cache_key(file_path, sheet_name, read_kwargs):
+    options = json.dumps(sorted((k, repr(v)) for k, v in read_kwargs.items()))
+    raw = f'{os.path.abspath(file_path)}|{sheet_name!r}|{options}'
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()[:32]
+
+
+def load_manifest(cache_dir):
+    manifest_path = os.path.join(cache_dir, MANIFEST_NAME)
+    if not os.path.exists(manifest_path):
+        return {}
+    with open(manifest_path) as f:
+        return json.load(f)
+
+
+def save_manifest(cache_dir, manifest):
+    manifest_path = os.path.join(cache_dir, MANIFEST_NAME)
+    tmp_path = manifest_path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(manifest, f, indent=1)
+    os.replace(tmp_path, manifest_path)
+
+
+# Decide whether the cached entry still describes the workbook on disk.
+# Size and mtime are checked first; the content hash is only computed when they moved,
+# so a touched-but-unchanged file stays a hit.
+def entry_is_current(entry, file_path, stat):
+    if entry is None:
+        return False, None
+    if entry['size'] == stat.st_size and entry['mtime_ns'] == stat.st_mtime_ns:
+        return True, entry['sha256']
+    if entry['size'] != stat.st_size:
+        return False, None
+    content_hash = file_content_hash(file_path)
+    return content_hash == entry['sha256'], content_hash
+
+
+# Write the frame as an uncompressed Arrow IPC file so later runs can memory-map it.
+# Object columns that Arrow cannot type (e.g. a mix of time and datetime values)
+# go to a pickle sidecar so they round-trip unchanged.
+def write_cache(df, base_path):
+    typed = {}
+    leftovers = {}
+    for col in df.columns:
+        try:
+            pa.array(df[col], from_pandas=True)
+            typed[col] = df[col]
+        except (pa.ArrowInvalid, pa.ArrowTypeError, pa.ArrowNotImplementedError):
+            leftovers[col] = df[col]
+
+    table = pa.Table.from_pandas(pd.DataFrame(typed, index=df.index), preserve_index=True)
+    with pa.OSFile(base_path + '.arrow', 'wb') as sink:
+        with pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+
+    with open(base_path + '.extra.pkl', 'wb') as f:
+        pickle.dump({'columns': list(df.columns), 'leftovers': leftovers}, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+
+def read_cache(base_path):
+    with pa.memory_map(base_path + '.arrow', 'r') as source:
+        table = pa.ipc.open_file(source).read_all()
+    df = table.to_pandas()
+    # Arrow hands back None for missing strings; read_excel gives NaN
+    for col in df.columns[df.dtypes == object]:
+        df[col] = df[col].where(df[col].notna(), np.nan)
+    with open(base_path + '.extra.pkl', 'rb') as f:
+        extra = pickle.load(f)
+    for col, values in extra['leftovers'].items():
+        df[col] = values.values
+    return df[extra['columns']]
+
+
+# Drop-in replacement for pd.read_excel(file_path, sheet_name=..., **kwargs) for a single sheet.
+# The first load parses the workbook and stores a columnar copy; later loads map that copy
+# until the workbook changes.
+def read_excel_cached(file_path, sheet_name=0, cache_dir=CACHE_DIR, verbose=True, **kwargs):
+    start = time.perf_counter()
+    label = f"{os.path.basename(file_path)} [{sheet_name}]"
+
+    if pa is None:
+        df = pd.read_excel(file_path, sheet_name=sheet_name, **kwargs)
+        record_load(label, 'uncached', start, verbose)
+        return df
+
+    os.makedirs(cache_dir, exist_ok=True)
+    manifest = load_manifest(cache_dir)
+    key = cache_key(file_path, sheet_name, kwargs)
+    base_path = os.path.join(cache_dir, key)
+    stat = os.stat(file_path)
+
+    entry = manifest.get(key)
+    current, content_hash = entry_is_current(entry, file_path, stat)
+    if current and os.path.exists(base_path + '.arrow'):
+        df = read_cache(base_path)
+        if entry['mtime_ns'] != stat.st_mtime_ns:
+            entry['mtime_ns'] = stat.st_mtime_ns
+            save_manifest(cache_dir, manifest)
+        record_load(label, 'hit', start, verbose)
+        return df
+
+    df = pd.read_excel(file_path, sheet_name=sheet_name, **kwargs)
+    write_cache(df, base_path)
+    manifest[key] = {
+        'path': os.path.abspath(file_path),
+        'sheet': sheet_name,
+        'size': stat.st_size,
+        'mtime_ns': stat.st_mtime_ns,
+        'sha256': content_hash or file_content_hash(file_path),
+    }
+    save_manifest(cache_dir, manifest)
+    record_load(label, 'miss', start, verbose)
+    return df
+
+
+# Write df to a workbook and store its columnar copy right away, so the next
+# read_excel_cached(file_path) is a hit without parsing the file it just wrote.
+# Only for frames whose Excel round trip is the identity, i.e. frames that came from
+# read_excel/read_excel_cached (with columns replaced by datetime, number or string values).
+def write_excel_cached(df, file_path, cache_dir=CACHE_DIR, **kwargs):
+    df.to_excel(file_path, index=False, **kwargs)
+    if pa is None:
+        return
+    os.makedirs(cache_dir, exist_ok=True)
+    manifest = load_manifest(cache_dir)
+    key = cache_key(file_path, 0, {})
+    write_cache(df.reset_index(drop=True), os.path.join(cache_dir, key))
+    stat = os.stat(file_path)
+    manifest[key] = {
+        'path': os.path.abspath(file_path),
+        'sheet': 0,
+        'size': stat.st_size,
+        'mtime_ns': stat.st_mtime_ns,
+        'sha256': file_content_hash(file_path),
+    }
+    save_manifest(cache_dir, manifest)
+
+
+# Arrow file that stands in for an intermediate workbook such as Merged_3mon.xlsx
+def frame_path(file_path, frame_dir=FRAME_DIR):
+    return os.path.join(frame_dir, os.path.splitext(os.path.basename(file_path))[0])
+
+
+# A cell formatted as a time in an otherwise numeric column (e.g. a vehicle column) comes out
+# of openpyxl as a timedelta; the workbook holds it as a day fraction, which is what the next
+# script read back when frames were handed over as workbooks
+def time_cells_as_days(df):
+    df = df.reset_index(drop=True)
+    for column in df.columns[df.dtypes == object]:
+        values = df[column]
+        is_time = values.map(lambda value: isinstance(value, timedelta))
+        if is_time.any() and not is_time.all():
+            df[column] = values.where(~is_time, values[is_time].map(lambda value: pd.Timedelta(value) / pd.Timedelta(days=1)))
+    return df
+
+
+# Hand a frame to the next script without writing a workbook: only its Arrow copy is stored
+def write_frame(df, file_path, frame_dir=FRAME_DIR):
+    os.makedirs(frame_dir, exist_ok=True)
+    write_cache(time_cells_as_days(df), frame_path(file_path, frame_dir))
+
+
+# The frame an earlier script handed over for file_path, or the workbook itself when there
+# is no frame or the workbook is newer (written by hand or with --excel after the frame)
+def read_frame(file_path, frame_dir=FRAME_DIR, verbose=True):
+    start = time.perf_counter()
+    base_path = frame_path(file_path, frame_dir)
+    if pa is not None and os.path.exists(base_path + '.arrow'):
+        if not os.path.exists(file_path) or os.path.getmtime(file_path) <= os.path.getmtime(base_path + '.arrow'):
+            df = read_cache(base_path)
+            record_load(os.path.basename(file_path), 'frame', start, verbose)
+            return df
+    return read_excel_cached(file_path, verbose=verbose)
+
+
+def record_load(label, status, start, verbose):
+    elapsed = time.perf_counter() - start
+    load_log.append({'file': label, 'status': status, 'seconds': elapsed})
+    telemetry.note(f'excel_cache_{status}')
+    if verbose:
+        print(f"Loaded {label}: cache {status} in {elapsed:.2f}s")
@@ -0,0 +1,59 @@
+import openpyxl
+import pandas as pd
+
+
+BATCH_SIZE = 50_000
+
+
+# Cast one batch to the requested dtypes so every batch has the same column types,
+# whatever values happen to fall in it
+def apply_dtypes(batch, dtypes):
+    for col, dtype in dtypes.items():
+        if col not in batch:
+            continue
+        if dtype in ('datetime64[ns]', 'datetime'):
+            batch[col] = pd.to_datetime(batch[col], errors='coerce')
+        elif dtype is str or dtype == 'str':
+            batch[col] = batch[col].where(batch[col].isna(), batch[col].astype(str))
+        elif pd.api.types.is_numeric_dtype(pd.api.types.pandas_dtype(dtype)):
+            batch[col] = pd.to_numeric(batch[col], errors='coerce').astype(dtype)
+        else:
+            batch[col] = batch[col].astype(dtype)
+    return batch
+
+
+# Stream a worksheet in fixed-size DataFrame batches using openpyxl's read-only mode.
+# The first row is the header; `usecols` picks columns by header name and `dtypes`
+# maps column name -> dtype applied to every batch. Peak memory is set by batch_size,
+# not by the size of the workbook.
+def iter_excel_batches(file_path, sheet_name=0, batch_size=BATCH_SIZE, usecols=None, dtypes=None):
+    wb = openpyxl.load_workbook(file_path, read_only=True, data_only=True)
+    try:
+        ws = wb.worksheets[sheet_name] if isinstance(sheet_name, int) else wb[sheet_name]
+        rows = ws.iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            return
+
+        header = [str(name) if name is not None else f'Unnamed: {i}' for i, name in enumerate(header)]
+        if usecols is None:
+            positions = list(range(len(header)))
+        else:
+            missing = [col for col in usecols if col not in header]
+            if missing:
+                raise KeyError(f"Columns not found in '{file_path}': {missing}")
+            positions = [header.index(col) for col in usecols]
+        columns = [header[i] for i in positions]
+
+        batch = []
+        for row in rows:
+            if row is None or all(value is None for value in row):
+                continue
+            batch.append([row[i] if i < len(row) else None for i in positions])
+            if len(batch) == batch_size:
+                yield apply_dtypes(pd.DataFrame(batch, columns=columns), dtypes or {})
+                batch = []
+        if batch:
+            yield apply_dtypes(pd.DataFrame(batch, columns=columns), dtypes or {})
+    finally:
+        wb.close()
@@ -0,0 +1,420 @@
+import datetime
+import os
+import sys
+import time
+
+import numpy as np
+import openpyxl
+import pandas as pd
+
+from durations import EXCEL_EPOCH, to_seconds
+from excel_cache import read_excel_cached, write_cache
+from manual_logs import DATE_CELL, HEADER_ROW, LAST_ROW, LOG_COLUMNS, VEHICLE_COLUMNS, tidy_month_data
+
+
+GEOTAB_SAMPLE = 'GeoTab 3 month git.xlsx'
+MANUAL_SAMPLE = 'Manual 3 month data.xlsx'
+OUTPUT_DIR = 'synthetic'
+
+# Column order of the GeoTab trip export, header typo included
+GEOTAB_COLUMNS = ['Vehicle', 'Trip Started', 'Date', 'Start During Work Hours', 'Start Odometer', 'Start Location',
+                  'Trip Ended', 'Stop During Work Hours', 'End Odometer', 'End Location', 'End Location Modified',
+                  'Postal code', 'Trip Detai lLatitude', 'Trip Detail Longitude', 'Distance', 'Driving Duration',
+                  'Stop Duration', 'Idling Duration', 'Maximum Speed', 'Month', 'Week Number']
+PLACE_COLUMNS = ['End Location', 'End Location Modified', 'Postal code', 'Trip Detai lLatitude', 'Trip Detail Longitude']
+DURATION_COLUMNS = ['Driving Duration', 'Stop Duration', 'Idling Duration']
+GEOTAB_SHEET = 'Sheet1 (2)'
+
+# GeoTab flags a trip as "during work hours" from 08:00 to 17:00, Monday to Friday
+WORK_HOURS = (8 * 3600, 17 * 3600)
+EXCEL_MAX_ROWS = 1_048_575  # rows below the header
+CALLS_PER_SHEET = LAST_ROW - HEADER_ROW
+JITTER_DEGREES = 0.00005  # ~5 m, so repeated stops at one address do not all land on one point
+FUEL_TANK_LITRES = 80
+FUEL_RATES = (25.0, 60.0)  # L/100 km, one drawn per vehicle
+FUEL_COLUMNS = ['Date', 'Vehicle', 'Litres', 'Odometer']
+
+
+def day_seconds(timestamps):
+    return (timestamps - timestamps.dt.normalize()).dt.total_seconds().to_numpy()
+
+
+# Empirical distributions of the GeoTab sample. Each sample vehicle becomes an archetype
+# (weekday activity, trips per active day, first departure); trip kinematics (distance,
+# driving time, top speed) are kept as joint rows, and stops as observed rows per address.
+def fit_geotab(df):
+    df = df.dropna(subset=['Vehicle', 'Trip Started', 'Trip Ended']).copy()
+    df['Vehicle'] = df['Vehicle'].astype(str)
+    df = df.sort_values(['Vehicle', 'Trip Started'], kind='stable').reset_index(drop=True)
+    df['Day'] = df['Trip Started'].dt.normalize()
+    driving = to_seconds(df['Driving Duration']).to_numpy()
+    stop = to_seconds(df['Stop Duration']).to_numpy()
+    idling = to_seconds(df['Idling Duration']).to_numpy()
+
+    span = pd.date_range(df['Day'].min(), df['Day'].max())
+    weekdays_in_span = np.bincount(span.weekday, minlength=7)
+    archetypes = {}
+    for vehicle, trips in df.groupby('Vehicle', sort=False):
+        per_day = trips.groupby('Day').size()
+        active = np.bincount(per_day.index.weekday, minlength=7) / np.maximum(weekdays_in_span, 1)
+        archetypes[vehicle] = {
+            'active': active,
+            'trips': per_day.to_numpy(),
+            'first_start': day_seconds(trips.groupby('Day')['Trip Started'].min()),
+            'first_location': trips.groupby('Day')['Start Location'].first().mode().iloc[0],
+            'odometer': float(trips['Start Odometer'].min()),
+        }
+
+    # Stops between two trips of the same vehicle on the same day; the overnight stop is
+    # whatever is left until the next day's first trip
+    same_day = (df['Vehicle'].eq(df['Vehicle'].shift(-1)) & df['Day'].eq(df['Day'].shift(-1))).to_numpy()
+    places = df[PLACE_COLUMNS].dropna(subset=['End Location Modified']).sort_values('End Location Modified', kind='stable')
+    destinations, counts = np.unique(places['End Location Modified'].to_numpy(dtype=str), return_counts=True)
+    visits = pd.crosstab(df['Vehicle'], df['End Location Modified']).reindex(columns=destinations, fill_value=0)
+    return {
+        'archetypes': archetypes,
+        'kinematics': pd.DataFrame({
+            'Distance': df['Distance'].to_numpy(dtype=float),
+            'Driving': driving,
+            'Maximum Speed': df['Maximum Speed'].to_numpy(dtype=np.int64),
+        }),
+        'stops': stop[same_day],
+        'idling': idling[same_day],
+        'places': places.reset_index(drop=True),
+        'place_offsets': np.concatenate([[0], np.cumsum(counts)[:-1]]),
+        'place_counts': counts,
+        'destinations': destinations,
+        'visits': visits,
+    }
+
+
+# Sample vehicles keep their own names; extra vehicles are numbered after them
+def vehicle_names(count, archetypes):
+    names = list(archetypes)[:count]
+    return names + [str(100 + i) for i in range(count - len(names))]
+
+
+def generate_vehicle_trips(profile, name, archetype, days, rng):
+    active = rng.random(len(days)) < archetype['active'][days.weekday]
+    active_days = days[active]
+    trips_per_day = rng.choice(archetype['trips'], size=len(active_days))
+    total = int(trips_per_day.sum())
+    if total == 0:
+        return None
+
+    # Departures chain through the day: first start + previous driving and stops
+    kinematics = profile['kinematics'].iloc[rng.integers(len(profile['kinematics']), size=total)].reset_index(drop=True)
+    driving = kinematics['Driving'].to_numpy()
+    gaps = profile['stops'][rng.integers(len(profile['stops']), size=total)]
+    first_trip = np.concatenate([[0], np.cumsum(trips_per_day)[:-1]])
+    first_start = rng.choice(archetype['first_start'], size=len(active_days)) + rng.uniform(-300, 300, size=len(active_days))
+    elapsed = np.cumsum(driving + gaps) - (driving + gaps)
+    offset = np.repeat(first_start - elapsed[first_trip], trips_per_day) + elapsed
+    day = np.repeat(active_days.values, trips_per_day)
+    # A day stays a day: trips that would start after midnight are dropped
+    keep = offset < 86_400 - driving
+    started = (pd.to_datetime(day[keep]) + pd.to_timedelta(np.round(offset[keep] * 1000), unit='ms')).to_numpy()
+    driving = driving[keep]
+    kinematics = kinematics[keep].reset_index(drop=True)
+    ended = started + pd.to_timedelta(driving, unit='s').to_numpy()
+
+    # Each vehicle favours its own mix of destinations around its archetype's
+    weights = (profile['visits'].loc[archetype['name']].to_numpy() + 1.0) * rng.gamma(1.0, size=len(profile['destinations']))
+    destination = np.searchsorted(np.cumsum(weights), rng.random(len(started)) * weights.sum())
+    destination = np.minimum(destination, len(weights) - 1)
+    rows = profile['place_offsets'][destination] + (rng.random(len(started)) * profile['place_counts'][destination]).astype(np.int64)
+    places = profile['places'].iloc[rows].reset_index(drop=True)
+
+    stop_seconds = np.empty(len(started))
+    stop_seconds[:-1] = (started[1:] - ended[:-1]) / np.timedelta64(1, 's')
+    stop_seconds[-1] = profile['stops'][rng.integers(len(profile['stops']))]
+    idling = np.minimum(profile['idling'][rng.integers(len(profile['idling']), size=len(started))], stop_seconds)
+    distance = kinematics['Distance'].to_numpy()
+    odometer = archetype['odometer'] * rng.uniform(0.5, 1.5) + np.concatenate([[0], np.cumsum(distance)[:-1]])
+
+    trips = pd.DataFrame({
+        'Vehicle': name,
+        'Trip Started': started,
+        'Start Odometer': odometer,
+        'Start Location': np.concatenate([[archetype['first_location']], places['End Location Modified'].to_numpy()[:-1]]),
+        'Trip Ended': ended,
+        'End Odometer': odometer + distance,
+        'Distance': distance,
+        'Driving Duration': pd.to_timedelta(driving, unit='s'),
+        'Stop Duration': pd.to_timedelta(np.round(stop_seconds * 1000), unit='ms'),
+        'Idling Duration': pd.to_timedelta(np.round(idling * 1000), unit='ms'),
+        'Maximum Speed': kinematics['Maximum Speed'].to_numpy(),
+    })
+    for col in PLACE_COLUMNS:
+        trips[col] = places[col].to_numpy()
+    return trips
+
+
+def during_work_hours(timestamps):
+    seconds = day_seconds(timestamps)
+    return (timestamps.dt.weekday < 5).to_numpy() & (seconds >= WORK_HOURS[0]) & (seconds < WORK_HOURS[1])
+
+
+# Trips for `vehicles` vehicles over `days` days, in the GeoTab export's columns. Vehicles
+# cycle through the sample archetypes; the same seed always gives the same trips.
+def generate_geotab(profile, vehicles=5, days=91, start='2023-09-01', seed=0):
+    rng = np.random.default_rng(seed)
+    dates = pd.date_range(start, periods=days)
+    archetypes = list(profile['archetypes'])
+    frames = []
+    for i, name in enumerate(vehicle_names(vehicles, profile['archetypes'])):
+        archetype = dict(profile['archetypes'][archetypes[i % len(archetypes)]], name=archetypes[i % len(archetypes)])
+        trips = generate_vehicle_trips(profile, name, archetype, dates, rng)
+        if trips is not None:
+            frames.append(trips)
+    trips = pd.concat(frames, ignore_index=True).sort_values(['Trip Started', 'Vehicle'], kind='stable', ignore_index=True)
+
+    jitter = rng.normal(0, JITTER_DEGREES, size=(len(trips), 2))
+    trips['Trip Detai lLatitude'] = trips['Trip Detai lLatitude'].to_numpy(dtype=float) + jitter[:, 0]
+    trips['Trip Detail Longitude'] = trips['Trip Detail Longitude'].to_numpy(dtype=float) + jitter[:, 1]
+    trips['Date'] = trips['Trip Started']
+    trips['Start During Work Hours'] = during_work_hours(trips['Trip Started'])
+    trips['Stop During Work Hours'] = during_work_hours(trips['Trip Ended'])
+    trips['Month'] = trips['Trip Started'].dt.month_name()
+    trips['Week Number'] = trips['Trip Started'].dt.isocalendar().week.astype(np.int64)
+    for col in ['Vehicle', 'Start Location'] + PLACE_COLUMNS[:3] + ['Month']:
+        trips[col] = trips[col].astype('category')
+    return trips[GEOTAB_COLUMNS]
+
+
+# Durations the way the GeoTab export holds them: a time of day under 24 hours, otherwise a
+# datetime counted from the Excel epoch (durations.to_timedelta reads both back)
+def excel_durations(values):
+    clock = EXCEL_EPOCH + values
+    short = (values < pd.Timedelta(days=1)).to_numpy()
+    return np.where(short, clock.dt.time.to_numpy(), clock.astype(object).to_numpy())
+
+
+def write_geotab_workbook(trips, file_path, chunk_size=50_000):
+    wb = openpyxl.Workbook(write_only=True)
+    ws = wb.create_sheet(GEOTAB_SHEET)
+    ws.append(GEOTAB_COLUMNS)
+    for begin in range(0, len(trips), chunk_size):
+        chunk = trips.iloc[begin:begin + chunk_size]
+        columns = []
+        for col in GEOTAB_COLUMNS:
+            if col in DURATION_COLUMNS:
+                columns.append(excel_durations(chunk[col]).tolist())
+            else:
+                columns.append(chunk[col].astype(object).tolist())
+        for row in zip(*columns):
+            ws.append(row)
+    wb.save(file_path)
+
+
+# One workbook, or one per month when the trips do not fit on a single sheet
+def write_geotab_excel(trips, file_path):
+    if len(trips) <= EXCEL_MAX_ROWS:
+        write_geotab_workbook(trips, file_path)
+        return [file_path]
+    stem, ext = os.path.splitext(file_path)
+    paths = []
+    for month, part in trips.groupby(trips['Trip Started'].dt.strftime('%Y-%m'), sort=True):
+        if len(part) > EXCEL_MAX_ROWS:
+            raise ValueError(f"{len(part)} trips in {month} do not fit on one sheet; write the columnar copy only")
+        paths.append(f'{stem} {month}{ext}')
+        write_geotab_workbook(part, paths[-1])
+    return paths
+
+
+# Fill-ups for generated trips, in fuel_log.read_fuel_log's columns. Each vehicle burns a
+# fixed L/100 km (a few percent of noise per fill-up) and fills up 10 minutes after the trip
+# on which it has used about three quarters of a tank; a fill-up before its first trip
+# marks the tank full.
+def generate_fuel_log(trips, seed=0, tank_litres=FUEL_TANK_LITRES):
+    rng = np.random.default_rng(seed + 1)
+    trips = trips.sort_values(['Vehicle', 'Trip Ended'], kind='stable', ignore_index=True)
+    codes, vehicles = pd.factorize(trips['Vehicle'])
+    rate = rng.uniform(*FUEL_RATES, size=len(vehicles))[codes]
+    start = trips['Start Odometer'].to_numpy(dtype=np.float64)
+    end = trips['End Odometer'].to_numpy(dtype=np.float64)
+    cumulative = pd.Series(np.clip(end - start, 0, None)).groupby(codes).cumsum().to_numpy()
+    tanks = pd.Series(np.floor(cumulative / (tank_litres * 0.75 / rate * 100))).groupby(codes)
+    filled = (tanks.diff().fillna(tanks.transform('first')) > 0).to_numpy()
+
+    fills = pd.DataFrame({
+        'Date': trips['Trip Ended'][filled] + pd.Timedelta(minutes=10),
+        'Vehicle': trips['Vehicle'][filled].astype(str),
+        'Cumulative': cumulative[filled],
+        'Rate': rate[filled],
+        'Odometer': end[filled],
+    })
+    since = fills.groupby('Vehicle')['Cumulative'].diff().fillna(fills['Cumulative'])
+    fills['Litres'] = fills['Rate'] / 100 * since * rng.normal(1, 0.03, size=len(fills))
+    first = ~trips['Vehicle'].duplicated()
+    baseline = pd.DataFrame({
+        'Date': trips['Trip Started'][first] - pd.Timedelta(minutes=10),
+        'Vehicle': trips['Vehicle'][first].astype(str),
+        'Litres': rng.uniform(0.2, 0.6, size=int(first.sum())) * tank_litres,
+        'Odometer': start[first],
+    })
+    log = pd.concat([baseline, fills[FUEL_COLUMNS]], ignore_index=True)
+    log = log.sort_values(['Date', 'Vehicle'], kind='stable', ignore_index=True)
+    return log.assign(Litres=log['Litres'].round(2), Odometer=log['Odometer'].round(1))[FUEL_COLUMNS]
+
+
+# Empirical distributions of the merged manual logs: calls per day, call-in times and call
+# lengths, and whole call rows (who, trade, from, to, vehicle) resampled jointly
+def fit_manual(df):
+    df = df.copy()
+    flags = df[list(VEHICLE_COLUMNS)].apply(pd.to_numeric, errors='coerce').fillna(0).gt(0)
+    df = df[flags.any(axis=1)]
+    called_in = to_seconds(df['Time called in'], fill=-1).to_numpy()
+    call_seconds = to_seconds(df['Time for Call'], fill=-1).to_numpy()
+    return {
+        'calls': df.groupby('Date').size().to_numpy(),
+        'called_in': called_in[called_in >= 0],
+        'call_seconds': call_seconds[call_seconds > 0],
+        'rows': pd.DataFrame({
+            'NAME': df['NAME'].to_numpy(),
+            'Orders': pd.to_numeric(df['Orders'], errors='coerce').fillna(0).astype(np.int64).to_numpy(),
+            'Tools': df['Tools'].to_numpy(),
+            '# of passengers': df['# of passengers'].to_numpy(),
+            'Trade': df['Trade'].to_numpy(),
+            'From': df['From'].to_numpy(),
+            'To': df['To'].to_numpy(),
+            'Vehicle Column': np.array(list(VEHICLE_COLUMNS))[flags[flags.any(axis=1)].to_numpy().argmax(axis=1)],
+        }),
+    }
+
+
+# Dispatch calls for every weekday from `start` for `days` days, in read_month_workbook's
+# long format (LOG_COLUMNS, Date as the I1 text, Sheet). calls_scale multiplies the sampled
+# calls per day; a sheet holds at most CALLS_PER_SHEET calls.
+def generate_manual(profile, days=91, start='2023-09-01', seed=0, calls_scale=1.0):
+    rng = np.random.default_rng(seed)
+    dates = pd.date_range(start, periods=days)
+    dates = dates[dates.weekday < 5]
+    calls = np.minimum(np.round(rng.choice(profile['calls'], size=len(dates)) * calls_scale).astype(np.int64), CALLS_PER_SHEET)
+    total = int(calls.sum())
+
+    calls_frame = profile['rows'].iloc[rng.integers(len(profile['rows']), size=total)].reset_index(drop=True)
+    day = np.repeat(np.arange(len(dates)), calls)
+    called_in = profile['called_in'][rng.integers(len(profile['called_in']), size=total)]
+    order = np.lexsort((called_in, day))
+    called_in = called_in[order]
+    call_seconds = profile['call_seconds'][rng.integers(len(profile['call_seconds']), size=total)]
+    completed = np.minimum(called_in + call_seconds, 86_399)
+
+    month_codes = dates.month
+    sheet_numbers = pd.Series(1, index=dates).groupby(month_codes).cumsum().to_numpy()
+    log = pd.DataFrame({col: [None] * total for col in LOG_COLUMNS})
+    log['Time called in'] = [datetime.time(int(s) // 3600, int(s) // 60 % 60) for s in called_in]
+    for col in ['NAME', 'Tools', '# of passengers', 'Trade', 'From', 'To']:
+        log[col] = calls_frame[col].to_numpy()
+    log['Orders'] = np.where(calls_frame['Orders'].to_numpy() > 0, calls_frame['Orders'].to_numpy(), None)
+    for col in VEHICLE_COLUMNS:
+        log[col] = np.where(calls_frame['Vehicle Column'].to_numpy() == col, 1, None)
+    log['Time Completed'] = [datetime.time(int(s) // 3600, int(s) // 60 % 60) for s in completed]
+    log['Time for Call'] = pd.to_timedelta((completed // 60 - called_in // 60) * 60, unit='s').to_pytimedelta()
+    log['Date'] = np.array([day_label(date) for date in dates], dtype=object)[day]
+    log['Sheet'] = np.array([f'Day{n}' for n in sheet_numbers], dtype=object)[day]
+    log['Month'] = dates.strftime('%Y-%m')[day]
+    return log
+
+
+# I1 text in the dispatch sheets' own style, e.g. 'FRIDAY 01 SEP,2023'
+def day_label(date):
+    return date.strftime('%A %d %b,%Y').upper()
+
+
+# One "Day N" sheet per working day: title and I1 date in row 1, vehicles in service in H2,
+# the header in row 3 and one call per row below it, a 1 in the vehicle's column
+def write_manual_workbook(month_log, file_path):
+    wb = openpyxl.Workbook(write_only=True)
+    for sheet, calls in month_log.groupby('Sheet', sort=False):
+        ws = wb.create_sheet(sheet)
+        title_row = [None] * len(LOG_COLUMNS)
+        title_row[0] = 'Facility & Services: Vehicle Log Sheet'
+        title_row[DATE_CELL[1] - 2] = 'Date:'
+        title_row[DATE_CELL[1] - 1] = calls['Date'].iloc[0]
+        title_row[12] = 'Dispatcher: '
+        ws.append(title_row)
+        in_service = int(calls[list(VEHICLE_COLUMNS)].notna().any().sum())
+        ws.append(['>>>>>>>>>>># of Vehicles in Service>>>>>>>>>>>>>'] + [None] * 6 + [in_service])
+        ws.append(LOG_COLUMNS)
+        for row in calls[LOG_COLUMNS].itertuples(index=False):
+            ws.append(list(row))
+    wb.save(file_path)
+
+
+# 'Sep 2023.xlsx' for '2023-09', like the monthly workbooks the dispatch desk sends
+def month_workbook_name(month):
+    return pd.Timestamp(month).strftime('%b %Y') + '.xlsx'
+
+
+def write_manual_excel(log, out_dir=OUTPUT_DIR):
+    paths = []
+    for month, month_log in log.groupby('Month', sort=True):
+        paths.append(os.path.join(out_dir, month_workbook_name(month)))
+        write_manual_workbook(month_log, paths[-1])
+    return paths
+
+
+def pop_option(args, name, default):
+    if name not in args:
+        return default
+    position = args.index(name)
+    value = args[position + 1]
+    del args[position:position + 2]
+    return value
+
+
+# python fleet_synth.py geotab [vehicles] [days] [--start 2023-09-01] [--seed 0] [--out synthetic] [--no-excel]
+# python fleet_synth.py manual [days] [--calls-scale 1.0] [--start 2023-09-01] [--seed 0] [--out synthetic] [--no-excel]
+# Distributions are fitted from the sample workbooks; every run with the same arguments
+# writes the same data, as Excel and as an Arrow copy (excel_cache.read_cache) next to it.
+# geotab also writes a fuel log of fill-ups for the generated trips (fuel_log.py).
+def main():
+    args = sys.argv[1:]
+    start = pop_option(args, '--start', '2023-09-01')
+    seed = int(pop_option(args, '--seed', 0))
+    out_dir = pop_option(args, '--out', OUTPUT_DIR)
+    calls_scale = float(pop_option(args, '--calls-scale', 1.0))
+    excel = '--no-excel' not in args
+    args = [arg for arg in args if not arg.startswith('--')]
+    kind = args[0] if args else 'geotab'
+    os.makedirs(out_dir, exist_ok=True)
+    begin = time.perf_counter()
+
+    if kind == 'geotab':
+        vehicles = int(args[1]) if len(args) > 1 else 5
+        days = int(args[2]) if len(args) > 2 else 91
+        profile = fit_geotab(read_excel_cached(GEOTAB_SAMPLE))
+        trips = generate_geotab(profile, vehicles, days, start, seed)
+        base_path = os.path.join(out_dir, f'GeoTab synthetic {vehicles}v {days}d')
+        write_cache(trips, base_path)
+        print(f"Generated {len(trips)} trips for {trips['Vehicle'].nunique()} vehicles over {days} days "
+              f"in {time.perf_counter() - begin:.1f}s; columnar copy in {base_path}.arrow")
+        paths = write_geotab_excel(trips, base_path + '.xlsx') if excel else []
+        fuel_log = generate_fuel_log(trips, seed)
+        fuel_path = os.path.join(out_dir, f'Fuel synthetic {vehicles}v {days}d')
+        write_cache(fuel_log, fuel_path)
+        print(f"Generated {len(fuel_log)} fill-ups; columnar copy in {fuel_path}.arrow")
+        if excel:
+            fuel_log.to_excel(fuel_path + '.xlsx', index=False)
+            paths.append(fuel_path + '.xlsx')
+    elif kind == 'manual':
+        days = int(args[1]) if len(args) > 1 else 91
+        profile = fit_manual(read_excel_cached(MANUAL_SAMPLE))
+        log = generate_manual(profile, days, start, seed, calls_scale)
+        base_path = os.path.join(out_dir, f'Manual synthetic {days}d')
+        tidy = tidy_month_data(log.assign(**{'Source File': log['Month'].map(month_workbook_name)}))
+        write_cache(tidy, base_path)
+        print(f"Generated {len(log)} calls on {log['Date'].nunique()} working days "
+              f"in {time.perf_counter() - begin:.1f}s; columnar copy in {base_path}.arrow")
+        paths = write_manual_excel(log, out_dir) if excel else []
+    else:
+        print("Usage: python fleet_synth.py geotab [vehicles] [days] | python fleet_synth.py manual [days]")
+        return
+    if paths:
+        print(f"Wrote {', '.join(paths)} in {time.perf_counter() - begin:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
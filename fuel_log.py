@@ -0,0 +1,120 @@
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+from excel_cache import read_excel_cached
+from schema import FUEL_SCHEMA, apply_schema
+
+
+FUEL_LOG_FILE = 'fuel_log.xlsx'
+FUEL_COLUMNS = list(FUEL_SCHEMA)
+
+# Header names fuel-card and fleet exports use for the same fields
+COLUMN_ALIASES = {
+    'Transaction Date': 'Date',
+    'Date/Time': 'Date',
+    'Unit': 'Vehicle',
+    'Vehicle ID': 'Vehicle',
+    'Liters': 'Litres',
+    'Volume': 'Litres',
+    'Quantity': 'Litres',
+    'Odometer Reading': 'Odometer',
+    'Odo': 'Odometer',
+}
+
+
+# Fill-ups (Date, Vehicle, Litres, Odometer) from an Excel or CSV fuel log, typed by the
+# shared schema; rows without a date, vehicle or volume are dropped
+def read_fuel_log(file_path=FUEL_LOG_FILE):
+    if file_path.lower().endswith('.csv'):
+        raw = pd.read_csv(file_path)
+    else:
+        raw = read_excel_cached(file_path)
+    fills = apply_schema(raw.rename(columns=COLUMN_ALIASES), FUEL_SCHEMA, file_path)[FUEL_COLUMNS]
+    return fills.dropna(subset=['Date', 'Vehicle', 'Litres']).reset_index(drop=True)
+
+
+# Distance of each trip from its odometer readings, in float64
+def trip_distances(trips):
+    start = pd.to_numeric(trips['Start Odometer'], errors='coerce').astype('float64')
+    end = pd.to_numeric(trips['End Odometer'], errors='coerce').astype('float64')
+    return (end - start).clip(lower=0)
+
+
+# Full-tank attribution: the litres of a fill-up refuel what the vehicle burned since its
+# previous fill-up, so they are shared out over the trips that ended in between, in
+# proportion to distance. One as-of merge (each trip to the vehicle's next fill-up) does the
+# matching for all vehicles. Trips before a vehicle's first logged fill-up or after its last
+# one have no known fuel and get NaN. Returns 'Fuel Used' (litres) and 'Fill' (the position
+# of the fill-up in fills, -1 for none) aligned with trips.
+def attribute_fuel(trips, fills, time_col='Trip Ended'):
+    left = pd.DataFrame({
+        'Vehicle': trips['Vehicle'].astype(str).to_numpy(),
+        'Time': pd.to_datetime(trips[time_col]).astype('datetime64[ns]').to_numpy(),
+        'Trip': np.arange(len(trips)),
+    }).dropna(subset=['Time']).sort_values('Time', kind='stable')
+    order = np.argsort(fills['Date'].to_numpy(), kind='stable')
+    right = pd.DataFrame({
+        'Vehicle': fills['Vehicle'].astype(str).to_numpy()[order],
+        'Time': pd.to_datetime(fills['Date']).astype('datetime64[ns]').to_numpy()[order],
+        'Position': order,
+    })
+    # A fill-up with an earlier fill-up of the same vehicle before it closes an interval;
+    # the first one only marks where the tank was full
+    right['Closes'] = right.duplicated('Vehicle')
+    matched = pd.merge_asof(left, right, on='Time', by='Vehicle', direction='forward')
+    matched = matched[matched['Closes'].eq(True)]
+
+    rows = matched['Trip'].to_numpy()
+    position = matched['Position'].to_numpy().astype(np.int64)
+    distance = trip_distances(trips).to_numpy()[rows]
+    # Distance of each fill-up's interval, one bincount over all of them
+    interval = np.bincount(position, weights=np.nan_to_num(distance), minlength=len(fills))[position]
+    litres = fills['Litres'].to_numpy(dtype=np.float64)[position]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        share = np.where(interval > 0, distance / interval, np.nan)
+
+    fuel_used = np.full(len(trips), np.nan)
+    fuel_used[rows] = litres * share
+    fill = np.full(len(trips), -1, dtype=np.int64)
+    fill[rows] = position
+    return pd.DataFrame({'Fuel Used': fuel_used, 'Fill': fill}, index=trips.index)
+
+
+# Distance, fuel and L/100 km per vehicle (freq=None) or per vehicle and period (a pandas
+# period alias such as 'M' or 'W-MON', of time_col), over the trips that have fuel attributed
+def fuel_economy(trips, trip_fuel, freq=None, time_col='Trip Started'):
+    known = trip_fuel['Fuel Used'].notna()
+    keys = [trips['Vehicle'].astype(str)[known].rename('Vehicle')]
+    if freq is not None:
+        label = 'Month' if freq == 'M' else 'Period'
+        keys.append(pd.to_datetime(trips[time_col])[known].dt.to_period(freq).rename(label))
+    work = pd.DataFrame({'Distance': trip_distances(trips)[known], 'Fuel Used': trip_fuel['Fuel Used'][known]})
+    totals = work.groupby(keys).sum()
+    totals['Fuel Economy'] = totals['Fuel Used'] / totals['Distance'].where(totals['Distance'] > 0) * 100
+    return totals
+
+
+# python fuel_log.py <fuel_log.xlsx|csv> <trips.xlsx> [--freq M]
+def main():
+    args = sys.argv[1:]
+    freq = 'M'
+    if '--freq' in args:
+        position = args.index('--freq')
+        freq = args[position + 1]
+        del args[position:position + 2]
+    if len(args) < 2 or not all(os.path.exists(path) for path in args[:2]):
+        print("Usage: python fuel_log.py <fuel_log.xlsx|csv> <trips.xlsx> [--freq M]")
+        return
+    fills = read_fuel_log(args[0])
+    trips = read_excel_cached(args[1])
+    trip_fuel = attribute_fuel(trips, fills)
+    print(f"{len(fills)} fill-ups, fuel attributed to {trip_fuel['Fuel Used'].notna().sum()} of {len(trips)} trips")
+    print(fuel_economy(trips, trip_fuel).round(2))
+    print(fuel_economy(trips, trip_fuel, freq).round(2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+import re
+import sys
+
+import folium
+import numpy as np
+import pandas as pd
+from folium.plugins import HeatMap
+
+from excel_stream import iter_excel_batches
+from telemetry import enable_from_argv, profiled, stage
+
+
+LAT_COLUMN = 'Trip Detai lLatitude'
+LON_COLUMN = 'Trip Detail Longitude'
+# Grid resolution in degrees; 0.0005 deg is about 55 m north-south (a bit less east-west here)
+CELL_SIZE = 0.0005
+ALL_VEHICLES = 'all'
+
+
+# File or folder name of a layer (the fleet or one vehicle) for the dashboard payloads and
+# tiles; vehicle names may hold spaces or slashes
+def layer_name(layer):
+    return re.sub(r'[^A-Za-z0-9_-]', '_', str(layer))
+
+
+# Grid cell (row, col) of each point, computed on whole arrays
+def grid_cells(latitudes, longitudes, cell_size=CELL_SIZE):
+    rows = np.floor(np.asarray(latitudes, dtype=float) / cell_size).astype(np.int64)
+    cols = np.floor(np.asarray(longitudes, dtype=float) / cell_size).astype(np.int64)
+    return rows, cols
+
+
+# Visits per (Vehicle, Row, Col) for one batch of trips
+def bin_batch(batch, cell_size=CELL_SIZE):
+    batch = batch.dropna(subset=['Vehicle', LAT_COLUMN, LON_COLUMN])
+    rows, cols = grid_cells(batch[LAT_COLUMN], batch[LON_COLUMN], cell_size)
+    cells = pd.DataFrame({'Vehicle': batch['Vehicle'].values, 'Row': rows, 'Col': cols})
+    return cells.groupby(['Vehicle', 'Row', 'Col']).size()
+
+
+# Weighted visit grid for a stream of batches (e.g. excel_stream.iter_excel_batches).
+# Memory and output size follow the number of occupied cells, not the number of trips.
+def build_visit_grid(batches, cell_size=CELL_SIZE):
+    grid = None
+    for batch in batches:
+        counts = bin_batch(batch, cell_size)
+        grid = counts if grid is None else grid.add(counts, fill_value=0)
+    if grid is None:
+        grid = pd.Series(dtype='int64', index=pd.MultiIndex.from_arrays([[], [], []], names=['Vehicle', 'Row', 'Col']))
+    return grid.astype('int64').rename('Visits')
+
+
+# [lat, lon, visits] at the centre of each occupied cell; cells is indexed by (Row, Col)
+def heat_points(cells, cell_size=CELL_SIZE):
+    rows = cells.index.get_level_values('Row').values
+    cols = cells.index.get_level_values('Col').values
+    return pd.DataFrame({
+        'Latitude': np.round((rows + 0.5) * cell_size, 6),
+        'Longitude': np.round((cols + 0.5) * cell_size, 6),
+        'Visits': cells.values,
+    })
+
+
+def legend_html(max_visits):
+    return f'''
+     <div style="position: fixed;
+     bottom: 50px; left: 50px; width: 130px; height: 140px;
+     border:2px solid grey; z-index:9999; font-size:14px;
+     background-color: white; padding: 10px"
+     >&nbsp; Visit Density  <br>
+     &nbsp; 1 visit &nbsp; <i style="background: #00FF00; width: 12px; height: 12px; display: inline-block;"></i> &nbsp; <br>
+     &nbsp; {max_visits // 4} visits &nbsp; <i style="background: #7FFF00; width: 12px; height: 12px; display: inline-block;"></i><br>
+     &nbsp; {max_visits // 2} visits &nbsp; <i style="background: #FFFF00; width: 12px; height: 12px; display: inline-block;"></i><br>
+     &nbsp; {3 * max_visits // 4} visits &nbsp; <i style="background: #FF4500; width: 12px; height: 12px; display: inline-block;"></i><br>
+     &nbsp; {max_visits} visits &nbsp; <i style="background: #FF0000; width: 12px; height: 12px; display: inline-block;"></i> &nbsp;
+     </div>
+     '''
+
+
+# Heat map of one set of binned cells, centred on the visit-weighted mean, with a legend
+# scaled to the busiest cell
+def heatmap(cells, cell_size=CELL_SIZE, zoom_start=13):
+    points = heat_points(cells, cell_size)
+    total_visits = points['Visits'].sum()
+    map_center = [(points['Latitude'] * points['Visits']).sum() / total_visits,
+                  (points['Longitude'] * points['Visits']).sum() / total_visits]
+    m = folium.Map(location=map_center, zoom_start=zoom_start)
+    HeatMap(points.values.tolist()).add_to(m)
+    m.get_root().html.add_child(folium.Element(legend_html(int(points['Visits'].max()))))
+    return m
+
+
+# The overview map and one map per vehicle from the same grid: {'all': map, vehicle: map, ...}
+@profiled
+def build_heatmaps(grid, cell_size=CELL_SIZE):
+    maps = {}
+    if grid.empty:
+        return maps
+    maps[ALL_VEHICLES] = heatmap(grid.groupby(level=['Row', 'Col']).sum(), cell_size)
+    for vehicle, cells in grid.groupby(level='Vehicle'):
+        maps[vehicle] = heatmap(cells.droplevel('Vehicle'), cell_size)
+    return maps
+
+
+def heatmap_filename(vehicle):
+    return 'heatmap_all_with_legend.html' if vehicle == ALL_VEHICLES else f'heatmap_{vehicle}.html'
+
+
+@profiled
+def read_visit_grid(file_path, sheet_name=0, cell_size=CELL_SIZE):
+    columns = ['Vehicle', LAT_COLUMN, LON_COLUMN]
+    dtypes = {'Vehicle': str, LAT_COLUMN: 'float64', LON_COLUMN: 'float64'}
+    return build_visit_grid(iter_excel_batches(file_path, sheet_name, usecols=columns, dtypes=dtypes), cell_size)
+
+
+# python heatmaps.py <workbook> [cell size in degrees] [--profile]
+def main():
+    enable_from_argv('heatmaps')
+    args = [arg for arg in sys.argv[1:] if not arg.startswith('--')]
+    file_path = args[0] if args else '0 Combined.xlsx'
+    cell_size = float(args[1]) if len(args) > 1 else CELL_SIZE
+    grid = read_visit_grid(file_path, cell_size=cell_size)
+    print(f"{grid.sum()} visits binned into {len(grid)} vehicle cells of {cell_size} deg")
+    maps = build_heatmaps(grid, cell_size)
+    with stage('save_maps', rows_in=len(maps)):
+        for vehicle, m in maps.items():
+            m.save(heatmap_filename(vehicle))
+            print(f"Saved {heatmap_filename(vehicle)}")
+
+
+if __name__ == "__main__":
+    main()
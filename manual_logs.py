@@ -0,0 +1,76 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import openpyxl
+import pandas as pd
+
+from dates import normalize_dates
+
+
+MONTH_FILES = ['Sept 2023.xlsx', 'Oct 2023.xlsx', 'Nov 2023.xlsx']
+
+# The "Day N" sheets label the vehicle columns with whoever drove that day
+# ('#14A MICHAEL', '#38 ', ...), so the A:O block is named by position instead
+LOG_COLUMNS = ['Time called in', 'NAME', 'Orders', 'Tools', '# of passengers', 'Trade', 'From', 'To',
+               '#14', '#38A', '#46', '#47', '#51', 'Time Completed', 'Time for Call']
+VEHICLE_COLUMNS = {'#14': '14A', '#38A': '38A', '#46': '46', '#47': '47', '#51': '51'}
+FILL_ZERO_COLUMNS = ['Orders', '# of passengers'] + list(VEHICLE_COLUMNS)
+
+DATE_CELL = (1, 9)  # I1
+HEADER_ROW, LAST_ROW = 3, 220  # A3:O220, header in row 3
+
+
+# Read every "Day" sheet of one monthly workbook in a single pass.
+# Rows 1..220 are streamed once per sheet; I1 and the A3:O220 block both come out of that pass.
+def read_month_workbook(file_path):
+    wb = openpyxl.load_workbook(file_path, read_only=True, data_only=True)
+    frames = []
+    try:
+        for ws in wb.worksheets:
+            if not ws.title.startswith('Day'):
+                continue
+            rows = list(ws.iter_rows(min_row=1, max_row=LAST_ROW, max_col=len(LOG_COLUMNS), values_only=True))
+            if not rows:
+                continue
+            date_row = rows[DATE_CELL[0] - 1]
+            date = date_row[DATE_CELL[1] - 1] if len(date_row) >= DATE_CELL[1] else None
+            block = [row for row in rows[HEADER_ROW:] if row and row[0] is not None]
+            if not block:
+                continue
+            day_data = pd.DataFrame(block, columns=LOG_COLUMNS)
+            day_data['Date'] = date
+            day_data['Sheet'] = ws.title
+            frames.append(day_data)
+    finally:
+        wb.close()
+    if not frames:
+        return pd.DataFrame(columns=LOG_COLUMNS + ['Date', 'Sheet', 'Source File'])
+    month_data = pd.concat(frames, ignore_index=True)
+    month_data['Source File'] = os.path.basename(file_path)
+    return month_data
+
+
+# Fill the count columns and add the Vehivle/Month/Week columns the downstream scripts expect
+def tidy_month_data(merged):
+    merged = merged.copy()
+    for col in FILL_ZERO_COLUMNS:
+        merged[col] = merged[col].fillna(0)
+
+    flags = merged[list(VEHICLE_COLUMNS)].apply(pd.to_numeric, errors='coerce').fillna(0).gt(0)
+    labels = np.array(list(VEHICLE_COLUMNS.values()), dtype=object)
+    merged['Vehivle'] = np.where(flags.any(axis=1), labels[flags.values.argmax(axis=1)], 'Error')
+
+    # I1 is free text such as 'FRIDAY 01 SEPT,2023' or 'oct/12/2023'
+    parsed, _ = normalize_dates(merged['Date'])
+    merged['Month'] = parsed.dt.strftime('%b')
+    merged['Week'] = parsed.dt.isocalendar().week
+
+    return merged[['Vehivle'] + LOG_COLUMNS + ['Date', 'Month', 'Week', 'Source File']]
+
+
+# Read the monthly workbooks in worker processes and concatenate them once
+def merge_month_workbooks(file_paths=MONTH_FILES, max_workers=None):
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        months = list(executor.map(read_month_workbook, file_paths))
+    return tidy_month_data(pd.concat(months, ignore_index=True))
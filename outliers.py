@@ -0,0 +1,261 @@
+import sys
+
+import numpy as np
+import pandas as pd
+
+from durations import to_minutes
+from excel_stream import iter_excel_batches
+
+
+IQR_FACTOR = 1.5
+SKETCH_SIZE = 200
+QUARTILES = [0.25, 0.75]
+
+# Columns screened by the command line; durations are judged in minutes
+SCREEN_COLUMNS = ['End Odometer', 'Distance', 'Maximum Speed', 'Driving Duration', 'Stop Duration', 'Idling Duration']
+DURATION_COLUMNS = ['Driving Duration', 'Stop Duration', 'Idling Duration']
+
+
+# Group of each row: the vehicle, plus the calendar month of time_col when one is given
+def group_keys(df, by='Vehicle', time_col=None):
+    keys = [df[by]]
+    if time_col is not None:
+        keys.append(pd.to_datetime(df[time_col]).dt.to_period('M').rename('Month'))
+    return keys
+
+
+# Lower/upper fences from the quartiles, columns (column, 'lower'/'upper')
+def fences(quartiles, k=IQR_FACTOR):
+    q1 = quartiles.xs(QUARTILES[0], axis=1, level=1)
+    q3 = quartiles.xs(QUARTILES[1], axis=1, level=1)
+    iqr = q3 - q1
+    bounds = pd.concat({'lower': q1 - k * iqr, 'upper': q3 + k * iqr}, axis=1).swaplevel(axis=1)
+    return bounds.reindex(columns=pd.MultiIndex.from_product([q1.columns, ['lower', 'upper']]))
+
+
+# IQR fences per vehicle (per vehicle and month with time_col) for several numeric columns
+# in one grouped quantile pass. Indexed by group; columns (column, 'lower'/'upper').
+def iqr_bounds(df, columns, by='Vehicle', time_col=None, k=IQR_FACTOR):
+    quartiles = df[columns].groupby(group_keys(df, by, time_col), observed=True).quantile(QUARTILES)
+    quartiles = quartiles.unstack(-1)
+    return fences(quartiles, k)
+
+
+# Boolean flags (one column per column, same index as df) for values outside their own
+# group's fences. Bounds come from iqr_bounds, or from QuantileSketches.bounds() when the
+# data is screened in batches; rows of a group without bounds are not flagged.
+def outlier_flags(df, columns, by='Vehicle', time_col=None, k=IQR_FACTOR, bounds=None):
+    if bounds is None:
+        bounds = iqr_bounds(df, columns, by, time_col, k)
+    keys = group_keys(df, by, time_col)
+    row_groups = pd.MultiIndex.from_arrays(keys) if len(keys) > 1 else pd.Index(keys[0])
+    positions = bounds.index.get_indexer(row_groups)
+    known = positions >= 0
+    flags = {}
+    for col in columns:
+        values = pd.to_numeric(df[col], errors='coerce').to_numpy(dtype=np.float64)
+        lower = np.where(known, bounds[(col, 'lower')].to_numpy(dtype=np.float64)[positions], np.nan)
+        upper = np.where(known, bounds[(col, 'upper')].to_numpy(dtype=np.float64)[positions], np.nan)
+        flags[col] = (values < lower) | (values > upper)
+    return pd.DataFrame(flags, index=df.index)
+
+
+# Group keys as a plain (Multi)Index, so keys from different batches compare by value
+def key_index(keys):
+    if len(keys) == 1:
+        return pd.Index(np.asarray(keys[0], dtype=object), name=keys[0].name)
+    return pd.MultiIndex.from_arrays([np.asarray(key, dtype=object) for key in keys], names=[key.name for key in keys])
+
+
+# Order by code, then by mean within a code (faster than np.lexsort; the order of equal
+# means does not matter, so only the second sort needs to be stable)
+def code_order(codes, means):
+    order = np.argsort(means)
+    return order[np.argsort(codes[order], kind='stable')]
+
+
+# Start of each run of equal values in a sorted array
+def run_starts(values):
+    return np.flatnonzero(np.r_[True, values[1:] != values[:-1]])
+
+
+# Mergeable quantile sketches, one per (group, column), for data seen in batches.
+# Each sketch is a set of (mean, weight) centroids. While a group has at most `size` values
+# they are kept as they are and quantiles match pandas exactly; past that, neighbouring
+# values are folded into `size` centroids of equal weight (a uniform t-digest), so memory
+# per group is fixed and the rank error is about 1/size. Centroids of all groups live in
+# three flat arrays keyed by group code; a batch re-folds only the groups it touches, and
+# sketches from other files or workers merge by pooling their centroids the same way.
+class QuantileSketches:
+    def __init__(self, columns, by='Vehicle', time_col=None, size=SKETCH_SIZE):
+        self.columns = list(columns)
+        self.by = by
+        self.time_col = time_col
+        self.size = size
+        self.keys = None
+        self.codes = np.zeros(0, dtype=np.int64)
+        self.means = np.zeros(0, dtype=np.float64)
+        self.weights = np.zeros(0, dtype=np.float64)
+
+    # Positions of the given group keys, registering the ones not seen before
+    def key_positions(self, keys):
+        if self.keys is None:
+            self.keys = keys[:0]
+        new_keys = keys[~keys.isin(self.keys)]
+        if len(new_keys):
+            self.keys = self.keys.append(new_keys)
+        return self.keys.get_indexer(keys)
+
+    def add(self, batch):
+        row_codes, uniques = key_index(group_keys(batch, self.by, self.time_col)).factorize()
+        if not len(uniques):
+            return self
+        known = row_codes >= 0
+        positions = self.key_positions(uniques)[row_codes[known]]
+        codes, means = [], []
+        for i, col in enumerate(self.columns):
+            values = pd.to_numeric(batch[col], errors='coerce').to_numpy(dtype=np.float64)[known]
+            present = ~np.isnan(values)
+            codes.append(positions[present] * len(self.columns) + i)
+            means.append(values[present])
+        codes = np.concatenate(codes)
+        return self.fold(codes, np.concatenate(means), np.ones(len(codes)))
+
+    def merge(self, other):
+        if other.columns != self.columns or other.by != self.by or other.time_col != self.time_col:
+            raise ValueError("Can only merge sketches of the same columns and grouping")
+        if other.keys is None:
+            return self
+        positions = self.key_positions(other.keys)
+        width = len(self.columns)
+        codes = positions[other.codes // width] * width + other.codes % width
+        return self.fold(codes, other.means, other.weights)
+
+    def fold(self, codes, means, weights):
+        touched = np.isin(self.codes, np.unique(codes))
+        codes = np.concatenate([self.codes[touched], codes])
+        means = np.concatenate([self.means[touched], means])
+        weights = np.concatenate([self.weights[touched], weights])
+        order = code_order(codes, means)
+        codes, means, weights = codes[order], means[order], weights[order]
+
+        starts = run_starts(codes)
+        lengths = np.diff(np.r_[starts, len(codes)])
+        total = np.repeat(np.add.reduceat(weights, starts), lengths)
+        cumulative = np.cumsum(weights)
+        within = cumulative - np.repeat(cumulative[starts] - weights[starts], lengths)
+        rank = np.arange(len(codes)) - np.repeat(starts, lengths)
+        # Small groups keep every value; larger ones fold into `size` equal-weight bins by rank
+        bins = np.where(total <= self.size, rank,
+                        np.minimum(np.floor((within - weights / 2) / total * self.size), self.size - 1)).astype(np.int64)
+        boundaries = np.flatnonzero(np.r_[True, (codes[1:] != codes[:-1]) | (bins[1:] != bins[:-1])])
+        folded_weights = np.add.reduceat(weights, boundaries)
+        folded_means = np.add.reduceat(means * weights, boundaries) / folded_weights
+
+        self.codes = np.concatenate([self.codes[~touched], codes[boundaries]])
+        self.means = np.concatenate([self.means[~touched], folded_means])
+        self.weights = np.concatenate([self.weights[~touched], folded_weights])
+        return self
+
+    # Quantiles per group, interpolated linearly between centroid centres (pandas' 'linear'
+    # method when the values are all kept). Indexed by group; columns (column, q).
+    def quantiles(self, qs=QUARTILES):
+        columns = pd.MultiIndex.from_product([self.columns, list(qs)])
+        if self.keys is None:
+            return pd.DataFrame(columns=columns)
+        order = code_order(self.codes, self.means)
+        codes, means, weights = self.codes[order], self.means[order], self.weights[order]
+        starts = run_starts(codes)
+        ends = np.r_[starts[1:], len(codes)] - 1
+        lengths = np.diff(np.r_[starts, len(codes)])
+        cumulative = np.cumsum(weights)
+        within = cumulative - np.repeat(cumulative[starts] - weights[starts], lengths)
+        total = within[ends]
+        # Centroid covering ranks [c - w, c - 1] (0-based) is centred at c - w/2 - 0.5
+        centre = within - weights / 2 - 0.5
+        # One interpolation over all groups: each group's centres are shifted past the previous
+        # group's, and targets are clamped to their own group's first and last centre
+        span = total.max() + 1
+        shift = np.arange(len(starts)) * span
+        group_shift = np.repeat(shift, lengths)
+
+        width = len(self.columns)
+        table = np.full((len(self.keys), width * len(qs)), np.nan)
+        rows, cols = codes[starts] // width, codes[starts] % width
+        for j, q in enumerate(qs):
+            target = np.clip(q * (total - 1), centre[starts], centre[ends])
+            table[rows, cols * len(qs) + j] = np.interp(target + shift, centre + group_shift, means)
+        return pd.DataFrame(table, index=self.keys, columns=columns)
+
+    def bounds(self, k=IQR_FACTOR):
+        return fences(self.quantiles(QUARTILES), k)
+
+
+# Durations as minutes so they can be screened like any other number
+def prepare_batch(batch, columns):
+    for col in columns:
+        if col in DURATION_COLUMNS:
+            batch[col] = to_minutes(batch[col])
+    return batch
+
+
+# Screen a workbook too big to load: one streamed pass builds the per-group sketches, a
+# second flags each batch against the finished bounds. Returns the bounds and the number
+# of outliers per group and column.
+def screen_excel(file_path, sheet_name=0, columns=SCREEN_COLUMNS, by='Vehicle', time_col=None, k=IQR_FACTOR, size=SKETCH_SIZE):
+    usecols = [by] + ([time_col] if time_col is not None else []) + list(columns)
+    dtypes = {by: str}
+    if time_col is not None:
+        dtypes[time_col] = 'datetime64[ns]'
+
+    sketches = QuantileSketches(columns, by, time_col, size)
+    for batch in iter_excel_batches(file_path, sheet_name, usecols=usecols, dtypes=dtypes):
+        sketches.add(prepare_batch(batch, columns))
+    bounds = sketches.bounds(k)
+
+    counts = None
+    for batch in iter_excel_batches(file_path, sheet_name, usecols=usecols, dtypes=dtypes):
+        batch = prepare_batch(batch, columns)
+        flags = outlier_flags(batch, columns, by, time_col, k, bounds)
+        batch_counts = flags.groupby(group_keys(batch, by, time_col), observed=True).sum()
+        counts = batch_counts if counts is None else counts.add(batch_counts, fill_value=0)
+    if counts is None:
+        # No batches at all (an empty sheet or only a header): no groups, same shape as a real result
+        names = [by] + (['Month'] if time_col is not None else [])
+        index = pd.MultiIndex.from_arrays([[]] * len(names), names=names) if len(names) > 1 else pd.Index([], name=by)
+        counts = pd.DataFrame(0, index=index, columns=list(columns))
+    return bounds, counts.astype('int64')
+
+
+# python outliers.py <trips.xlsx> [sheet] [--per-month] [--k 1.5] [--size 200]
+def main():
+    args = sys.argv[1:]
+    k = IQR_FACTOR
+    size = SKETCH_SIZE
+    if '--k' in args:
+        position = args.index('--k')
+        k = float(args[position + 1])
+        del args[position:position + 2]
+    if '--size' in args:
+        position = args.index('--size')
+        size = int(args[position + 1])
+        del args[position:position + 2]
+    per_month = '--per-month' in args
+    args = [arg for arg in args if not arg.startswith('--')]
+    if not args:
+        print("Usage: python outliers.py <trips.xlsx> [sheet] [--per-month] [--k 1.5] [--size 200]")
+        return
+    sheet_name = args[1] if len(args) > 1 else 0
+    bounds, counts = screen_excel(args[0], sheet_name, time_col='Trip Started' if per_month else None, k=k, size=size)
+    if counts.empty:
+        print(f"No trips in {args[0]}; nothing to screen")
+        return
+    with pd.option_context('display.max_columns', None, 'display.width', 200):
+        print("Outlier fences per group:")
+        print(bounds.round(2))
+        print("\nOutliers per group:")
+        print(counts)
+
+
+if __name__ == "__main__":
+    main()
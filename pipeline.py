@@ -0,0 +1,272 @@
+import hashlib
+import json
+import os
+import re
+import subprocess
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from excel_cache import file_content_hash, frame_path
+from fuel_log import FUEL_LOG_FILE
+from manual_logs import MONTH_FILES
+
+
+STATE_FILE = '.pipeline_state.json'
+LOG_DIR = os.path.join('.pipeline', 'logs')
+MERGED_FRAME = frame_path('Merged_3mon.xlsx') + '.arrow'
+DATES_FRAME = frame_path('modified_dates.xlsx') + '.arrow'
+
+# The numbered scripts as a DAG. Each stage runs its script in its own process; a stage
+# starts once the stages in 'after' are done, so the three branches (manual-log visits,
+# fleet trip analysis, maps) run side by side. Stages hand their intermediate frames
+# (Merged_3mon, modified_dates) to the next one as Arrow files (excel_cache.write_frame /
+# read_frame), so no stage writes or parses a workbook that only another stage reads.
+# '0 preview.py' and '2 visualize overall.py' only open plot windows and are left out.
+# 'optional_inputs' are fingerprinted when present but not required; 'chart_outputs' are
+# only expected when the stage runs with charts.
+STAGES = {
+    'clean_tidy': {
+        'script': '1 clean and tidy.py',
+        'inputs': MONTH_FILES,
+        'outputs': [MERGED_FRAME],
+    },
+    'date_modify': {
+        'script': '3 date modify.py',
+        'inputs': [MERGED_FRAME],
+        'outputs': [DATES_FRAME],
+        'after': ['clean_tidy'],
+    },
+    'visit_analysis': {
+        'script': '4 merge.py',
+        'inputs': [DATES_FRAME],
+        'outputs': ['Vehicle_Analysis.xlsx'],
+        'after': ['date_modify'],
+        'charts': True,
+        'profile': True,
+    },
+    'fleet_analysis': {
+        'script': '1 improved.py',
+        'inputs': ['0 Combined shortcut.xlsx'],
+        'optional_inputs': [FUEL_LOG_FILE],
+        'outputs': [],
+        # fuel_economy_trend_over_time.png is only drawn with a fuel log, so it is not listed
+        'chart_outputs': [
+            'data_quality_missing_values.png', 'data_quality_unique_values.png',
+            'End_Odometer_outliers.png', 'Stop_Duration_Boxplot.png', 'trip_frequency_per_vehicle.png',
+            'avg_median_trip_duration.png', 'trip_durations_histogram.png',
+            'trip_start_end_times_grouped_bar.png', 'odometer_changes_over_time.png',
+            'odometer_diff_summary_by_vehicle.png', 'efficiency_analysis_scatterplot.png',
+            'daily_distance_covered.png', 'weekly_distance_covered.png', 'monthly_distance_covered.png',
+            'yearly_distance_covered.png', 'avg_fuel_economy_per_vehicle.png',
+            'distance_vs_fuel_used_per_vehicle.png',
+        ],
+        'charts': True,
+        'profile': True,
+    },
+    'unique_visits': {
+        'script': 'Unique visit finder.py',
+        'inputs': ['0 GeoTab full year.xlsx'],
+        'outputs': ['your_output_file_path_here11.xlsx'],
+    },
+    'heatmaps': {
+        'script': 'heatmaps.py',
+        'args': ['0 Combined.xlsx'],
+        'inputs': ['0 Combined.xlsx'],
+        'outputs': ['heatmap_all_with_legend.html'],
+        'profile': True,
+    },
+    'dashboard': {
+        'script': 'dashboard.py',
+        'args': ['0 Combined.xlsx'],
+        'inputs': ['0 Combined.xlsx'],
+        'outputs': ['dashboard_data/index.json'],
+    },
+    'tiles': {
+        'script': 'tiles.py',
+        'args': ['build', '0 Combined.xlsx'],
+        'inputs': ['0 Combined.xlsx'],
+        'outputs': ['tiles/index.json'],
+    },
+}
+
+
+def load_state(state_path=STATE_FILE):
+    if not os.path.exists(state_path):
+        return {'stages': {}, 'files': {}}
+    with open(state_path) as f:
+        return json.load(f)
+
+
+def save_state(state, state_path=STATE_FILE):
+    tmp_path = state_path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(state, f, indent=1, sort_keys=True)
+    os.replace(tmp_path, state_path)
+
+
+# Content hash of an input file; reused from the last run while size and mtime are unchanged
+def file_fingerprint(path, known):
+    stat = os.stat(path)
+    entry = known.get(path)
+    if entry and entry['size'] == stat.st_size and entry['mtime_ns'] == stat.st_mtime_ns:
+        return entry['sha256']
+    sha256 = file_content_hash(path)
+    known[path] = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'sha256': sha256}
+    return sha256
+
+
+# The script plus every local module it imports (recursively), so editing a helper such as
+# visit_metrics.py re-runs the stages that use it
+def local_sources(script, seen=None):
+    seen = set() if seen is None else seen
+    if script in seen or not os.path.exists(script):
+        return seen
+    seen.add(script)
+    with open(script, encoding='utf-8') as f:
+        source = f.read()
+    for module in re.findall(r'^\s*(?:from|import)\s+(\w+)', source, flags=re.MULTILINE):
+        local_sources(f'{module}.py', seen)
+    return seen
+
+
+def stage_args(stage, charts, profile=False):
+    args = list(stage.get('args', []))
+    if stage.get('charts') and not charts:
+        args.append('--no-charts')
+    if stage.get('profile') and profile:
+        args.append('--profile')
+    return args
+
+
+def stage_fingerprint(name, stage, args, known):
+    digest = hashlib.sha256(json.dumps([name, args]).encode())
+    for path in sorted(local_sources(stage['script'])):
+        digest.update(path.encode())
+        digest.update(file_fingerprint(path, known).encode())
+    for path in stage['inputs']:
+        digest.update(path.encode())
+        digest.update(file_fingerprint(path, known).encode())
+    for path in stage.get('optional_inputs', []):
+        digest.update(path.encode())
+        digest.update((file_fingerprint(path, known) if os.path.exists(path) else 'absent').encode())
+    return digest.hexdigest()
+
+
+def stage_outputs(stage, charts):
+    return stage['outputs'] + (stage.get('chart_outputs', []) if charts else [])
+
+
+def run_stage(name, stage, args):
+    os.makedirs(LOG_DIR, exist_ok=True)
+    log_path = os.path.join(LOG_DIR, f'{name}.log')
+    start = time.perf_counter()
+    with open(log_path, 'w') as log:
+        env = dict(os.environ, MPLBACKEND='Agg')
+        result = subprocess.run([sys.executable, stage['script']] + args, stdout=log, stderr=subprocess.STDOUT, env=env)
+    return result.returncode, time.perf_counter() - start, log_path
+
+
+# Stages needed for the requested targets: the targets and everything upstream of them
+def select_stages(targets, stages=STAGES):
+    if not targets:
+        return list(stages)
+    unknown = [name for name in targets if name not in stages]
+    if unknown:
+        raise ValueError(f"Unknown stage(s) {unknown}; expected some of {list(stages)}")
+    selected = set()
+    pending = list(targets)
+    while pending:
+        name = pending.pop()
+        if name not in selected:
+            selected.add(name)
+            pending.extend(stages[name].get('after', []))
+    return [name for name in stages if name in selected]
+
+
+# Run the selected stages. A stage is skipped when its fingerprint (code, arguments and input
+# contents) matches the last successful run and its outputs still exist; a stage whose input
+# is missing or whose upstream failed is not run. Returns {stage: status}.
+def run_pipeline(targets=None, force=False, jobs=None, charts=True, profile=False, stages=STAGES, state_path=STATE_FILE):
+    names = select_stages(targets, stages)
+    state = load_state(state_path)
+    status = {}
+    running = {}
+    start = time.perf_counter()
+
+    with ThreadPoolExecutor(max_workers=jobs or os.cpu_count() or 1) as pool:
+        while len(status) < len(names):
+            for name in names:
+                if name in status or name in running:
+                    continue
+                stage = stages[name]
+                upstream = [status.get(dep) for dep in stage.get('after', []) if dep in names]
+                if any(dep is None for dep in upstream):
+                    continue
+                if any(dep not in ('ran', 'up to date') for dep in upstream):
+                    status[name] = 'blocked'
+                    continue
+                missing = [path for path in stage['inputs'] + [stage['script']] if not os.path.exists(path)]
+                if missing:
+                    status[name] = 'missing input'
+                    print(f"[{name}] skipped, missing {', '.join(missing)}")
+                    continue
+
+                args = stage_args(stage, charts, profile)
+                fingerprint = stage_fingerprint(name, stage, args, state['files'])
+                outputs_exist = all(os.path.exists(path) for path in stage_outputs(stage, charts))
+                if not force and state['stages'].get(name) == fingerprint and outputs_exist:
+                    status[name] = 'up to date'
+                    print(f"[{name}] up to date")
+                    continue
+                print(f"[{name}] running {stage['script']} {' '.join(args)}".rstrip())
+                running[name] = (pool.submit(run_stage, name, stage, args), fingerprint)
+
+            if not running:
+                if len(status) < len(names):
+                    raise RuntimeError(f"Stages {set(names) - set(status)} can never start; check 'after'")
+                continue
+            done, _ = wait([future for future, _ in running.values()], return_when=FIRST_COMPLETED)
+            for name in [name for name, (future, _) in running.items() if future in done]:
+                future, fingerprint = running.pop(name)
+                returncode, seconds, log_path = future.result()
+                if returncode == 0:
+                    status[name] = 'ran'
+                    state['stages'][name] = fingerprint
+                    print(f"[{name}] done in {seconds:.1f}s")
+                else:
+                    status[name] = 'failed'
+                    state['stages'].pop(name, None)
+                    print(f"[{name}] failed (exit {returncode}), see {log_path}")
+                # Fingerprints of files the stage wrote are recomputed on the next read
+                save_state(state, state_path)
+
+    save_state(state, state_path)
+    print(f"Pipeline finished in {time.perf_counter() - start:.1f}s: " +
+          ', '.join(f"{name} {result}" for name, result in status.items()))
+    return status
+
+
+# python pipeline.py [stage ...] [--force] [--jobs N] [--no-charts] [--profile] [--list]
+# --profile passes --profile to the stages that support it (reports in .profile/)
+def main():
+    args = sys.argv[1:]
+    if '--list' in args:
+        for name, stage in STAGES.items():
+            after = ', '.join(stage.get('after', [])) or '-'
+            print(f"{name:15} {stage['script']:25} after: {after}")
+        return
+    jobs = None
+    if '--jobs' in args:
+        position = args.index('--jobs')
+        jobs = int(args[position + 1])
+        del args[position:position + 2]
+    targets = [arg for arg in args if not arg.startswith('--')]
+    status = run_pipeline(targets, force='--force' in args, jobs=jobs, charts='--no-charts' not in args,
+                          profile='--profile' in args)
+    if any(result == 'failed' for result in status.values()):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,160 @@
+import hashlib
+import json
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+import trip_store
+from excel_cache import read_cache, write_cache
+
+
+# Grain label -> pandas period alias. Coarser periods are labelled by their last day, as
+# pd.Grouper(freq=...) labels them (weeks end on Monday, as in the W-MON reports).
+GRAINS = {'Daily': 'D', 'Weekly': 'W-MON', 'Monthly': 'M', 'Yearly': 'Y'}
+CUBE_NAME = 'cube'
+
+
+# Roll the day grain up to every grain in one pass per grain. days holds Vehicle, Date and
+# additive metrics (trip_store.daily_aggregate); visits the distinct (Vehicle, Date,
+# Destination) rows used for unique visits, which cannot be summed from days.
+# Returns a frame indexed by (Vehicle, Grain, Period), sorted for fast lookups.
+def roll_up(days, visits, grains=GRAINS):
+    metrics = [col for col in days.columns if col not in ('Vehicle', 'Date', 'Unique Visits')]
+    frames = []
+    for grain, freq in grains.items():
+        period = days['Date'].dt.to_period(freq).dt.end_time.dt.normalize()
+        totals = days.groupby(['Vehicle', period])[metrics].sum()
+        visit_period = visits['Date'].dt.to_period(freq).dt.end_time.dt.normalize()
+        totals['Unique Visits'] = visits.groupby(['Vehicle', visit_period])['Destination'].nunique()
+        totals.index = totals.index.set_names(['Vehicle', 'Period'])
+        frames.append(totals.reset_index().assign(Grain=grain))
+    cube = pd.concat(frames, ignore_index=True)
+    cube['Unique Visits'] = cube['Unique Visits'].fillna(0).astype('int64')
+    cube['Grain'] = pd.Categorical(cube['Grain'], categories=list(grains))
+    return cube.set_index(['Vehicle', 'Grain', 'Period']).sort_index()
+
+
+# Cube straight from a frame of trips, for scripts that do not go through the store
+def build_cube(df, source):
+    return roll_up(trip_store.daily_aggregate(df, source), trip_store.daily_visits(df, source))
+
+
+# One metric at one grain: a Series indexed by (Vehicle, Period), or by Period for one vehicle
+def lookup(cube, metric, grain, vehicle=None):
+    values = cube.xs(grain, level='Grain')[metric]
+    if vehicle is None:
+        return values
+    try:
+        return values.xs(vehicle, level='Vehicle')
+    except KeyError:
+        return pd.Series(dtype=values.dtype, name=metric)
+
+
+# Fingerprint of the store partitions a cube is built from
+def store_fingerprint(source, store_dir=trip_store.STORE_DIR):
+    entries = trip_store.load_manifest(store_dir)[source]
+    return hashlib.sha256(json.dumps(entries, sort_keys=True).encode()).hexdigest()
+
+
+# Periods of every grain that hold a day of the given 'YYYY-MM' months, labelled as roll_up labels them
+def month_periods(months, grains=GRAINS):
+    days = pd.DatetimeIndex([])
+    for month in months:
+        period = pd.Period(month, 'M')
+        days = days.append(pd.date_range(period.start_time, period.end_time.normalize(), freq='D'))
+    return {grain: days.to_period(freq).end_time.normalize().unique() for grain, freq in grains.items()}
+
+
+# Months with a day in any of the periods: what has to be read to roll those periods up again
+def covering_months(periods, grains=GRAINS):
+    months = set()
+    for grain, freq in grains.items():
+        for end in periods[grain]:
+            period = pd.Period(end, freq)
+            months.update(pd.period_range(period.start_time, period.end_time, freq='M').strftime('%Y-%m'))
+    return months
+
+
+# Rows of a cube that fall in the given periods of each grain
+def in_periods(cube, periods):
+    grains = cube.index.get_level_values('Grain')
+    ends = cube.index.get_level_values('Period')
+    mask = np.zeros(len(cube), dtype=bool)
+    for grain, grain_periods in periods.items():
+        mask |= (grains == grain) & ends.isin(grain_periods)
+    return mask
+
+
+# Bring a persisted cube up to date after the given months' partitions were added, rewritten
+# or removed: only the periods holding a day of those months (their days, weeks, month and
+# year) are rolled up again, from the partitions that cover them, and replace the old rows.
+def update_cube(cube, source, changed_months, store_dir=trip_store.STORE_DIR):
+    periods = month_periods(changed_months)
+    wanted = sorted(covering_months(periods) & set(trip_store.months(source, store_dir)))
+    kept = cube[~in_periods(cube, periods)]
+    if not wanted:
+        return kept
+    days = trip_store.read_daily(source, wanted, store_dir)
+    visits = trip_store.read_visits(source, wanted, store_dir)
+    fresh = roll_up(days, visits)
+    return pd.concat([kept, fresh[in_periods(fresh, periods)]]).sort_index()
+
+
+# Persisted cube of one source next to its trip store partitions (trip_store/<source>/cube).
+# It is built from the per-day partitions, never from the trips. The partition entries it was
+# built from are kept with it; when the store changes, only the periods of the months whose
+# entries changed are rolled up again (update_cube). A first build rolls up every partition.
+def materialize(source, store_dir=trip_store.STORE_DIR, verbose=True):
+    base_path = os.path.join(store_dir, source, CUBE_NAME)
+    meta_path = base_path + '.json'
+    partitions = trip_store.load_manifest(store_dir)[source]
+    fingerprint = store_fingerprint(source, store_dir)
+    meta = {}
+    if os.path.exists(meta_path) and os.path.exists(base_path + '.arrow'):
+        with open(meta_path) as f:
+            meta = json.load(f)
+        if meta.get('fingerprint') == fingerprint:
+            return read_cube(source, store_dir)
+    if not partitions:
+        raise ValueError(f"No {source} partitions in '{store_dir}'")
+
+    if 'partitions' in meta:
+        built = meta['partitions']
+        changed = sorted(month for month in set(built) | set(partitions) if built.get(month) != partitions.get(month))
+        cube = update_cube(read_cube(source, store_dir), source, changed, store_dir)
+        message = f"Updated {source} cube: {len(cube)} rows, re-rolled the periods of {', '.join(changed)}"
+    else:
+        days = trip_store.read_daily(source, store_dir=store_dir)
+        visits = trip_store.read_visits(source, store_dir=store_dir)
+        cube = roll_up(days, visits)
+        message = f"Rebuilt {source} cube: {len(cube)} rows from {len(days)} vehicle-days"
+    write_cache(cube.reset_index().assign(Grain=lambda c: c['Grain'].astype(str)), base_path)
+    with open(meta_path, 'w') as f:
+        json.dump({'fingerprint': fingerprint, 'rows': len(cube), 'partitions': partitions}, f, indent=1)
+    if verbose:
+        print(message)
+    return cube
+
+
+def read_cube(source, store_dir=trip_store.STORE_DIR):
+    cube = read_cache(os.path.join(store_dir, source, CUBE_NAME))
+    cube['Grain'] = pd.Categorical(cube['Grain'], categories=list(GRAINS))
+    return cube.set_index(['Vehicle', 'Grain', 'Period']).sort_index()
+
+
+# python rollup_cube.py <manual|geotab> [output.xlsx]
+# Refresh the cube and export one sheet per grain
+def main():
+    source = sys.argv[1] if len(sys.argv) > 1 else 'geotab'
+    output_path = sys.argv[2] if len(sys.argv) > 2 else f'{source}_rollup.xlsx'
+    cube = materialize(source)
+    with pd.ExcelWriter(output_path) as writer:
+        for grain in GRAINS:
+            cube.xs(grain, level='Grain').to_excel(writer, sheet_name=grain)
+    print(f"Rollups saved to {output_path}")
+
+
+if __name__ == "__main__":
+    main()
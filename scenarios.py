@@ -0,0 +1,166 @@
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from excel_cache import read_excel_cached
+from fuel_log import attribute_fuel, fuel_economy, read_fuel_log
+from rollup_cube import build_cube, lookup, materialize
+from schema import GEOTAB_SCHEMA, apply_schema
+from topk import rank_within_groups
+
+
+# Candidate replacements: energy use and the distance one charge covers in a working day
+EV_MODELS = pd.DataFrame({
+    'EV Model': ['Compact EV van', 'Full-size EV van', 'EV pickup'],
+    'kWh/100km': [20.0, 32.0, 28.0],
+    'Range km': [250.0, 200.0, 350.0],
+}).set_index('EV Model')
+
+# kg CO2e per litre burned
+FUEL_EMISSION_FACTORS = {'gasoline': 2.31, 'diesel': 2.68}
+# kg CO2e per kWh, from a very clean grid (Ontario is about 0.03) to a coal-heavy one
+GRID_INTENSITIES = np.round(np.linspace(0.02, 0.60, 20), 3)
+FUEL_PRICES = np.round(np.linspace(1.20, 2.00, 17), 2)  # $/L
+ELECTRICITY_PRICES = [0.15]  # $/kWh
+DEFAULT_FUEL_RATE = 15.0  # L/100 km, when there is no fuel log
+
+RESULT_COLUMNS = ['Electrified km', 'Days Over Range', 'Baseline tCO2e', 'tCO2e Saved', 'Cost Saved']
+
+
+# Sort keys for a ranking: the metric, then the other saving to break its ties
+def ranking_keys(metric):
+    return [metric] + [col for col in ['tCO2e Saved', 'Cost Saved'] if col != metric]
+
+
+# Every combination of the options, one row per scenario with the EV model's figures joined in
+def scenario_grid(models=EV_MODELS, fuels=FUEL_EMISSION_FACTORS, grid_intensities=GRID_INTENSITIES,
+                  fuel_prices=FUEL_PRICES, electricity_prices=ELECTRICITY_PRICES):
+    grid = pd.MultiIndex.from_product(
+        [models.index, list(fuels), grid_intensities, fuel_prices, electricity_prices],
+        names=['EV Model', 'Fuel', 'Grid Intensity', 'Fuel Price', 'Electricity Price']).to_frame(index=False)
+    grid['Emission Factor'] = grid['Fuel'].map(fuels)
+    grid = grid.join(models, on='EV Model')
+    grid.index.name = 'Scenario'
+    return grid
+
+
+# Vehicles x days matrix of distance driven (0 on days without trips), from the cube's day grain
+def distance_matrix(cube):
+    daily = lookup(cube, 'Distance Covered', 'Daily').clip(lower=0)
+    return daily.unstack('Period', fill_value=0.0)
+
+
+# Distance each vehicle drove on days an EV of each range could cover, and the number of
+# days it could not. Each vehicle's days are sorted once; a range is then a count of days
+# at or under it and a lookup in the running totals. Arrays are (ranges, vehicles).
+def distance_within_range(distances, ranges):
+    days = np.sort(distances, axis=1)
+    totals = np.concatenate([np.zeros((len(days), 1)), np.cumsum(days, axis=1)], axis=1)
+    within = np.empty((len(ranges), len(days)))
+    over = np.empty((len(ranges), len(days)), dtype=np.int64)
+    for i, limit in enumerate(ranges):
+        count = (days <= limit).sum(axis=1)
+        within[i] = totals[np.arange(len(days)), count]
+        over[i] = days.shape[1] - count
+    return within, over
+
+
+# All scenarios x vehicles as array operations. A vehicle switched to an EV drives it on
+# every day within the model's range and keeps its fuel vehicle on the days beyond it.
+#   fuel_rates - L/100 km per vehicle (a Series indexed like the matrix rows)
+# Returns one row per scenario and vehicle: the scenario's settings plus electrified km,
+# days over range, baseline and saved tCO2e and the fuel-minus-electricity cost saved,
+# all over the period the matrix covers.
+def evaluate_scenarios(matrix, fuel_rates, scenarios):
+    distances = matrix.to_numpy(dtype=np.float64)
+    rates = fuel_rates.reindex(matrix.index).to_numpy(dtype=np.float64)[np.newaxis, :] / 100
+    range_codes, ranges = pd.factorize(scenarios['Range km'])
+    within, over = distance_within_range(distances, ranges.to_numpy(dtype=np.float64))
+
+    def column(name):
+        return scenarios[name].to_numpy(dtype=np.float64)[:, np.newaxis]
+
+    electrified = within[range_codes]
+    litres_saved = electrified * rates
+    kwh = electrified * column('kWh/100km') / 100
+    baseline = distances.sum(axis=1)[np.newaxis, :] * rates * column('Emission Factor')
+    co2_saved = litres_saved * column('Emission Factor') - kwh * column('Grid Intensity')
+    cost_saved = litres_saved * column('Fuel Price') - kwh * column('Electricity Price')
+
+    vehicles = len(matrix.index)
+    results = scenarios.loc[scenarios.index.repeat(vehicles)].reset_index()
+    results.insert(1, 'Vehicle', np.tile(matrix.index.to_numpy(), len(scenarios)))
+    results['Electrified km'] = electrified.ravel()
+    results['Days Over Range'] = over[range_codes].ravel()
+    results['Baseline tCO2e'] = baseline.ravel() / 1000
+    results['tCO2e Saved'] = co2_saved.ravel() / 1000
+    results['Cost Saved'] = cost_saved.ravel()
+    return results
+
+
+# Vehicles of each scenario numbered 0, 1, 2, ... by decreasing metric
+def rank_vehicles(results, metric='tCO2e Saved'):
+    return rank_within_groups(results, ['Scenario'], count_col=metric, tiebreak_col='Vehicle')
+
+
+# The scenario that saves each vehicle the most, ranked by that saving
+def best_scenarios(results, metric='tCO2e Saved'):
+    best = results.sort_values(ranking_keys(metric), ascending=False, kind='stable').drop_duplicates('Vehicle')
+    return best.set_index('Vehicle')
+
+
+# Fleet totals per scenario, best first
+def scenario_totals(results, metric='tCO2e Saved'):
+    totals = results.groupby('Scenario')[RESULT_COLUMNS].sum()
+    settings = results.drop_duplicates('Scenario').set_index('Scenario').drop(columns=['Vehicle'] + RESULT_COLUMNS)
+    return settings.join(totals).sort_values(ranking_keys(metric), ascending=False, kind='stable')
+
+
+# L/100 km per vehicle from a fuel log, or one assumed rate for every vehicle of the cube
+def vehicle_fuel_rates(cube, trips=None, fuel_log_path=None, default_rate=DEFAULT_FUEL_RATE):
+    vehicles = cube.index.get_level_values('Vehicle').unique()
+    rates = pd.Series(default_rate, index=vehicles, name='Fuel Economy')
+    if trips is not None and fuel_log_path is not None:
+        logged = fuel_economy(trips, attribute_fuel(trips, read_fuel_log(fuel_log_path)))['Fuel Economy']
+        rates = logged.reindex(vehicles).fillna(default_rate)
+    return rates
+
+
+# python scenarios.py [trips.xlsx] [--fuel-log fuel_log.xlsx] [--rate 15] [--top 10]
+# Without a trips workbook the GeoTab trip store's cube is used (rollup_cube.materialize).
+def main():
+    args = sys.argv[1:]
+    options = {'--fuel-log': None, '--rate': DEFAULT_FUEL_RATE, '--top': 10}
+    for name in options:
+        if name in args:
+            position = args.index(name)
+            options[name] = args[position + 1]
+            del args[position:position + 2]
+    trips = None
+    if args:
+        trips = apply_schema(read_excel_cached(args[0]), GEOTAB_SCHEMA, args[0])
+        cube = build_cube(trips, 'geotab')
+    else:
+        cube = materialize('geotab')
+    if options['--fuel-log'] and trips is None:
+        print("--fuel-log needs the trips workbook; using the assumed rate")
+    rates = vehicle_fuel_rates(cube, trips, options['--fuel-log'], float(options['--rate']))
+
+    begin = time.perf_counter()
+    matrix = distance_matrix(cube)
+    scenarios = scenario_grid()
+    results = evaluate_scenarios(matrix, rates, scenarios)
+    print(f"Evaluated {len(scenarios)} scenarios x {len(matrix)} vehicles over {matrix.shape[1]} days "
+          f"in {time.perf_counter() - begin:.2f}s")
+    top = int(options['--top'])
+    with pd.option_context('display.max_columns', None, 'display.width', 200):
+        print(f"\nTop {top} scenarios for the fleet:")
+        print(scenario_totals(results).head(top).round(2))
+        print("\nBest scenario per vehicle:")
+        print(best_scenarios(results).head(top).round(2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+import numpy as np
+import pandas as pd
+
+from durations import to_timedelta
+from manual_logs import VEHICLE_COLUMNS
+
+
+# Column kinds, applied once when a frame is loaded:
+#   'category' - repeated strings; values keep their type, so a vehicle 46 or a destination 500
+#                is still written back to Excel as a number
+#   'datetime' - datetime64[ns]
+#   'duration' - timedelta64[ns], from any mix of Excel durations (durations.to_timedelta)
+#   'number'   - numeric, downcast to the smallest int/float type that holds every value exactly
+#   'bool'     - bool (nullable boolean when values are missing)
+GEOTAB_SCHEMA = {
+    'Vehicle': 'category',
+    'Trip Started': 'datetime',
+    'Date': 'datetime',
+    'Start During Work Hours': 'bool',
+    'Start Odometer': 'number',
+    'Start Location': 'category',
+    'Trip Ended': 'datetime',
+    'Stop During Work Hours': 'bool',
+    'End Odometer': 'number',
+    'End Location': 'category',
+    'End Location Modified': 'category',
+    'Postal code': 'category',
+    'Trip Detai lLatitude': 'number',
+    'Trip Detail Longitude': 'number',
+    'Distance': 'number',
+    'Driving Duration': 'duration',
+    'Stop Duration': 'duration',
+    'Idling Duration': 'duration',
+    'Maximum Speed': 'number',
+    'Month': 'category',
+    'Week Number': 'number',
+}
+
+# The tidy manual log ('Merged_3mon.xlsx' / 'modified_dates.xlsx'). '# of passengers' and
+# 'Tools' hold stray codes ('PL', 1) and stay as they are.
+MANUAL_SCHEMA = {
+    'Vehivle': 'category',
+    'Time called in': 'duration',
+    'NAME': 'category',
+    'Orders': 'number',
+    'Trade': 'category',
+    'From': 'category',
+    'To': 'category',
+    **{col: 'number' for col in VEHICLE_COLUMNS},
+    'Time Completed': 'duration',
+    'Time for Call': 'duration',
+    'Date': 'datetime',
+    'Month': 'category',
+    'Week': 'number',
+}
+
+# Fuel transactions (fuel_log.py): one row per fill-up
+FUEL_SCHEMA = {
+    'Date': 'datetime',
+    'Vehicle': 'category',
+    'Litres': 'number',
+    'Odometer': 'number',
+}
+
+
+def as_category(values):
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        return values
+    return values.astype('category')
+
+
+# Smallest integer type when every value is a whole number, else float32 when that round-trips
+# exactly (GeoTab odometers are float32 readings), else float64
+def downcast_number(values):
+    numbers = pd.to_numeric(values, errors='coerce')
+    if pd.api.types.is_bool_dtype(numbers):
+        return numbers
+    if numbers.notna().all() and (numbers == np.round(numbers)).all():
+        return pd.to_numeric(numbers.astype(np.int64), downcast='integer')
+    as_float32 = numbers.astype(np.float32)
+    exact = (as_float32.astype(np.float64) == numbers) | numbers.isna()
+    return as_float32 if exact.all() else numbers.astype(np.float64)
+
+
+CONVERTERS = {
+    'category': as_category,
+    'datetime': lambda values: pd.to_datetime(values, errors='coerce'),
+    'duration': to_timedelta,
+    'number': downcast_number,
+    'bool': lambda values: values.astype(bool) if values.notna().all() else values.astype('boolean'),
+}
+
+
+# Check the columns and convert them in place of the raw ones. Columns not in the schema are
+# left alone; a missing column is an error, as every script downstream expects all of them.
+def apply_schema(df, schema, name='frame'):
+    missing = [col for col in schema if col not in df.columns]
+    if missing:
+        raise ValueError(f"{name} is missing columns {missing}")
+    unknown = sorted(set(schema.values()) - set(CONVERTERS))
+    if unknown:
+        raise ValueError(f"Unknown column kinds {unknown}; expected some of {list(CONVERTERS)}")
+    typed = df.copy(deep=False)
+    for col, kind in schema.items():
+        typed[col] = CONVERTERS[kind](df[col])
+    return typed
+
+
+def memory_mb(df):
+    return df.memory_usage(deep=True).sum() / 1024 ** 2
+
+
+# Per-row strings of a column, converting each distinct value once (astype(str) and
+# dt.strftime convert every row); missing values give 'nan', or NaN with a date format
+def as_strings(values, date_format=None):
+    codes, uniques = pd.factorize(values, use_na_sentinel=True)
+    if date_format is None:
+        labels = np.append(np.asarray(uniques.astype(str), dtype=object), 'nan')
+    else:
+        labels = np.append(np.asarray(pd.DatetimeIndex(uniques).strftime(date_format), dtype=object), np.nan)
+    return pd.Series(labels[codes], index=values.index, name=values.name)
@@ -0,0 +1,233 @@
+import atexit
+import json
+import os
+import sys
+import time
+import tracemalloc
+from functools import wraps
+
+try:
+    import resource
+except ImportError:  # Windows: no peak RSS
+    resource = None
+
+
+PROFILE_DIR = '.profile'
+
+# Off unless a script is run with --profile. While off, stage() hands back one shared no-op
+# object and @profiled functions are a flag check plus the call, so the hooks can stay in.
+enabled = False
+events = []
+stack = []
+run = {}
+
+
+def row_count(value):
+    if isinstance(value, tuple):
+        return row_count(value[0]) if value else None
+    shape = getattr(value, 'shape', None)
+    return int(shape[0]) if shape else None
+
+
+def peak_rss_mb():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 1024 ** 2 if sys.platform == 'darwin' else peak / 1024  # bytes on macOS, KB elsewhere
+
+
+# One timed stage: wall and CPU time, rows in/out, the peak of Python-tracked memory
+# (numpy and pandas buffers included) while it ran, and counters such as cache hits.
+# Stages nest; an outer stage's peak covers its inner stages. Memory tracing slows down
+# object-heavy code (openpyxl parsing) while profiling, so compare profiled runs with each other.
+class Span:
+    def __init__(self, name, rows_in=None):
+        self.name = name
+        self.rows_in = rows_in
+        self.rows_out = None
+        self.counters = {}
+
+    def __enter__(self):
+        current, peak = tracemalloc.get_traced_memory()
+        if stack:
+            stack[-1].peak = max(stack[-1].peak, peak)
+        tracemalloc.reset_peak()
+        self.start_memory = current
+        self.peak = current
+        stack.append(self)
+        self.cpu = time.process_time()
+        self.wall = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        wall = time.perf_counter() - self.wall
+        cpu = time.process_time() - self.cpu
+        stack.pop()
+        self.peak = max(self.peak, tracemalloc.get_traced_memory()[1])
+        tracemalloc.reset_peak()
+        if stack:
+            stack[-1].peak = max(stack[-1].peak, self.peak)
+        args = {
+            'cpu_ms': round(cpu * 1000, 3),
+            'rows_in': self.rows_in,
+            'rows_out': self.rows_out,
+            'peak_alloc_mb': round((self.peak - self.start_memory) / 1024 ** 2, 3),
+            'peak_rss_mb': peak_rss_mb(),
+        }
+        args.update(self.counters)
+        if exc_type is not None:
+            args['error'] = exc_type.__name__
+        events.append({
+            'name': self.name, 'cat': run.get('label', 'stage'), 'ph': 'X', 'pid': os.getpid(), 'tid': 0,
+            'ts': round((self.wall - run['start']) * 1e6, 1), 'dur': round(wall * 1e6, 1), 'args': args,
+        })
+        return False
+
+    def note(self, key, value=1):
+        self.counters[key] = self.counters.get(key, 0) + value
+
+
+class NullSpan:
+    rows_out = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+    def __setattr__(self, name, value):
+        pass
+
+    def note(self, key, value=1):
+        pass
+
+
+NULL_SPAN = NullSpan()
+
+
+# with stage('name', rows_in=len(df)) as span: ...; span.rows_out = len(result)
+def stage(name, rows_in=None):
+    if not enabled:
+        return NULL_SPAN
+    return Span(name, rows_in)
+
+
+# Decorator: a stage per call, named after the function, rows from the first argument and the result
+def profiled(func):
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        if not enabled:
+            return func(*args, **kwargs)
+        with Span(func.__name__, row_count(args[0]) if args else None) as span:
+            result = func(*args, **kwargs)
+            span.rows_out = row_count(result)
+            return result
+    return wrapper
+
+
+# Count something (e.g. an excel_cache hit) against the innermost running stage
+def note(key, value=1):
+    if enabled and stack:
+        stack[-1].note(key, value)
+
+
+def enable(label, report_path=None):
+    global enabled
+    if enabled:
+        return
+    enabled = True
+    tracemalloc.start()
+    run.update(label=label, start=time.perf_counter(), started=time.strftime('%Y-%m-%dT%H:%M:%S'),
+               report=report_path or os.path.join(PROFILE_DIR, f"{label}-{time.strftime('%Y%m%d-%H%M%S')}.json"))
+    atexit.register(finish)
+
+
+# Turn profiling on when the script was started with --profile (or --profile=<report.json>)
+def enable_from_argv(label, argv=None):
+    for arg in sys.argv[1:] if argv is None else argv:
+        if arg == '--profile' or arg.startswith('--profile='):
+            enable(label, arg.partition('=')[2] or None)
+    return enabled
+
+
+# Chrome trace format (chrome://tracing, ui.perfetto.dev): complete events plus run metadata
+def write_report(report_path):
+    os.makedirs(os.path.dirname(report_path) or '.', exist_ok=True)
+    report = {
+        'traceEvents': sorted(events, key=lambda event: event['ts']),
+        'displayTimeUnit': 'ms',
+        'otherData': {'label': run['label'], 'started': run['started'], 'argv': sys.argv,
+                      'wall_s': round(time.perf_counter() - run['start'], 3), 'peak_rss_mb': peak_rss_mb()},
+    }
+    with open(report_path, 'w') as f:
+        json.dump(report, f, indent=1)
+
+
+def finish():
+    global enabled
+    if not enabled:
+        return
+    enabled = False
+    tracemalloc.stop()
+    write_report(run['report'])
+    print_summary(events)
+    print(f"Profile written to {run['report']} (open in chrome://tracing or ui.perfetto.dev)")
+
+
+# Totals per stage name: calls, wall, CPU, rows and the largest peak
+def stage_totals(trace_events):
+    totals = {}
+    for event in trace_events:
+        entry = totals.setdefault(event['name'], {'calls': 0, 'wall_ms': 0.0, 'cpu_ms': 0.0, 'rows_in': 0, 'peak_alloc_mb': 0.0})
+        entry['calls'] += 1
+        entry['wall_ms'] += event['dur'] / 1000
+        entry['cpu_ms'] += event['args'].get('cpu_ms') or 0
+        entry['rows_in'] += event['args'].get('rows_in') or 0
+        entry['peak_alloc_mb'] = max(entry['peak_alloc_mb'], event['args'].get('peak_alloc_mb') or 0)
+    return totals
+
+
+def print_summary(trace_events):
+    totals = stage_totals(trace_events)
+    print(f"\n{'stage':<36} {'calls':>5} {'wall ms':>10} {'cpu ms':>10} {'rows in':>10} {'peak MB':>9}")
+    for name, entry in sorted(totals.items(), key=lambda item: -item[1]['wall_ms']):
+        print(f"{name:<36} {entry['calls']:>5} {entry['wall_ms']:>10.1f} {entry['cpu_ms']:>10.1f} "
+              f"{entry['rows_in']:>10} {entry['peak_alloc_mb']:>9.1f}")
+
+
+def load_report(report_path):
+    with open(report_path) as f:
+        return json.load(f)
+
+
+# Wall time per stage in two reports, largest change first
+def compare_reports(old_path, new_path):
+    old = stage_totals(load_report(old_path)['traceEvents'])
+    new = stage_totals(load_report(new_path)['traceEvents'])
+    rows = []
+    for name in set(old) | set(new):
+        before = old.get(name, {}).get('wall_ms')
+        after = new.get(name, {}).get('wall_ms')
+        rows.append((name, before, after))
+    rows.sort(key=lambda row: -abs((row[2] or 0) - (row[1] or 0)))
+    print(f"{'stage':<36} {'old ms':>10} {'new ms':>10} {'change':>8}")
+    for name, before, after in rows:
+        change = f"{after / before:.2f}x" if before and after else '-'
+        print(f"{name:<36} {before or 0:>10.1f} {after or 0:>10.1f} {change:>8}")
+
+
+# python telemetry.py show <report.json>
+# python telemetry.py compare <old.json> <new.json>
+def main():
+    command = sys.argv[1] if len(sys.argv) > 1 else ''
+    if command == 'show' and len(sys.argv) > 2:
+        print_summary(load_report(sys.argv[2])['traceEvents'])
+    elif command == 'compare' and len(sys.argv) > 3:
+        compare_reports(sys.argv[2], sys.argv[3])
+    else:
+        print("Usage: python telemetry.py show <report.json> | python telemetry.py compare <old.json> <new.json>")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,219 @@
+import io
+import json
+import os
+import shutil
+import sys
+import time
+from functools import partial
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+import pandas as pd
+from PIL import Image
+
+from excel_stream import iter_excel_batches
+from heatmaps import ALL_VEHICLES, LAT_COLUMN, LON_COLUMN, layer_name
+
+
+TILE_DIR = 'tiles'
+TILE_SIZE = 256
+MIN_ZOOM, MAX_ZOOM = 10, 17
+BLUR_RADIUS = 12  # pixels; points this close to a tile edge are drawn on the neighbour too
+# Colour ramp of the heat layer, same stops as the heatmap legend
+GRADIENT = [(0.0, (0, 255, 0)), (0.25, (127, 255, 0)), (0.5, (255, 255, 0)), (0.75, (255, 69, 0)), (1.0, (255, 0, 0))]
+
+
+# Web Mercator pixel coordinates at `zoom`, vectorized
+def mercator_pixels(latitudes, longitudes, zoom):
+    scale = TILE_SIZE * 2 ** zoom
+    lat = np.radians(np.clip(np.asarray(latitudes, dtype=float), -85.0511, 85.0511))
+    x = (np.asarray(longitudes, dtype=float) + 180.0) / 360.0 * scale
+    y = (1.0 - np.log(np.tan(lat) + 1.0 / np.cos(lat)) / np.pi) / 2.0 * scale
+    return np.floor(x).astype(np.int64), np.floor(y).astype(np.int64)
+
+
+# Visits per (Vehicle, X, Y) pixel at max_zoom for a stream of trip batches.
+# Every lower zoom is an exact re-aggregation of these counts (pixel // 2 ** levels).
+def pixel_counts(batches, max_zoom=MAX_ZOOM):
+    counts = None
+    for batch in batches:
+        batch = batch.dropna(subset=['Vehicle', LAT_COLUMN, LON_COLUMN])
+        x, y = mercator_pixels(batch[LAT_COLUMN], batch[LON_COLUMN], max_zoom)
+        batch_counts = pd.DataFrame({'Vehicle': batch['Vehicle'].values, 'X': x, 'Y': y}).groupby(['Vehicle', 'X', 'Y']).size()
+        counts = batch_counts if counts is None else counts.add(batch_counts, fill_value=0)
+    if counts is None:
+        # No batches at all (an empty sheet): no pixels, same shape as a real result
+        counts = pd.Series([], index=pd.MultiIndex.from_arrays([[], [], []], names=['Vehicle', 'X', 'Y']), dtype='int64')
+    return counts.astype('int64').rename('Visits')
+
+
+# Banded Gaussian matrix: K @ image @ K.T blurs an image with peak weight 1 per point
+def blur_matrix(size, radius=BLUR_RADIUS):
+    offsets = np.arange(size)[:, None] - np.arange(size)[None, :]
+    kernel = np.exp(-0.5 * (offsets / (radius / 2.5)) ** 2)
+    kernel[np.abs(offsets) > radius] = 0
+    return kernel
+
+
+def colorize(intensity):
+    stops = [stop for stop, _ in GRADIENT]
+    rgba = np.zeros(intensity.shape + (4,), dtype=np.uint8)
+    for channel in range(3):
+        rgba[..., channel] = np.interp(intensity, stops, [color[channel] for _, color in GRADIENT])
+    visible = intensity > 0.01
+    rgba[..., 3] = np.where(visible, 90 + 140 * intensity, 0).astype(np.uint8)
+    return rgba
+
+
+# Render every occupied tile of one layer at one zoom. pixels holds X, Y, Visits at that zoom.
+# Intensity is log-scaled to the busiest pixel of the zoom, so one depot does not wash out the rest.
+def render_zoom(pixels, zoom, layer_dir, blur):
+    padded = TILE_SIZE + 2 * BLUR_RADIUS
+    tx, ty = pixels['X'].values // TILE_SIZE, pixels['Y'].values // TILE_SIZE
+    lx, ly = pixels['X'].values - tx * TILE_SIZE, pixels['Y'].values - ty * TILE_SIZE
+    visits = pixels['Visits'].values
+
+    # Each pixel goes to its own tile and, when within the blur radius of an edge, to the neighbour
+    parts = []
+    for dx in (-1, 0, 1):
+        for dy in (-1, 0, 1):
+            keep = edge_mask(lx, dx) & edge_mask(ly, dy)
+            parts.append(pd.DataFrame({
+                'TX': tx[keep] + dx, 'TY': ty[keep] + dy,
+                'PX': lx[keep] - dx * TILE_SIZE + BLUR_RADIUS, 'PY': ly[keep] - dy * TILE_SIZE + BLUR_RADIUS,
+                'Visits': visits[keep],
+            }))
+    placed = pd.concat(parts, ignore_index=True)
+    scale = np.log1p(visits.max())
+
+    written = 0
+    for (tile_x, tile_y), tile in placed.groupby(['TX', 'TY'], sort=False):
+        canvas = np.zeros((padded, padded))
+        np.add.at(canvas, (tile['PY'].values, tile['PX'].values), tile['Visits'].values)
+        density = (blur @ canvas @ blur.T)[BLUR_RADIUS:-BLUR_RADIUS, BLUR_RADIUS:-BLUR_RADIUS]
+        intensity = np.clip(np.log1p(density) / scale, 0, 1)
+        if not (intensity > 0.01).any():
+            continue
+        path = os.path.join(layer_dir, str(zoom), str(tile_x))
+        os.makedirs(path, exist_ok=True)
+        Image.fromarray(colorize(intensity), 'RGBA').save(os.path.join(path, f'{tile_y}.png'), optimize=True)
+        written += 1
+    return written
+
+
+def edge_mask(local, offset):
+    if offset == 0:
+        return np.ones(len(local), dtype=bool)
+    if offset == 1:
+        return local >= TILE_SIZE - BLUR_RADIUS
+    return local < BLUR_RADIUS
+
+
+# Write tiles/<layer>/<z>/<x>/<y>.png for the whole fleet ('all') and each vehicle, plus
+# tiles/index.json with the layers, their folder (heatmaps.layer_name), bounds and the
+# busiest pixel per zoom (for the legend)
+def build_tiles(counts, tile_dir=TILE_DIR, min_zoom=MIN_ZOOM, max_zoom=MAX_ZOOM):
+    start = time.perf_counter()
+    blur = blur_matrix(TILE_SIZE + 2 * BLUR_RADIUS)
+    layers = {ALL_VEHICLES: counts.groupby(level=['X', 'Y']).sum()}
+    for vehicle, vehicle_counts in counts.groupby(level='Vehicle'):
+        layers[str(vehicle)] = vehicle_counts.droplevel('Vehicle')
+
+    if os.path.exists(tile_dir):
+        shutil.rmtree(tile_dir)
+    index = {'min_zoom': min_zoom, 'max_zoom': max_zoom, 'layers': {}}
+    total_tiles = 0
+    for layer, layer_counts in layers.items():
+        pixels = layer_counts.reset_index()
+        scale = TILE_SIZE * 2 ** max_zoom
+        lon = pixels['X'] / scale * 360.0 - 180.0
+        lat = np.degrees(np.arctan(np.sinh(np.pi * (1 - 2 * pixels['Y'] / scale))))
+        info = {
+            'dir': layer_name(layer),
+            'visits': int(pixels['Visits'].sum()),
+            'bounds': [[float(lat.min()), float(lon.min())], [float(lat.max()), float(lon.max())]],
+            'max_visits': {},
+        }
+        for zoom in range(max_zoom, min_zoom - 1, -1):
+            shift = max_zoom - zoom
+            zoom_pixels = pixels.assign(X=pixels['X'] // 2 ** shift, Y=pixels['Y'] // 2 ** shift).groupby(['X', 'Y'], as_index=False)['Visits'].sum()
+            info['max_visits'][zoom] = int(zoom_pixels['Visits'].max())
+            total_tiles += render_zoom(zoom_pixels, zoom, os.path.join(tile_dir, info['dir']), blur)
+        index['layers'][layer] = info
+
+    with open(os.path.join(tile_dir, 'index.json'), 'w') as f:
+        json.dump(index, f, indent=1)
+    print(f"Wrote {total_tiles} tiles for {len(layers)} layers (zoom {min_zoom}-{max_zoom}) "
+          f"in {time.perf_counter() - start:.1f}s")
+    return index
+
+
+def read_pixel_counts(file_path, sheet_name=0, max_zoom=MAX_ZOOM):
+    columns = ['Vehicle', LAT_COLUMN, LON_COLUMN]
+    dtypes = {'Vehicle': str, LAT_COLUMN: 'float64', LON_COLUMN: 'float64'}
+    return pixel_counts(iter_excel_batches(file_path, sheet_name, usecols=columns, dtypes=dtypes), max_zoom)
+
+
+def empty_tile():
+    buffer = io.BytesIO()
+    Image.new('RGBA', (TILE_SIZE, TILE_SIZE), (0, 0, 0, 0)).save(buffer, 'PNG')
+    return buffer.getvalue()
+
+
+# Static file server for the dashboard. Tiles outside the data are answered with a blank
+# tile instead of a 404, and tiles may be cached by the browser.
+class TileRequestHandler(SimpleHTTPRequestHandler):
+    blank_tile = empty_tile()
+
+    def do_GET(self):
+        path = self.path.split('?')[0]
+        if path.startswith(f'/{TILE_DIR}/') and path.endswith('.png') and not os.path.exists(self.translate_path(path)):
+            self.send_response(200)
+            self.send_header('Content-Type', 'image/png')
+            self.send_header('Content-Length', str(len(self.blank_tile)))
+            self.end_headers()
+            self.wfile.write(self.blank_tile)
+            return
+        super().do_GET()
+
+    def end_headers(self):
+        if self.path.startswith(f'/{TILE_DIR}/') and self.path.endswith('.png'):
+            self.send_header('Cache-Control', 'max-age=3600')
+        super().end_headers()
+
+    def log_message(self, format, *args):
+        pass
+
+
+def serve(port=8000, directory='.'):
+    server = ThreadingHTTPServer(('127.0.0.1', port), partial(TileRequestHandler, directory=directory))
+    print(f"Serving {os.path.abspath(directory)} at http://127.0.0.1:{port}/dashboard.html (Ctrl+C to stop)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+# python tiles.py build <workbook> [min_zoom] [max_zoom]
+# python tiles.py serve [port]
+def main():
+    command = sys.argv[1] if len(sys.argv) > 1 else 'build'
+    if command == 'serve':
+        serve(int(sys.argv[2]) if len(sys.argv) > 2 else 8000)
+    elif command == 'build':
+        file_path = sys.argv[2] if len(sys.argv) > 2 else '0 Combined.xlsx'
+        min_zoom = int(sys.argv[3]) if len(sys.argv) > 3 else MIN_ZOOM
+        max_zoom = int(sys.argv[4]) if len(sys.argv) > 4 else MAX_ZOOM
+        counts = read_pixel_counts(file_path, max_zoom=max_zoom)
+        if counts.empty:
+            print(f"No trips with a vehicle and coordinates in {file_path}; no tiles written")
+            return
+        build_tiles(counts, min_zoom=min_zoom, max_zoom=max_zoom)
+    else:
+        print("Usage: python tiles.py build <workbook> [min_zoom] [max_zoom] | python tiles.py serve [port]")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+import numpy as np
+import pandas as pd
+
+
+# Sort precomputed counts once and number the items of each group 0, 1, 2, ... by
+# decreasing count (ties by tiebreak_col, ascending). Any top-k is then a filter on 'Rank'.
+def rank_within_groups(counts, group_cols, count_col='Count', tiebreak_col=None):
+    sort_cols = list(group_cols) + [count_col] + ([tiebreak_col] if tiebreak_col else [])
+    ascending = [True] * len(group_cols) + [False] + ([True] if tiebreak_col else [])
+    ranked = counts.sort_values(sort_cols, ascending=ascending, kind='stable')
+    if group_cols:
+        ranked['Rank'] = ranked.groupby(list(group_cols), observed=True, sort=False).cumcount()
+    else:
+        ranked['Rank'] = np.arange(len(ranked))
+    return ranked
+
+
+# Count value_col within each group and rank, in one count-then-rank pass with no per-group
+# Python callbacks. Ties keep order of first appearance. Returns a frame of
+# group_cols + [value_col, 'Count', 'First', 'Rank'].
+def rank_values(df, group_cols, value_col):
+    keys = list(group_cols) + [value_col]
+    work = df[keys].assign(Row=np.arange(len(df)))
+    counts = work.groupby(keys, observed=True, sort=False).agg(Count=('Row', 'size'), First=('Row', 'min'))
+    return rank_within_groups(counts.reset_index(), group_cols, tiebreak_col='First')
+
+
+# Equivalent of df.groupby(group_cols)[value_col].apply(lambda x: x.value_counts().head(k)):
+# a count Series indexed by group_cols + [value_col]. With no group_cols it is value_counts().head(k).
+def top_k_per_group(df, group_cols, value_col, k):
+    ranked = rank_values(df, group_cols, value_col)
+    top = ranked[ranked['Rank'] < k]
+    return top.set_index(list(group_cols) + [value_col])['Count']
+
+
+# Space-Saving heavy hitters with bounded memory: at most `capacity` items are tracked.
+# Each tracked count overestimates the true count by at most its 'Error', and any item
+# seen more than total/capacity times is guaranteed to be tracked. Updates take whole
+# batches, so the per-item work is a vectorized merge rather than a Python loop.
+class SpaceSaving:
+    def __init__(self, capacity=1000):
+        self.capacity = capacity
+        self.counts = pd.Series(dtype='int64')
+        self.errors = pd.Series(dtype='int64')
+        self.total = 0
+
+    def update(self, values):
+        batch = pd.Series(values).value_counts()
+        if batch.empty:
+            return self
+        self.total += int(batch.sum())
+
+        # Items not tracked yet inherit the current minimum count as their possible overcount,
+        # but only once the table is full (until then every count is exact)
+        floor = int(self.counts.min()) if len(self.counts) >= self.capacity else 0
+        is_new = ~batch.index.isin(self.counts.index)
+        new_errors = pd.Series(floor, index=batch.index[is_new], dtype='int64')
+
+        counts = self.counts.add(batch, fill_value=0)
+        counts[new_errors.index] += floor
+        errors = pd.concat([self.errors, new_errors])
+
+        if len(counts) > self.capacity:
+            counts = counts.sort_values(ascending=False, kind='stable').head(self.capacity)
+        self.counts = counts.astype('int64')
+        self.errors = errors.reindex(self.counts.index).fillna(0).astype('int64')
+        return self
+
+    # Two summaries of disjoint streams combine into one with the same error guarantee
+    def merge(self, other):
+        merged = SpaceSaving(self.capacity)
+        counts = self.counts.add(other.counts, fill_value=0)
+        errors = self.errors.add(other.errors, fill_value=0)
+        # An item missing from one side may have been evicted there with up to its minimum
+        for side, side_counts in ((self, self.counts), (other, other.counts)):
+            if len(side_counts) >= side.capacity:
+                missing = ~counts.index.isin(side_counts.index)
+                counts[missing] += side_counts.min()
+                errors[missing] += side_counts.min()
+        counts = counts.sort_values(ascending=False, kind='stable').head(merged.capacity)
+        merged.counts = counts.astype('int64')
+        merged.errors = errors.reindex(counts.index).fillna(0).astype('int64')
+        merged.total = self.total + other.total
+        return merged
+
+    # The k heaviest items with their estimated count and maximum overcount
+    def top(self, k=10):
+        counts = self.counts.sort_values(ascending=False, kind='stable').head(k)
+        return pd.DataFrame({'Count': counts, 'Error': self.errors.reindex(counts.index)})
+
+
+# Rank one column of a stream of DataFrame batches (e.g. excel_stream.iter_excel_batches)
+def heavy_hitters(batches, column, k=10, capacity=1000):
+    summary = SpaceSaving(capacity)
+    for batch in batches:
+        summary.update(batch[column].dropna())
+    return summary.top(k)
@@ -0,0 +1,115 @@
+import numpy as np
+import pandas as pd
+
+
+# Odometer readings jitter by a fraction of a km between consecutive trips (GPS/float32
+# rounding); jumps larger than this are reported as gaps (forward) or resets (backward)
+GAP_TOLERANCE_KM = 1.0
+
+
+# Start offset of each run of equal values in a sorted array, followed by the length
+def run_offsets(values):
+    values = np.asarray(values)
+    starts = np.flatnonzero(np.r_[True, values[1:] != values[:-1]]) if len(values) else np.zeros(0, dtype=np.int64)
+    return np.r_[starts, len(values)]
+
+
+# Trips sorted once by vehicle and start time, with vehicle i's trips in rows
+# offsets[i]:offsets[i + 1] of frame. Per-vehicle work slices these rows instead of
+# regrouping, and whole-fleet work runs on the columns with the boundaries masked.
+class VehicleTrips:
+    def __init__(self, frame, vehicles, offsets):
+        self.frame = frame
+        self.vehicles = vehicles
+        self.offsets = offsets
+
+    def __len__(self):
+        return len(self.vehicles)
+
+    def rows(self, i):
+        return slice(self.offsets[i], self.offsets[i + 1])
+
+    # (vehicle, that vehicle's trips) in vehicle order, like iterating a groupby
+    def items(self):
+        for i, vehicle in enumerate(self.vehicles):
+            yield vehicle, self.frame.iloc[self.rows(i)]
+
+    def vehicle(self, vehicle):
+        return self.frame.iloc[self.rows(self.vehicles.get_loc(vehicle))]
+
+    # One array per vehicle of a column (views into the sorted column, no copies)
+    def split(self, column):
+        return np.split(self.frame[column].to_numpy(), self.offsets[1:-1])
+
+    # True on each vehicle's first trip
+    def first_trips(self):
+        first = np.zeros(len(self.frame), dtype=bool)
+        first[self.offsets[:-1][np.diff(self.offsets) > 0]] = True
+        return first
+
+    # The same partitioning over fewer columns, e.g. to hand a chart only what it draws
+    def select(self, columns):
+        return VehicleTrips(self.frame[columns], self.vehicles, self.offsets)
+
+    # Per-vehicle totals of a column, one reduceat over the sorted rows
+    def sum(self, column):
+        values = self.frame[column].to_numpy(dtype=np.float64)
+        totals = np.add.reduceat(np.nan_to_num(values), self.offsets[:-1]) if len(values) else np.zeros(0)
+        return pd.Series(totals, index=self.vehicles, name=column)
+
+
+# Sort trips by vehicle, then start time, once (stable, so trips with the same start keep
+# their order). Rows without a vehicle are dropped, as groupby drops them; the original
+# index is kept so results can be joined back.
+def partition_trips(df, vehicle_col='Vehicle', time_col='Trip Started'):
+    codes, vehicles = pd.factorize(df[vehicle_col], sort=True)
+    order = np.lexsort((df[time_col].to_numpy(), codes))
+    order = order[codes[order] >= 0]
+    counts = np.bincount(codes[order], minlength=len(vehicles))
+    vehicles = pd.Index(vehicles, name=vehicle_col)
+    return VehicleTrips(df.iloc[order], vehicles, np.r_[0, np.cumsum(counts)])
+
+
+# Odometer checks over every vehicle in one vectorized pass. Adds:
+#   'Odometer Difference' - End Odometer minus the vehicle's previous End Odometer (0 on its first trip)
+#   'Trip Distance'       - End Odometer minus Start Odometer
+#   'Odometer Gap'        - Start Odometer minus the previous End Odometer: distance driven
+#                           with no trip recorded (NaN on the vehicle's first trip)
+#   'Gap'                 - the odometer jumped forward by more than tolerance between trips
+#   'Odometer Reset'      - it went backward by more than tolerance, between or within trips
+def odometer_deltas(trips, tolerance=GAP_TOLERANCE_KM):
+    frame = trips.frame.copy()
+    start = pd.to_numeric(frame['Start Odometer'], errors='coerce').to_numpy(dtype=np.float64)
+    end = pd.to_numeric(frame['End Odometer'], errors='coerce').to_numpy(dtype=np.float64)
+    previous_end = np.r_[np.nan, end[:-1]]
+    previous_end[trips.first_trips()] = np.nan
+
+    gap = start - previous_end
+    trip_distance = end - start
+    frame['Odometer Difference'] = np.nan_to_num(end - previous_end, nan=0.0)
+    frame['Trip Distance'] = trip_distance
+    frame['Odometer Gap'] = gap
+    frame['Gap'] = gap > tolerance
+    frame['Odometer Reset'] = (gap < -tolerance) | (trip_distance < -tolerance)
+    return VehicleTrips(frame, trips.vehicles, trips.offsets)
+
+
+# Gaps (count and km) and resets per vehicle, from odometer_deltas
+def odometer_summary(trips):
+    gap_km = trips.frame['Odometer Gap'].where(trips.frame['Gap'], 0)
+    return pd.DataFrame({
+        'Trips': np.diff(trips.offsets),
+        'Gaps': trips.sum('Gap').astype('int64'),
+        'Gap km': VehicleTrips(gap_km.to_frame(), trips.vehicles, trips.offsets).sum('Odometer Gap'),
+        'Resets': trips.sum('Odometer Reset').astype('int64'),
+    }, index=trips.vehicles)
+
+
+# (key, rows) for each value of the first index level of a Series sorted by that level
+# (e.g. a rollup_cube lookup), sliced by position instead of one xs/loc per key
+def split_sorted(series):
+    keys = series.index.get_level_values(0)
+    offsets = run_offsets(pd.factorize(keys)[0])
+    for start, end in zip(offsets[:-1], offsets[1:]):
+        part = series.iloc[start:end]
+        yield keys[start], part.droplevel(0) if isinstance(series.index, pd.MultiIndex) else part
@@ -0,0 +1,270 @@
+import hashlib
+import json
+import os
+import sys
+
+import pandas as pd
+
+from dates import normalize_dates
+from durations import to_minutes
+from excel_cache import entry_is_current, file_content_hash, read_cache, read_excel_cached, write_cache
+
+
+STORE_DIR = 'trip_store'
+MANIFEST_NAME = 'manifest.json'
+SOURCES = ('manual', 'geotab')
+# Files each partition is written as (write_cache adds .arrow and .extra.pkl)
+PARTITION_SUFFIXES = ('', '.daily', '.visits')
+
+# Column holding the trip/visit timestamp for each source
+DATE_COLUMNS = {'manual': 'Date', 'geotab': 'Trip Started'}
+VEHICLE_COLUMNS = {'manual': 'Vehivle', 'geotab': 'Vehicle'}
+DESTINATION_COLUMNS = {'manual': 'To', 'geotab': 'End Location Modified'}
+# Additive per-day measures kept for each source besides Trips and Visits
+SUM_COLUMNS = {
+    'manual': ['Driving Minutes'],
+    'geotab': ['Distance Covered', 'Driving Minutes', 'Idling Minutes', 'Stop Minutes'],
+}
+
+
+def load_manifest(store_dir=STORE_DIR):
+    manifest_path = os.path.join(store_dir, MANIFEST_NAME)
+    if not os.path.exists(manifest_path):
+        return {source: {} for source in SOURCES}
+    with open(manifest_path) as f:
+        return json.load(f)
+
+
+def save_manifest(manifest, store_dir=STORE_DIR):
+    os.makedirs(store_dir, exist_ok=True)
+    manifest_path = os.path.join(store_dir, MANIFEST_NAME)
+    tmp_path = manifest_path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+    os.replace(tmp_path, manifest_path)
+
+
+def partition_path(source, month, store_dir=STORE_DIR):
+    return os.path.join(store_dir, source, month)
+
+
+# Parse the date column of either source into datetime64; manual logs may still hold the raw I1 text
+def parse_dates(series):
+    return normalize_dates(series)[0]
+
+
+# Split a frame into 'YYYY-MM' partitions by its date column. Rows whose date does not parse
+# belong to no month and are left out of the store (and every rollup), with a warning
+def split_by_month(df, source):
+    dates = parse_dates(df[DATE_COLUMNS[source]])
+    undated = dates.isna()
+    if undated.any():
+        raw = df.loc[undated, DATE_COLUMNS[source]].astype(str).unique()[:5]
+        print(f"Warning: {undated.sum()} {source} rows have no parseable {DATE_COLUMNS[source]!r} "
+              f"and are not stored (e.g. {', '.join(raw)})")
+    months = dates.dt.strftime('%Y-%m')
+    return {month: part.reset_index(drop=True) for month, part in df.groupby(months, sort=True)}
+
+
+# Per-day summary of one partition (the day grain of the rollup cube). Days never cross a
+# month boundary, so these rows are final once written and the store-wide aggregate is a
+# plain concat. Trips counts rows, Visits the rows with a destination; durations are minutes.
+def daily_aggregate(df, source):
+    vehicle_col = VEHICLE_COLUMNS[source]
+    destination_col = DESTINATION_COLUMNS[source]
+    work = pd.DataFrame({
+        'Vehicle': df[vehicle_col].astype(str),
+        'Date': parse_dates(df[DATE_COLUMNS[source]]).dt.normalize(),
+        'Destination': df[destination_col],
+    })
+    if source == 'geotab':
+        # float64 before subtracting: odometers may be float32 (schema.py), day sums should not be
+        work['Distance Covered'] = (pd.to_numeric(df['End Odometer'], errors='coerce').astype('float64')
+                                    - pd.to_numeric(df['Start Odometer'], errors='coerce').astype('float64'))
+        work['Driving Minutes'] = to_minutes(df['Driving Duration'], fill=0)
+        work['Idling Minutes'] = to_minutes(df['Idling Duration'], fill=0)
+        work['Stop Minutes'] = to_minutes(df['Stop Duration'], fill=0)
+    else:
+        work['Driving Minutes'] = to_minutes(df['Time for Call'], fill=0)
+
+    grouped = work.groupby(['Vehicle', 'Date'])
+    summary = grouped.agg(Trips=('Destination', 'size'), Visits=('Destination', 'count'),
+                          **{'Unique Visits': ('Destination', 'nunique')})
+    for column in SUM_COLUMNS[source]:
+        summary[column] = grouped[column].sum()
+    return summary.reset_index()
+
+
+# Distinct (Vehicle, Date, Destination) of one partition; unique visits over any longer
+# period are counted from these, since daily unique counts do not add up
+def daily_visits(df, source):
+    visits = pd.DataFrame({
+        'Vehicle': df[VEHICLE_COLUMNS[source]].astype(str),
+        'Date': parse_dates(df[DATE_COLUMNS[source]]).dt.normalize(),
+        'Destination': df[DESTINATION_COLUMNS[source]],
+    })
+    return visits.dropna().drop_duplicates().reset_index(drop=True)
+
+
+# Write a month's rows and its per-day aggregates. Returns a hash of the aggregates, kept in
+# the manifest so a rewritten month with the same row count still reads as changed.
+def write_partition(part, source, month, store_dir=STORE_DIR):
+    base_path = partition_path(source, month, store_dir)
+    daily = daily_aggregate(part, source)
+    visits = daily_visits(part, source)
+    write_cache(part, base_path)
+    write_cache(daily, base_path + '.daily')
+    write_cache(visits, base_path + '.visits')
+    digest = hashlib.sha256()
+    for frame in (daily, visits):
+        digest.update(pd.util.hash_pandas_object(frame, index=False).to_numpy().tobytes())
+    return digest.hexdigest()[:32]
+
+
+def remove_partition(source, month, store_dir=STORE_DIR):
+    base_path = partition_path(source, month, store_dir)
+    for suffix in PARTITION_SUFFIXES:
+        for extension in ('.arrow', '.extra.pkl'):
+            if os.path.exists(base_path + suffix + extension):
+                os.remove(base_path + suffix + extension)
+
+
+# Append the rows of df that are not in the store yet. A month not in the store becomes a new
+# partition; a month already there only takes the days after its last stored day (e.g. the
+# next GeoTab export), and only that partition and its aggregates are rewritten.
+# replace=True overwrites the months present in df instead.
+def append(df, source, source_file=None, replace=False, store_dir=STORE_DIR):
+    if source not in SOURCES:
+        raise ValueError(f"Unknown source '{source}', expected one of {SOURCES}")
+    manifest = load_manifest(store_dir)
+    os.makedirs(os.path.join(store_dir, source), exist_ok=True)
+
+    written = []
+    for month, part in split_by_month(df, source).items():
+        days = parse_dates(part[DATE_COLUMNS[source]]).dt.normalize()
+        entry = manifest[source].get(month)
+        files = sorted(part['Source File'].dropna().unique()) if 'Source File' in part else [source_file]
+        if entry and not replace:
+            if 'last_day' not in entry:
+                continue
+            new_days = (days > pd.Timestamp(entry['last_day'])).values
+            if not new_days.any():
+                continue
+            days = pd.concat([pd.Series(pd.Timestamp(entry['last_day'])), days[new_days]])
+            part = pd.concat([read_cache(partition_path(source, month, store_dir)), part[new_days]], ignore_index=True)
+            files = sorted(set(entry['source_files']) | set(files), key=str)
+
+        content = write_partition(part, source, month, store_dir)
+        manifest[source][month] = {'rows': len(part), 'source_files': files,
+                                   'last_day': days.max().strftime('%Y-%m-%d'), 'hash': content}
+        written.append(month)
+
+    save_manifest(manifest, store_dir)
+    return written
+
+
+# Size, mtime and content hash of a workbook, as excel_cache records them
+def file_signature(file_path):
+    stat = os.stat(file_path)
+    return {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'sha256': file_content_hash(file_path)}
+
+
+# Workbooks that are new to the store or changed since they were ingested (size and mtime
+# first, the content hash only when those moved), keyed by file name like 'Source File'.
+# Workbooks ingested before signatures were recorded count as changed once.
+def changed_files(source, file_paths, store_dir=STORE_DIR):
+    recorded = load_manifest(store_dir).get('files', {}).get(source, {})
+    return [path for path in file_paths
+            if not entry_is_current(recorded.get(os.path.basename(path)), path, os.stat(path))[0]]
+
+
+# Put df's rows in place of everything the given workbooks added before (matched on the
+# 'Source File' column), so a corrected or extended month workbook replaces its old rows.
+# Only months the workbooks touched before or touch now are rewritten; a month left with
+# no rows is removed. signatures maps file name -> file_signature and is recorded for
+# changed_files.
+def replace_files(df, source, signatures, store_dir=STORE_DIR):
+    manifest = load_manifest(store_dir)
+    os.makedirs(os.path.join(store_dir, source), exist_ok=True)
+    names = set(signatures)
+    new_parts = split_by_month(df, source) if len(df) else {}
+    touched = set(new_parts) | {month for month, entry in manifest[source].items() if names & set(entry['source_files'])}
+
+    written = []
+    for month in sorted(touched):
+        parts = []
+        if month in manifest[source]:
+            stored = read_cache(partition_path(source, month, store_dir))
+            if 'Source File' in stored:
+                stored = stored[~stored['Source File'].isin(names)]
+            parts.append(stored)
+        if month in new_parts:
+            parts.append(new_parts[month])
+        parts = [part for part in parts if len(part)]
+        if not parts:
+            remove_partition(source, month, store_dir)
+            del manifest[source][month]
+            continue
+        part = pd.concat(parts, ignore_index=True)
+        content = write_partition(part, source, month, store_dir)
+        files = sorted(part['Source File'].dropna().unique()) if 'Source File' in part else []
+        days = parse_dates(part[DATE_COLUMNS[source]]).dt.normalize()
+        manifest[source][month] = {'rows': len(part), 'source_files': files,
+                                   'last_day': days.max().strftime('%Y-%m-%d'), 'hash': content}
+        written.append(month)
+
+    manifest.setdefault('files', {}).setdefault(source, {}).update(signatures)
+    save_manifest(manifest, store_dir)
+    return written
+
+
+def months(source, store_dir=STORE_DIR):
+    return sorted(load_manifest(store_dir)[source])
+
+
+# Read the trip/visit rows of some or all months of one source
+def read(source, months_wanted=None, store_dir=STORE_DIR):
+    wanted = months_wanted or months(source, store_dir)
+    parts = [read_cache(partition_path(source, month, store_dir)) for month in wanted]
+    if not parts:
+        return pd.DataFrame()
+    return pd.concat(parts, ignore_index=True)
+
+
+# Read the per-day aggregate for some or all months of one source
+def read_daily(source, months_wanted=None, store_dir=STORE_DIR):
+    return read_suffix(source, '.daily', months_wanted, store_dir)
+
+
+# Read the distinct per-day visits for some or all months of one source
+def read_visits(source, months_wanted=None, store_dir=STORE_DIR):
+    return read_suffix(source, '.visits', months_wanted, store_dir)
+
+
+def read_suffix(source, suffix, months_wanted=None, store_dir=STORE_DIR):
+    wanted = months_wanted or months(source, store_dir)
+    parts = [read_cache(partition_path(source, month, store_dir) + suffix) for month in wanted]
+    if not parts:
+        return pd.DataFrame()
+    return pd.concat(parts, ignore_index=True)
+
+
+# python trip_store.py <manual|geotab> <workbook> [sheet] [--replace]
+def main():
+    args = [arg for arg in sys.argv[1:] if arg != '--replace']
+    if len(args) < 2:
+        print("Usage: python trip_store.py <manual|geotab> <workbook.xlsx> [sheet] [--replace]")
+        sys.exit(1)
+    source, file_path = args[0], args[1]
+    sheet_name = args[2] if len(args) > 2 else 0
+
+    data = read_excel_cached(file_path, sheet_name=sheet_name)
+    written = append(data, source, source_file=os.path.basename(file_path), replace='--replace' in sys.argv)
+    if written:
+        print(f"Added {source} partitions: {', '.join(written)}")
+    else:
+        print(f"No new {source} months in '{file_path}'")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+import sys
+
+import numpy as np
+import pandas as pd
+
+from excel_cache import read_excel_cached
+from schema import GEOTAB_SCHEMA, apply_schema
+from trip_partitions import partition_trips
+
+
+WORK_HOURS = (9, 17)
+# Shift windows as (start hour, end hour); a window that ends before it starts runs past midnight
+SHIFTS = {'Work hours': WORK_HOURS, 'Evening': (17, 22), 'Night': (22, 6)}
+
+
+# True where the time of day falls in [start, end) hours, for a whole column at once
+def within_hours(times, start=WORK_HOURS[0], end=WORK_HOURS[1]):
+    hour = pd.to_datetime(times).dt.hour
+    return (hour >= start) & (hour < end)
+
+
+# Periods each vehicle was in use: its trips sorted by start (trip_partitions) and
+# overlapping or touching trips merged, so a vehicle never counts twice. A new period starts
+# where a trip begins after every earlier trip of the vehicle has ended.
+def busy_intervals(df, vehicle_col='Vehicle', start_col='Trip Started', end_col='Trip Ended'):
+    trips = df[[vehicle_col, start_col, end_col]].copy()
+    trips[start_col] = pd.to_datetime(trips[start_col])
+    trips[end_col] = pd.to_datetime(trips[end_col])
+    trips = partition_trips(trips.dropna(), vehicle_col, start_col)
+    start = trips.frame[start_col].to_numpy(dtype='datetime64[ns]')
+    end = np.maximum(trips.frame[end_col].to_numpy(dtype='datetime64[ns]'), start)
+    codes = np.repeat(np.arange(len(trips)), np.diff(trips.offsets))
+
+    reach = pd.Series(end).groupby(codes).cummax().to_numpy()
+    new_period = trips.first_trips() | (start > np.r_[start[:1], reach[:-1]])
+    starts = np.flatnonzero(new_period)
+    return pd.DataFrame({
+        vehicle_col: trips.vehicles.to_numpy()[codes[starts]],
+        'Start': start[starts],
+        'End': np.maximum.reduceat(end, starts) if len(starts) else end[:0],
+    })
+
+
+# Vehicles in use over time, swept from the busy periods as +1/-1 events sorted once. At
+# equal times ends come before starts, so back-to-back periods do not overlap. Returns the
+# count in use from each event time on (one value per distinct time).
+def concurrency(intervals):
+    # One sort of int64 keys: the time in ns doubled, plus 1 for a start (so ends sort first)
+    starts = intervals['Start'].to_numpy(dtype='datetime64[ns]').view(np.int64)
+    ends = intervals['End'].to_numpy(dtype='datetime64[ns]').view(np.int64)
+    events = np.sort(np.concatenate([starts * 2 + 1, ends * 2]))
+    times = events >> 1
+    in_use = np.cumsum((events & 1) * 2 - 1)
+    last = np.r_[times[1:] != times[:-1], True]
+    return pd.Series(in_use[last], index=pd.DatetimeIndex(times[last].view('datetime64[ns]'), name='Time'), name='In Use')
+
+
+# Most vehicles in use at once per period (a pandas period alias such as 'D' or 'W-MON'),
+# counting those already out when the period began
+def peak_concurrency(timeline, freq='D'):
+    grouped = timeline.groupby(timeline.index.to_period(freq))
+    carried = grouped.last().shift(1, fill_value=0)
+    return np.maximum(grouped.max(), carried).rename('Peak In Use').rename_axis('Period')
+
+
+# The (start, end) hour ranges of a shift within one day
+def shift_segments(start, end):
+    return [(start, 24), (0, end)] if end <= start else [(start, end)]
+
+
+# Hours of a shift's windows from the origin midnight up to each time (in hours), in closed
+# form: whole days times the shift length, plus the part of today's windows already past
+def shift_clock(hours, start, end):
+    segments = shift_segments(start, end)
+    days = np.floor(hours / 24)
+    time_of_day = hours - days * 24
+    clock = days * sum(stop - begin for begin, stop in segments)
+    for begin, stop in segments:
+        clock = clock + np.clip(time_of_day - begin, 0, stop - begin)
+    return clock
+
+
+# Vehicle-hours in use per shift window and period. Busy periods are cut at midnight, and
+# each piece's hours inside a shift are the difference of shift_clock at its two ends, so
+# no per-row loops or minute grids are needed. A 'Total' column holds all hours in use.
+def shift_hours(intervals, shifts=SHIFTS, freq='D'):
+    origin = intervals['Start'].min().normalize() if len(intervals) else pd.Timestamp(0)
+    start = ((intervals['Start'] - origin) / pd.Timedelta(hours=1)).to_numpy(dtype=np.float64)
+    end = ((intervals['End'] - origin) / pd.Timedelta(hours=1)).to_numpy(dtype=np.float64)
+    first_day = np.floor(start / 24).astype(np.int64)
+    days = np.maximum(np.ceil(end / 24).astype(np.int64) - first_day, 1)
+    within = np.arange(days.sum()) - np.repeat(np.cumsum(days) - days, days)
+    day = np.repeat(first_day, days) + within
+    piece_start = np.maximum(np.repeat(start, days), day * 24.0)
+    piece_end = np.minimum(np.repeat(end, days), (day + 1) * 24.0)
+
+    hours = {name: shift_clock(piece_end, *window) - shift_clock(piece_start, *window) for name, window in shifts.items()}
+    hours['Total'] = piece_end - piece_start
+    dates = origin + pd.to_timedelta(day, unit='D')
+    return pd.DataFrame(hours).groupby(dates.to_period(freq)).sum().rename_axis('Period')
+
+
+# Share of the fleet's available shift hours that were used: vehicle-hours over
+# (vehicles x shift length x days in the period)
+def shift_utilization(hours, fleet_size, shifts=SHIFTS):
+    days = (hours.index.end_time.normalize() - hours.index.start_time).days.to_numpy() + 1
+    lengths = {name: sum(stop - begin for begin, stop in shift_segments(*window)) for name, window in shifts.items()}
+    lengths['Total'] = 24
+    available = np.outer(days * fleet_size, [lengths[name] for name in hours.columns])
+    return hours / available
+
+
+# python utilization.py <trips.xlsx> [--freq D|W-MON|M]
+def main():
+    args = sys.argv[1:]
+    freq = 'D'
+    if '--freq' in args:
+        position = args.index('--freq')
+        freq = args[position + 1]
+        del args[position:position + 2]
+    if not args:
+        print("Usage: python utilization.py <trips.xlsx> [--freq D|W-MON|M]")
+        return
+    trips = apply_schema(read_excel_cached(args[0]), GEOTAB_SCHEMA, args[0])
+    intervals = busy_intervals(trips)
+    fleet_size = intervals['Vehicle'].nunique()
+    timeline = concurrency(intervals)
+    hours = shift_hours(intervals, freq=freq)
+    with pd.option_context('display.max_rows', 100, 'display.width', 200):
+        print(f"{len(trips)} trips, {len(intervals)} busy periods, {fleet_size} vehicles; "
+              f"at most {timeline.max() if len(timeline) else 0} in use at once")
+        print("\nPeak vehicles in use:")
+        print(peak_concurrency(timeline, freq))
+        print("\nVehicle-hours in use per shift:")
+        print(hours.round(1))
+        print("\nShare of available shift hours used:")
+        print(shift_utilization(hours, fleet_size).round(3))
+
+
+if __name__ == "__main__":
+    main()
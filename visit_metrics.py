@@ -0,0 +1,83 @@
+import pandas as pd
+
+from durations import to_timedelta
+from schema import as_strings
+from topk import rank_values
+
+
+VEHICLE_COLUMNS = ['#14', '#38A', '#46', '#47', '#51']
+# Granularity label -> period column of the long-format frame
+GRANULARITIES = {'Daily': 'DateString', 'Weekly': 'Week', 'Monthly': 'Month'}
+EXCLUDED_DESTINATIONS = ['DOCK']
+
+
+# One row per (log row, vehicle used on it): Vehicle, DateString, Week, Month, To, DrivingTime.
+# A row flagged for two vehicles counts as a visit for both, as in the per-vehicle filters.
+def to_long_format(data, vehicle_columns=VEHICLE_COLUMNS):
+    base = pd.DataFrame({
+        'DateString': as_strings(data['Date'], '%Y-%m-%d'),
+        'Week': as_strings(data['Week']),
+        'Month': as_strings(data['Month']),
+        'To': data['To'],
+        'DrivingTime': to_timedelta(data['Time for Call']),
+    })
+    flags = data[vehicle_columns].apply(pd.to_numeric, errors='coerce').fillna(0).gt(0)
+    rows, cols = flags.values.nonzero()
+    long_data = base.iloc[rows].reset_index(drop=True)
+    long_data.insert(0, 'Vehicle', pd.Categorical.from_codes(cols, categories=vehicle_columns))
+    return long_data
+
+
+# Stack the long frame once per granularity so a single groupby covers all of them
+def stack_periods(long_data):
+    frames = []
+    for granularity, column in GRANULARITIES.items():
+        frame = long_data[['Vehicle', 'To', 'DrivingTime']].copy()
+        frame['Granularity'] = granularity
+        frame['Period'] = long_data[column].values
+        frames.append(frame)
+    stacked = pd.concat(frames, ignore_index=True)
+    stacked['Granularity'] = pd.Categorical(stacked['Granularity'], categories=list(GRANULARITIES))
+    return stacked
+
+
+# Every metric for every vehicle and granularity from one grouped pass each:
+#   metrics      - Vehicle, Granularity, Period -> Visits, Unique Visits, Driving Hours
+#   destinations - Vehicle, Granularity, Period, To -> Count, First, Rank (excluded destinations dropped)
+def aggregate_visits(long_data, excluded_destinations=EXCLUDED_DESTINATIONS):
+    stacked = stack_periods(long_data)
+    keys = ['Vehicle', 'Granularity', 'Period']
+
+    grouped = stacked.groupby(keys, observed=True, sort=True)
+    metrics = pd.DataFrame({
+        'Visits': grouped.size(),
+        'Driving Hours': grouped['DrivingTime'].sum() / pd.Timedelta(hours=1),
+    })
+
+    # Destinations are counted and ranked once; every top-k below is a filter on 'Rank'
+    valid = stacked[~stacked['To'].isin(excluded_destinations)]
+    destinations = rank_values(valid, keys, 'To').set_index(keys + ['To'])
+    metrics['Unique Visits'] = destinations.groupby(level=keys, observed=True).size()
+    metrics['Unique Visits'] = metrics['Unique Visits'].fillna(0).astype(int)
+
+    return metrics[['Visits', 'Unique Visits', 'Driving Hours']], destinations
+
+
+# Top destinations of each period for one vehicle and granularity, as value_counts().head(k)
+# per period would give: a Series indexed by (period, To)
+def top_destinations(destinations, vehicle, granularity, k):
+    try:
+        counts = destinations.xs((vehicle, granularity), level=['Vehicle', 'Granularity'])
+    except KeyError:
+        return pd.Series(dtype=int, name='Count')
+    top = counts[counts['Rank'] < k].reset_index().sort_values(['Period', 'Rank'])
+    top = top.rename(columns={'Period': GRANULARITIES[granularity]})
+    return top.set_index([GRANULARITIES[granularity], 'To'])['Count']
+
+
+# One metric of one vehicle at one granularity, indexed by period
+def metric_series(metrics, vehicle, granularity, metric):
+    try:
+        return metrics.xs((vehicle, granularity), level=['Vehicle', 'Granularity'])[metric]
+    except KeyError:
+        return pd.Series(dtype=float)
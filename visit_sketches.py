@@ -0,0 +1,231 @@
+import numpy as np
+import pandas as pd
+
+
+# HyperLogLog registers per (vehicle, day). Each day only keeps its non-zero registers
+# (sparse: one entry per distinct register hit, so a day with a few dozen destinations
+# costs a few dozen entries, not 2**precision bytes). Estimates are the same as with dense
+# registers; the relative standard error of any merged estimate is 1.04 / sqrt(2**precision)
+# (about 1.6% at the default precision of 12).
+DEFAULT_PRECISION = 12
+MAX_PRECISION = 16  # register numbers are stored as uint16
+INITIAL_CAPACITY = 1 << 16
+
+# Columns of the sparse register arrays
+SPARSE_COLUMNS = [('vehicle', np.int32), ('day', np.int32), ('register', np.uint16), ('rank', np.uint8)]
+
+
+def hll_error_bound(precision=DEFAULT_PRECISION):
+    return 1.04 / np.sqrt(2 ** precision)
+
+
+# Bit length of uint64 values (0 for 0), exact: each 32-bit half fits a float64 mantissa
+def bit_length(values):
+    high = (values >> np.uint64(32)).astype(np.float64)
+    low = (values & np.uint64(0xFFFFFFFF)).astype(np.float64)
+    high_bits = np.frexp(high)[1]
+    low_bits = np.frexp(low)[1]
+    return np.where(high > 0, high_bits + 32, low_bits).astype(np.int64)
+
+
+# Register index and rank (position of the first 1-bit) for each value, vectorized
+def hll_registers(values, precision):
+    hashes = pd.util.hash_array(np.asarray(values, dtype=object).astype(str).astype(object))
+    index = (hashes >> np.uint64(64 - precision)).astype(np.int64)
+    remainder = hashes << np.uint64(precision)
+    rank = 64 - bit_length(remainder) + 1
+    return index, np.minimum(rank, 64 - precision + 1).astype(np.uint8)
+
+
+# Cardinality estimate per sketch from its non-zero registers only: harmonic holds the sum
+# of 2**-rank over them and nonzero their count (the m - nonzero empty registers add 1 each).
+# Uses the linear-counting correction for small cardinalities.
+def hll_estimate(harmonic, nonzero, m):
+    zeros = m - nonzero
+    alpha = 0.7213 / (1 + 1.079 / m)
+    raw = alpha * m * m / (harmonic + zeros)
+    with np.errstate(divide='ignore'):
+        linear = m * np.log(m / np.maximum(zeros, 1))
+    return np.where((raw <= 2.5 * m) & (zeros > 0), linear, raw)
+
+
+# Start of each run of equal values in a sorted array
+def run_starts(values):
+    if not len(values):
+        return np.zeros(0, dtype=np.int64)
+    return np.flatnonzero(np.r_[True, values[1:] != values[:-1]])
+
+
+# Sort key of (vehicle, day or period, register) triples: days/periods are taken modulo
+# 2**20, which keeps them distinct over any realistic span
+def register_keys(vehicle, period, register):
+    return ((vehicle.astype(np.int64) << 36) | ((period.astype(np.int64) & 0xFFFFF) << 16)
+            | register.astype(np.int64))
+
+
+# Highest rank per (vehicle, period, register): the element-wise max that merges registers
+def max_registers(vehicle, period, register, rank):
+    keys = register_keys(vehicle, period, register)
+    order = np.argsort(keys)
+    starts = run_starts(keys[order])
+    first = order[starts]
+    return vehicle[first], period[first], register[first], np.maximum.reduceat(rank[order], starts)
+
+
+# Unique visits per vehicle per day, kept in a form that merges into any coarser range.
+#   mode='exact'  - the distinct (vehicle, day, destination) triples; exact, memory grows
+#                   with the number of distinct visits
+#   mode='approx' - a sparse HyperLogLog sketch per vehicle per day, in flat arrays that
+#                   grow by doubling; a few bytes per distinct (day, register) instead of a
+#                   Python row per distinct visit, estimates within error_bound (relative
+#                   standard error)
+# add() can be called once per streamed batch; days seen in several batches are merged.
+class VisitSketches:
+    def __init__(self, mode='exact', precision=DEFAULT_PRECISION):
+        if mode not in ('exact', 'approx'):
+            raise ValueError(f"mode must be 'exact' or 'approx', not '{mode}'")
+        if not 4 <= precision <= MAX_PRECISION:
+            raise ValueError(f"precision must be between 4 and {MAX_PRECISION}, not {precision}")
+        self.mode = mode
+        self.precision = precision
+        self.vehicles = pd.Index([], dtype=object, name='Vehicle')
+        self.size = 0
+        self.sparse = {name: np.zeros(INITIAL_CAPACITY if mode == 'approx' else 0, dtype=dtype)
+                       for name, dtype in SPARSE_COLUMNS}
+        self.distinct = pd.DataFrame(columns=['Vehicle', 'Date', 'Destination'])
+
+    @property
+    def error_bound(self):
+        return 0.0 if self.mode == 'exact' else hll_error_bound(self.precision)
+
+    # Bytes held by the sketches (the register arrays' capacity, or the distinct visits)
+    def memory_bytes(self):
+        if self.mode == 'exact':
+            return int(self.distinct.memory_usage(deep=True).sum())
+        return sum(values.nbytes for values in self.sparse.values())
+
+    def add(self, vehicles, dates, destinations):
+        batch = pd.DataFrame({
+            'Vehicle': np.asarray(vehicles, dtype=object),
+            'Date': pd.to_datetime(np.asarray(dates)).normalize(),
+            'Destination': np.asarray(destinations, dtype=object),
+        }).dropna()
+        if batch.empty:
+            return self
+
+        if self.mode == 'exact':
+            self.distinct = concat_distinct(self.distinct, batch)
+            return self
+
+        codes, uniques = pd.factorize(batch['Vehicle'])
+        vehicle = self.vehicle_positions(uniques)[codes].astype(np.int32)
+        day = batch['Date'].to_numpy(dtype='datetime64[D]').astype(np.int64).astype(np.int32)
+        register, rank = hll_registers(batch['Destination'].values, self.precision)
+        self.append_registers(*max_registers(vehicle, day, register.astype(np.uint16), rank))
+        return self
+
+    # Positions of the given vehicles, registering the ones not seen before
+    def vehicle_positions(self, vehicles):
+        vehicles = pd.Index(np.asarray(vehicles, dtype=object))
+        new_vehicles = vehicles[~vehicles.isin(self.vehicles)]
+        if len(new_vehicles):
+            self.vehicles = self.vehicles.append(new_vehicles).rename('Vehicle')
+        return self.vehicles.get_indexer(vehicles)
+
+    # Append register entries in place. When the arrays are full they are first compacted
+    # (repeated registers of a day folded to their max) and only doubled if that is not enough.
+    def append_registers(self, vehicle, day, register, rank):
+        count = len(vehicle)
+        if self.size + count > len(self.sparse['vehicle']):
+            self.compact()
+        needed = self.size + count
+        if needed > len(self.sparse['vehicle']):
+            capacity = max(needed, 2 * len(self.sparse['vehicle']))
+            for name, values in self.sparse.items():
+                grown = np.zeros(capacity, dtype=values.dtype)
+                grown[:self.size] = values[:self.size]
+                self.sparse[name] = grown
+        for name, values in zip(['vehicle', 'day', 'register', 'rank'], [vehicle, day, register, rank]):
+            self.sparse[name][self.size:needed] = values
+        self.size = needed
+
+    def compact(self):
+        merged = max_registers(*self.entries())
+        self.size = 0
+        for name, values in zip(['vehicle', 'day', 'register', 'rank'], merged):
+            self.sparse[name][:len(values)] = values
+        self.size = len(merged[0])
+
+    # The filled part of the register arrays: vehicle, day, register, rank
+    def entries(self):
+        return tuple(self.sparse[name][:self.size] for name, _ in SPARSE_COLUMNS)
+
+    # Fold another set of sketches (e.g. another month or another worker) into this one
+    def merge(self, other):
+        if other.mode != self.mode or other.precision != self.precision:
+            raise ValueError("Can only merge sketches with the same mode and precision")
+        if self.mode == 'exact':
+            self.distinct = concat_distinct(self.distinct, other.distinct)
+        elif other.size:
+            vehicle, day, register, rank = other.entries()
+            positions = self.vehicle_positions(other.vehicles).astype(np.int32)
+            self.append_registers(positions[vehicle], day, register, rank)
+        return self
+
+    # Registers merged per (vehicle, period) and the estimate of each, for the days in range
+    def estimates(self, freq, start=None, end=None):
+        vehicle, day, register, rank = self.entries()
+        dates = day.astype('datetime64[D]')
+        keep = in_range(dates, start, end)
+        vehicle, register, rank = vehicle[keep], register[keep], rank[keep]
+        period = pd.DatetimeIndex(dates[keep]).to_period(freq).asi8
+        vehicle, period, register, rank = max_registers(vehicle, period, register, rank)
+        # Sketch boundaries: runs of equal (vehicle, period) in the key order max_registers returns
+        starts = run_starts(register_keys(vehicle, period, np.zeros(len(vehicle), dtype=np.int64)))
+        harmonic = np.add.reduceat(np.exp2(-rank.astype(np.float64)), starts) if len(starts) else np.zeros(0)
+        nonzero = np.diff(np.r_[starts, len(vehicle)])
+        return vehicle[starts], period[starts], hll_estimate(harmonic, nonzero, 2 ** self.precision)
+
+    # Unique visits per vehicle and period; freq is a pandas period alias
+    # ('D', 'W-MON', 'M', ...). start/end (inclusive) limit the days considered.
+    def unique_visits(self, freq='D', start=None, end=None):
+        if self.mode == 'exact':
+            days = self.distinct[in_range(self.distinct['Date'], start, end)]
+            days = days.assign(Period=pd.to_datetime(days['Date']).dt.to_period(freq))
+            return days.groupby(['Vehicle', 'Period'])['Destination'].nunique().rename('Unique Visits')
+
+        vehicle, period, estimate = self.estimates(freq, start, end)
+        if not len(estimate):
+            return pd.Series(dtype=float, name='Unique Visits')
+        index = pd.MultiIndex.from_arrays([self.vehicles[vehicle], pd.PeriodIndex.from_ordinals(period, freq=freq)],
+                                          names=['Vehicle', 'Period'])
+        return pd.Series(estimate, index=index, name='Unique Visits').sort_index()
+
+    # Unique visits of one vehicle over an arbitrary date range (inclusive)
+    def range_unique_visits(self, vehicle, start, end):
+        if self.mode == 'exact':
+            days = self.distinct[(self.distinct['Vehicle'] == vehicle) & in_range(self.distinct['Date'], start, end)]
+            return float(days['Destination'].nunique())
+        position = self.vehicles.get_indexer([vehicle])[0]
+        vehicles, day, register, rank = self.entries()
+        rows = (vehicles == position) & in_range(day.astype('datetime64[D]'), start, end)
+        if position < 0 or not rows.any():
+            return 0.0
+        register, rank = max_registers(vehicles[rows], np.zeros(rows.sum(), dtype=np.int64), register[rows], rank[rows])[2:]
+        return float(hll_estimate(np.exp2(-rank.astype(np.float64)).sum(), len(rank), 2 ** self.precision))
+
+
+def in_range(dates, start=None, end=None):
+    dates = pd.DatetimeIndex(pd.to_datetime(dates))
+    keep = np.ones(len(dates), dtype=bool)
+    if start is not None:
+        keep &= dates >= pd.Timestamp(start)
+    if end is not None:
+        keep &= dates <= pd.Timestamp(end)
+    return keep
+
+
+def concat_distinct(distinct, batch):
+    if distinct.empty:
+        return batch.drop_duplicates().reset_index(drop=True)
+    return pd.concat([distinct, batch], ignore_index=True).drop_duplicates()